@@ -0,0 +1,57 @@
+"""Measure the cost of inserting the toolbar into HTML pages of growing size.
+
+Run with ``python benchmarks/bench_injection.py``. Prints one JSON object per
+page size, comparing :func:`inject_toolbar` with decoding, lowercasing and
+re-encoding the whole page. Apart from building the new body, the cost of
+finding where to insert the toolbar should stay flat as pages get larger.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import timeit
+
+from flask_debugtoolbar.injection import inject_toolbar
+
+TOOLBAR = b"<div id='flDebug'>" + b"x" * 20000 + b"</div>"
+SIZES = (10_000, 100_000, 1_000_000, 5_000_000, 20_000_000)
+
+
+def render_toolbar() -> bytes:
+    return TOOLBAR
+
+
+def decode_and_inject(page: bytes) -> bytes:
+    html = page.decode()
+    index = html.lower().rfind("</body>")
+    return "".join((html[:index], TOOLBAR.decode(), html[index:])).encode()
+
+
+def make_page(size: int) -> bytes:
+    row = b"<tr><td>Lorem</td><td>Ipsum</td><td>Dolor</td></tr>\n"
+    body = row * (size // len(row))
+    return b"<!doctype html><html><body><table>" + body + b"</table></body></html>"
+
+
+def measure(func: functools.partial[bytes | None], number: int) -> float:
+    return timeit.timeit(func, number=number) / number * 1000
+
+
+def main() -> None:
+    for size in SIZES:
+        page = make_page(size)
+        number = max(5, 10_000_000 // size)
+        result = {
+            "benchmark": "inject_toolbar",
+            "page_bytes": len(page),
+            "inject_ms": measure(
+                functools.partial(inject_toolbar, page, render_toolbar), number
+            ),
+            "decode_ms": measure(functools.partial(decode_and_inject, page), number),
+        }
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Measure the per-request overhead of the toolbar.
+
+Each scenario builds an app in the style of ``tests/basic_app.py`` and
+requests its index page with the test client, with and without the toolbar.
+Scenarios vary the page size, the number of SQL queries and rendered
+templates, gzip compression and the enabled panels.
+
+Run with ``python benchmarks/bench_requests.py``. Results are printed as JSON
+lines, or written to a file with ``--output``. ``--compare`` exits with an
+error if a scenario got slower than a previous results file by more than
+``--threshold``, so regressions can be caught before a release.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import itertools
+import json
+import sys
+import time
+import typing as t
+
+from flask import Flask
+from flask import render_template_string
+from flask import Response
+from flask_sqlalchemy import SQLAlchemy
+
+from flask_debugtoolbar import DebugToolbarExtension
+
+PANEL_SETS: dict[str, tuple[str, ...] | None] = {
+    "default": None,
+    "timer": ("flask_debugtoolbar.panels.timer.TimerDebugPanel",),
+    "none": (),
+}
+
+SCENARIO_FIELDS = ("page_kb", "queries", "templates", "gzip", "panels")
+
+PAGE = """<!doctype html>
+<html>
+<head><title>Benchmark</title></head>
+<body>
+{{ partials }}
+<table>
+{% for i in range(rows) %}<tr><td>{{ i }}</td><td>Lorem ipsum dolor sit amet</td></tr>
+{% endfor %}
+</table>
+</body>
+</html>
+"""
+
+PARTIAL = "<p>{{ name }} {{ value }}</p>"
+
+
+def make_app(
+    toolbar: bool,
+    page_kb: int,
+    queries: int,
+    templates: int,
+    compress: bool,
+    panels: str,
+) -> Flask:
+    app = Flask("bench_app")
+    app.config["DEBUG"] = True
+    app.config["SECRET_KEY"] = "abc123"
+    app.config["DEBUG_TB_ENABLED"] = toolbar
+    app.config["DEBUG_TB_INTERCEPT_REDIRECTS"] = False
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+
+    if PANEL_SETS[panels] is not None:
+        app.config["DEBUG_TB_PANELS"] = PANEL_SETS[panels]
+
+    DebugToolbarExtension(app)
+    db = SQLAlchemy(app)
+
+    class Item(db.Model):  # type: ignore[name-defined, misc]
+        __tablename__ = "item"
+        id = db.Column(db.Integer, primary_key=True)
+
+    # roughly 50 bytes per row
+    rows = page_kb * 1024 // 50
+
+    @app.route("/")
+    def index() -> str:
+        for i in range(queries):
+            db.session.execute(db.select(Item).filter_by(id=i)).all()
+
+        partials = "".join(
+            render_template_string(PARTIAL, name="partial", value=i)
+            for i in range(templates)
+        )
+        return render_template_string(PAGE, partials=partials, rows=rows)
+
+    if compress:
+        # Registered after the toolbar, so it runs before it
+        @app.after_request
+        def gzip_response(response: Response) -> Response:
+            response.set_data(gzip.compress(response.get_data(), 6))
+            response.headers["Content-Encoding"] = "gzip"
+            return response
+
+    with app.app_context():
+        db.create_all()
+
+    return app
+
+
+def percentile(values: list[float], percent: float) -> float:
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run(app: Flask, requests: int, warmup: int) -> dict[str, float]:
+    client = app.test_client()
+
+    for _ in range(warmup):
+        client.get("/")
+
+    latencies = []
+    start = time.perf_counter()
+
+    for _ in range(requests):
+        request_start = time.perf_counter()
+        client.get("/").close()
+        latencies.append((time.perf_counter() - request_start) * 1000)
+
+    total = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": requests / total,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def scenarios(quick: bool) -> t.Iterator[dict[str, t.Any]]:
+    if quick:
+        page_kbs, queries, templates = [10, 1000], [0, 50], [1]
+    else:
+        page_kbs, queries, templates = [10, 1000, 10000], [0, 10, 200], [1, 50]
+
+    for page_kb, n_queries, n_templates, compress, panels in itertools.product(
+        page_kbs, queries, templates, [False, True], PANEL_SETS
+    ):
+        yield {
+            "page_kb": page_kb,
+            "queries": n_queries,
+            "templates": n_templates,
+            "gzip": compress,
+            "panels": panels,
+        }
+
+
+def scenario_key(scenario: dict[str, t.Any]) -> str:
+    return ",".join(f"{k}={scenario[k]}" for k in SCENARIO_FIELDS)
+
+
+def scenario_app(toolbar: bool, scenario: dict[str, t.Any]) -> Flask:
+    return make_app(
+        toolbar,
+        page_kb=scenario["page_kb"],
+        queries=scenario["queries"],
+        templates=scenario["templates"],
+        compress=scenario["gzip"],
+        panels=scenario["panels"],
+    )
+
+
+def compare(results: list[dict[str, t.Any]], path: str, threshold: float) -> bool:
+    with open(path) as f:
+        baseline = {scenario_key(s): s for s in map(json.loads, f)}
+
+    ok = True
+
+    for result in results:
+        previous = baseline.get(scenario_key(result))
+
+        if previous is None:
+            continue
+
+        before = previous["results"]["toolbar"]["p50_ms"]
+        after = result["results"]["toolbar"]["p50_ms"]
+
+        if after > before * (1 + threshold):
+            ok = False
+            print(
+                f"Regression in {scenario_key(result)}:"
+                f" p50 {before:.2f}ms -> {after:.2f}ms",
+                file=sys.stderr,
+            )
+
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--quick", action="store_true", help="fewer scenarios")
+    parser.add_argument("--output", help="write JSON lines to this file")
+    parser.add_argument("--compare", help="JSON lines file of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = []
+
+    for scenario in scenarios(args.quick):
+        scenario["results"] = {
+            "baseline": run(scenario_app(False, scenario), args.requests, args.warmup),
+            "toolbar": run(scenario_app(True, scenario), args.requests, args.warmup),
+        }
+        scenario["overhead_ms"] = (
+            scenario["results"]["toolbar"]["p50_ms"]
+            - scenario["results"]["baseline"]["p50_ms"]
+        )
+        results.append(scenario)
+
+        if not args.output:
+            print(json.dumps(scenario))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
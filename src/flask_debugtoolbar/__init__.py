@@ -1,47 +1,47 @@
 from __future__ import annotations
 
 import collections.abc as c
+import itertools
 import os
+import time
 import typing as t
 import urllib.parse
-import warnings
 from contextvars import ContextVar
 
 import jinja2.ext
+from flask import abort
 from flask import Blueprint
 from flask import current_app
 from flask import Flask
 from flask import g
 from flask import request
 from flask import send_from_directory
+from flask import stream_with_context
 from flask import url_for
 from flask.globals import request_ctx
+from jinja2 import BytecodeCache
 from jinja2 import Environment
+from jinja2 import FileSystemBytecodeCache
 from jinja2 import PackageLoader
 from werkzeug import Request
 from werkzeug import Response
 from werkzeug.routing import Rule
 
+from .activation import is_activated
+from .compression import Codec
+from .compression import get_codec
+from .history import approximate_size
+from .history import RequestHistory
+from .injection import inject_toolbar
+from .injection import inject_toolbar_stream
+from .panels import DebugPanel
 from .toolbar import DebugToolbar
 from .utils import decode_text
-from .utils import gzip_compress
-from .utils import gzip_decompress
 
 module: Blueprint = Blueprint("debugtoolbar", __name__)
 
-
-def replace_insensitive(string: str, target: str, replacement: str) -> str:
-    """Similar to string.replace() but is case insensitive
-    Code borrowed from:
-    http://forums.devshed.com/python-programming-11/case-insensitive-string-replace-490921.html
-    """
-    no_case = string.lower()
-    index = no_case.rfind(target.lower())
-
-    if index >= 0:
-        return string[:index] + replacement + string[index + len(target) :]
-    else:  # no results so return the original string
-        return string
+#: Key of the decision to show the toolbar in the WSGI environ
+SHOW_TOOLBAR_KEY = "flask_debugtoolbar.show_toolbar"
 
 
 def _printable(value: object) -> str:
@@ -51,6 +51,42 @@ def _printable(value: object) -> str:
         return f"<repr({object.__repr__(value)}) raised {type(e).__name__}: {e}>"
 
 
+class _TimedIterator:
+    """Iterate over the chunks of a streamed response, adding up the time
+    spent getting them. ``on_close`` is called once the iterator is closed.
+    """
+
+    def __init__(
+        self,
+        chunks: c.Iterable[bytes],
+        on_close: c.Callable[[], None] | None = None,
+    ) -> None:
+        self.iterator = iter(chunks)
+        self.on_close = on_close
+        self.seconds = 0.0
+
+    def __iter__(self) -> _TimedIterator:
+        return self
+
+    def __next__(self) -> bytes:
+        start = time.perf_counter()
+
+        try:
+            return next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def close(self) -> None:
+        close = getattr(self.iterator, "close", None)
+
+        if close is not None:
+            close()
+
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+
+
 class DebugToolbarExtension:
     _static_dir = os.path.realpath(os.path.join(os.path.dirname(__file__), "static"))
 
@@ -66,6 +102,11 @@ class DebugToolbarExtension:
         self.debug_toolbars_var: ContextVar[dict[Request, DebugToolbar]] = ContextVar(
             "debug_toolbars"
         )
+
+        # Panels of recent requests, kept so that their content can be
+        # rendered after the response has been sent
+        self.history: RequestHistory = RequestHistory()
+        self._sample_counter = itertools.count()
         jinja_extensions = [jinja2.ext.i18n]
 
         # Jinja2<3
@@ -73,9 +114,11 @@ class DebugToolbarExtension:
             jinja_extensions.append(jinja2.ext.with_)  # pyright: ignore
 
         # Configure jinja for the internal templates and add url rules
-        # for static data
+        # for static data. The templates are part of the package, so there's
+        # no need to check them for changes.
         self.jinja_env: Environment = Environment(
             autoescape=True,
+            auto_reload=False,
             extensions=jinja_extensions,
             loader=PackageLoader(__name__, "templates"),
         )
@@ -100,6 +143,15 @@ class DebugToolbarExtension:
             )
 
         self._validate_and_configure_toolbar_routes_host(app)
+        app.extensions["debugtoolbar"] = self
+
+        self.history.max_entries = app.config["DEBUG_TB_HISTORY_SIZE"]
+        self.history.max_bytes = app.config["DEBUG_TB_HISTORY_MAX_BYTES"]
+
+        self._configure_bytecode_cache(app.config["DEBUG_TB_TEMPLATE_BYTECODE_CACHE"])
+
+        if app.config["DEBUG_TB_PRECOMPILE_TEMPLATES"]:
+            self.precompile_templates()
 
         DebugToolbar.load_panels(app)
 
@@ -125,22 +177,55 @@ class DebugToolbarExtension:
             "DEBUG_TB_HOSTS": (),
             "DEBUG_TB_ROUTES_HOST": None,
             "DEBUG_TB_INTERCEPT_REDIRECTS": True,
+            "DEBUG_TB_SAMPLE_RATE": 1,
+            "DEBUG_TB_REQUIRE_ACTIVATION": False,
+            "DEBUG_TB_ACTIVATION_MAX_AGE": 24 * 60 * 60,
+            "DEBUG_TB_LAZY_PANELS": False,
+            "DEBUG_TB_HISTORY_SIZE": 25,
+            "DEBUG_TB_HISTORY_MAX_BYTES": 32 * 1024 * 1024,
+            "DEBUG_TB_COMPRESSION_LEVEL": None,
+            "DEBUG_TB_PRECOMPILE_TEMPLATES": True,
+            "DEBUG_TB_TEMPLATE_BYTECODE_CACHE": None,
             "DEBUG_TB_PANELS": (
                 "flask_debugtoolbar.panels.versions.VersionDebugPanel",
                 "flask_debugtoolbar.panels.timer.TimerDebugPanel",
+                "flask_debugtoolbar.panels.garbage_collector.GarbageCollectorDebugPanel",
                 "flask_debugtoolbar.panels.headers.HeaderDebugPanel",
                 "flask_debugtoolbar.panels.request_vars.RequestVarsDebugPanel",
                 "flask_debugtoolbar.panels.config_vars.ConfigVarsDebugPanel",
                 "flask_debugtoolbar.panels.template.TemplateDebugPanel",
                 "flask_debugtoolbar.panels.sqlalchemy.SQLAlchemyDebugPanel",
+                "flask_debugtoolbar.panels.connection_pool.ConnectionPoolDebugPanel",
                 "flask_debugtoolbar.panels.logger.LoggingPanel",
                 "flask_debugtoolbar.panels.route_list.RouteListDebugPanel",
                 "flask_debugtoolbar.panels.profiler.ProfilerDebugPanel",
+                "flask_debugtoolbar.panels.line_profiler.LineProfilerDebugPanel",
+                "flask_debugtoolbar.panels.memory.MemoryDebugPanel",
                 "flask_debugtoolbar.panels.g.GDebugPanel",
+                "flask_debugtoolbar.panels.overhead.OverheadDebugPanel",
             ),
-            "SQLALCHEMY_RECORD_QUERIES": app.debug,
         }
 
+    def _configure_bytecode_cache(self, cache: str | BytecodeCache | None) -> None:
+        if cache is None:
+            return
+
+        if isinstance(cache, str):
+            cache = FileSystemBytecodeCache(cache, "__fldt_%s.cache")
+
+        # Templates loaded before setting the cache would bypass it
+        if self.jinja_env.cache is not None:
+            self.jinja_env.cache.clear()
+
+        self.jinja_env.bytecode_cache = cache
+
+    def precompile_templates(self) -> None:
+        """Compile all toolbar templates so the first request rendering the
+        toolbar doesn't have to.
+        """
+        for name in self.jinja_env.list_templates(extensions=["html"]):
+            self.jinja_env.get_template(name)
+
     def _validate_and_configure_toolbar_routes_host(self, app: Flask) -> None:
         toolbar_routes_host = app.config["DEBUG_TB_ROUTES_HOST"]
         if app.url_map.host_matching and not toolbar_routes_host:
@@ -219,19 +304,47 @@ class DebugToolbarExtension:
         view_args: dict[str, t.Any] = req.view_args  # type: ignore[assignment]
         # allow each toolbar to process the view and args
         view_func = self.process_view(app, view_func, view_args)
-        return view_func(**view_args)
+        return app.ensure_sync(view_func)(**view_args)
 
     def _show_toolbar(self) -> bool:
         """Return a boolean to indicate if we need to show the toolbar."""
         if request.blueprint == "debugtoolbar":
             return False
 
-        hosts = current_app.config["DEBUG_TB_HOSTS"]
+        return self.show_toolbar(request)
+
+    def show_toolbar(self, request: Request) -> bool:
+        """Decide if the toolbar is shown for a request, from the allowed
+        hosts, sampling and activation. The decision is made once and kept in
+        the WSGI environ, so that middleware deciding before the app runs,
+        like the request scope profiler, selects the same requests. Must be
+        called in an app context.
+        """
+        show = request.environ.get(SHOW_TOOLBAR_KEY)
+
+        if show is None:
+            show = request.environ[SHOW_TOOLBAR_KEY] = self._decide(request)
+
+        return show
+
+    def _decide(self, request: Request) -> bool:
+        config = current_app.config
+        hosts = config["DEBUG_TB_HOSTS"]
 
         if hosts and request.remote_addr not in hosts:
             return False
 
-        return True
+        if not config["DEBUG_TB_REQUIRE_ACTIVATION"] and self._sample(
+            config["DEBUG_TB_SAMPLE_RATE"]
+        ):
+            return True
+
+        # Requests with a signed activation token are always shown
+        return is_activated(request)
+
+    def _sample(self, rate: int) -> bool:
+        """Select one in ``rate`` requests."""
+        return rate <= 1 or next(self._sample_counter) % rate == 0
 
     def send_static_file(self, filename: str) -> Response:
         """Send a static file from the flask-debugtoolbar static directory."""
@@ -243,14 +356,18 @@ class DebugToolbarExtension:
         if not self._show_toolbar():
             return
 
+        start = time.perf_counter()
         real_request = request._get_current_object()  # type: ignore[attr-defined]
-        self.debug_toolbars_var.set({})
-        self.debug_toolbars_var.get()[real_request] = DebugToolbar(
-            real_request, self.jinja_env
-        )
+        toolbar = DebugToolbar(real_request, self.jinja_env)
+        self.debug_toolbars_var.set({real_request: toolbar})
+        toolbar.record_timing("Toolbar", "setup", time.perf_counter() - start)
 
-        for panel in self.debug_toolbars_var.get()[real_request].panels:
+        for panel in toolbar.hook_panels["process_request"]:
+            start = time.perf_counter()
             panel.process_request(real_request)
+            toolbar.record_timing(
+                panel.name, "process_request", time.perf_counter() - start
+            )
 
     def process_view(
         self,
@@ -261,15 +378,25 @@ class DebugToolbarExtension:
         """This method is called just before the flask view is called.
         This is done by the dispatch_request method.
         """
+        toolbars = self.debug_toolbars_var.get(None)
+
+        # Fast path for requests without a toolbar
+        if not toolbars:
+            return view_func
+
         real_request = request._get_current_object()  # type: ignore[attr-defined]
 
         try:
-            toolbar = self.debug_toolbars_var.get({})[real_request]
+            toolbar = toolbars[real_request]
         except KeyError:
             return view_func
 
-        for panel in toolbar.panels:
+        for panel in toolbar.hook_panels["process_view"]:
+            start = time.perf_counter()
             new_view = panel.process_view(real_request, view_func, view_kwargs)
+            toolbar.record_timing(
+                panel.name, "process_view", time.perf_counter() - start
+            )
 
             if new_view:
                 view_func = new_view
@@ -277,9 +404,15 @@ class DebugToolbarExtension:
         return view_func
 
     def process_response(self, response: Response) -> Response:
+        toolbars = self.debug_toolbars_var.get(None)
+
+        # Fast path for requests without a toolbar
+        if not toolbars:
+            return response
+
         real_request = request._get_current_object()  # type: ignore[attr-defined]
 
-        if real_request not in self.debug_toolbars_var.get({}):
+        if real_request not in toolbars:
             return response
 
         # Intercept http redirect codes and display an html page with a
@@ -303,57 +436,174 @@ class DebugToolbarExtension:
         # toolbar to the returned html response.
         if not (
             response.status_code in self._toolbar_codes
-            and response.is_sequence
             and response.headers["content-type"].startswith("text/html")
         ):
             return response
 
-        content_encoding = response.headers.get("Content-Encoding")
+        content_encoding = response.headers.get("Content-Encoding", "identity")
+        codec: Codec | None = None
+
+        if content_encoding != "identity":
+            codec = get_codec(
+                content_encoding, current_app.config["DEBUG_TB_COMPRESSION_LEVEL"]
+            )
 
-        if content_encoding and "gzip" in content_encoding:
-            response_html = gzip_decompress(response.data).decode()
-        else:
-            response_html = response.get_data(as_text=True)
+            # Leave responses we can't decode alone, rather than break them
+            if codec is None:
+                return response
 
-        no_case = response_html.lower()
-        body_end = no_case.rfind("</body>")
+        toolbar = toolbars[real_request]
+        toolbar.template_context["codec"] = codec
+
+        if not response.is_sequence:
+            # Files sent with `send_file` are passed through untouched
+            if not response.direct_passthrough:
+                self._inject_stream(toolbar, real_request, response, codec)
 
-        if body_end >= 0:
-            before = response_html[:body_end]
-            after = response_html[body_end:]
-        elif no_case.startswith("<!doctype html>"):
-            before = response_html
-            after = ""
-        else:
-            warnings.warn(
-                "Could not insert debug toolbar." " </body> tag not found in response.",
-                stacklevel=1,
-            )
             return response
 
-        toolbar = self.debug_toolbars_var.get()[real_request]
+        start = time.perf_counter()
+        render_time = 0.0
+        data = response.get_data()
 
-        for panel in toolbar.panels:
+        if codec is not None:
+            data = codec.decode(data)
+
+        def render_toolbar() -> bytes:
+            nonlocal render_time
+            render_start = time.perf_counter()
+            html = self._render_toolbar(toolbar, real_request, response).encode()
+            render_time = time.perf_counter() - render_start
+            return html
+
+        content_bytes = inject_toolbar(data, render_toolbar)
+
+        if content_bytes is not None:
+            if codec is not None:
+                content_bytes = codec.encode(content_bytes)
+
+            response.response = [content_bytes]
+            response.content_length = len(content_bytes)
+
+        self._record_inject(toolbar, codec, time.perf_counter() - start - render_time)
+        return response
+
+    @staticmethod
+    def _record_inject(
+        toolbar: DebugToolbar, codec: Codec | None, seconds: float
+    ) -> None:
+        """Record the time spent inserting the toolbar in the response, with
+        decoding and encoding it as separate steps.
+        """
+        if codec is not None:
+            seconds -= codec.decode_time + codec.encode_time
+            toolbar.record_timing("Toolbar", f"{codec.name} decode", codec.decode_time)
+            toolbar.record_timing("Toolbar", f"{codec.name} encode", codec.encode_time)
+
+        toolbar.record_timing("Toolbar", "inject", seconds)
+
+    def _render_toolbar(
+        self, toolbar: DebugToolbar, real_request: Request, response: Response
+    ) -> str:
+        for panel in toolbar.hook_panels["process_response"]:
+            start = time.perf_counter()
             panel.process_response(real_request, response)
+            toolbar.record_timing(
+                panel.name, "process_response", time.perf_counter() - start
+            )
 
         toolbar_html = toolbar.render_toolbar()
 
-        content = "".join((before, toolbar_html, after))
-        content_bytes = content.encode("utf-8")
+        if toolbar.needs_history():
+            start = time.perf_counter()
+            self.store_toolbar(toolbar)
+            toolbar.record_timing("Toolbar", "history", time.perf_counter() - start)
 
-        if content_encoding and "gzip" in content_encoding:
-            content_bytes = gzip_compress(content_bytes)
+        return toolbar_html
 
-        response.response = [content_bytes]
-        response.content_length = len(content_bytes)
+    def _inject_stream(
+        self,
+        toolbar: DebugToolbar,
+        real_request: Request,
+        response: Response,
+        codec: Codec | None,
+    ) -> None:
+        """Insert the toolbar into a streamed response as it passes through.
+        The panels are processed and the toolbar rendered when the end of the
+        body is reached, in the request context of the response.
+
+        As for buffered responses, the time spent looking for the end of the
+        body and recoding the response is recorded, without the time the
+        application takes to generate the chunks.
+        """
+        render_time = 0.0
 
-        return response
+        def render_toolbar() -> bytes:
+            nonlocal render_time
+            start = time.perf_counter()
+            html = self._render_toolbar(toolbar, real_request, response).encode()
+            render_time += time.perf_counter() - start
+            return html
+
+        def record_inject() -> None:
+            seconds = timed.seconds - body.seconds - render_time
+            self._record_inject(toolbar, codec, seconds)
+
+        body = _TimedIterator(response.response)  # type: ignore[arg-type]
+        chunks: c.Iterable[bytes] = body
+
+        if codec is not None:
+            chunks = codec.decode_stream(chunks)
+
+        chunks = inject_toolbar_stream(chunks, render_toolbar)
+
+        if codec is not None:
+            chunks = codec.encode_stream(chunks)
+
+        timed = _TimedIterator(chunks, record_inject)
+        response.response = stream_with_context(timed)
+        response.headers.pop("Content-Length", None)
 
     def teardown_request(self, exc: BaseException | None) -> None:
         # debug_toolbars_var won't be set under `flask.copy_current_request_context`
         real_request = request._get_current_object()  # type: ignore[attr-defined]
         self.debug_toolbars_var.get({}).pop(real_request, None)
 
+    def store_toolbar(self, toolbar: DebugToolbar) -> None:
+        """Keep the toolbar in the request history, without the request
+        itself, so its panels can be rendered on demand.
+        """
+        toolbar.request = None
+        size = approximate_size(toolbar, exclude=(self.jinja_env,))
+        self.history.put(toolbar.request_id, toolbar, size)
+
+    def get_toolbar(self, request_id: str) -> DebugToolbar | None:
+        """Return the toolbar of a recent request from the request history."""
+        toolbar: DebugToolbar | None = self.history.get(request_id)
+        return toolbar
+
+    def get_panel(self, request_id: str, dom_id: str) -> DebugPanel | None:
+        toolbar = self.get_toolbar(request_id)
+
+        if toolbar is None:
+            return None
+
+        return toolbar.get_panel(dom_id)
+
     def render(self, template_name: str, context: dict[str, t.Any]) -> str:
         template = self.jinja_env.get_template(template_name)
         return template.render(**context)
+
+
+@module.route("/panel/<request_id>/<panel_id>")
+def panel_content(request_id: str, panel_id: str) -> str:
+    """Render the content of a single panel of a recent request. Used by
+    the toolbar when ``DEBUG_TB_LAZY_PANELS`` is enabled.
+    """
+    toolbar: DebugToolbar | None = g.debug_toolbar.get_toolbar(request_id)
+    panel = toolbar.get_panel(panel_id) if toolbar is not None else None
+
+    if toolbar is None or panel is None or not panel.has_content:
+        abort(404)
+
+    return toolbar.render_panel_content(panel)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import itsdangerous
+from flask import current_app
+from werkzeug import Request
+
+#: Request header and cookie that can carry an activation token
+ACTIVATION_HEADER = "X-Debug-Toolbar"
+ACTIVATION_COOKIE = "fldt_activate"
+
+
+def activation_signer() -> itsdangerous.URLSafeTimedSerializer:
+    return itsdangerous.URLSafeTimedSerializer(
+        current_app.config["SECRET_KEY"], salt="fdt-activate"
+    )
+
+
+def make_activation_token(label: str = "") -> str:
+    """Return a signed token that shows the toolbar on requests sending it,
+    in the ``X-Debug-Toolbar`` header or the ``fldt_activate`` cookie, even
+    when they aren't sampled. Must be called in an app context.
+    """
+    return activation_signer().dumps(label)
+
+
+def is_activated(request: Request) -> bool:
+    """Check if the request carries a valid, unexpired activation token."""
+    token = request.headers.get(ACTIVATION_HEADER) or request.cookies.get(
+        ACTIVATION_COOKIE
+    )
+
+    if not token:
+        return False
+
+    try:
+        activation_signer().loads(
+            token, max_age=current_app.config["DEBUG_TB_ACTIVATION_MAX_AGE"]
+        )
+    except itsdangerous.BadSignature:
+        return False
+
+    return True
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import collections.abc as c
+import pstats
+import typing as t
+
+from .sampler import FuncKey
+
+#: Calls that take less than this fraction of the total time are left out of
+#: call trees, to keep them small enough to render
+MIN_FRACTION = 0.002
+
+#: Deepest call level kept in call trees
+MAX_DEPTH = 64
+
+
+class CallNode:
+    """One call path in a call tree. ``time`` is the cumulative time spent in
+    the function when called through this path, in seconds.
+    """
+
+    __slots__ = ("func", "time", "children")
+
+    def __init__(self, func: FuncKey, time: float) -> None:
+        self.func = func
+        self.time = time
+        self.children: list[CallNode] = []
+
+    @property
+    def name(self) -> str:
+        return func_label(self.func)
+
+    @property
+    def self_time(self) -> float:
+        return max(0.0, self.time - sum(child.time for child in self.children))
+
+    def walk(
+        self, path: tuple[CallNode, ...] = ()
+    ) -> c.Iterator[tuple[tuple[CallNode, ...], CallNode]]:
+        """Yield each node in the tree with the path of nodes leading to it."""
+        yield path, self
+        path += (self,)
+
+        for child in self.children:
+            yield from child.walk(path)
+
+
+def func_label(func: FuncKey) -> str:
+    filename, lineno, name = func
+
+    if filename == "~":
+        # built-in function, the name is already descriptive
+        return name
+
+    return f"{name} ({filename.rsplit('/', 1)[-1]}:{lineno})"
+
+
+def _root(children: list[CallNode]) -> CallNode:
+    root = CallNode(("", 0, "all"), sum(child.time for child in children))
+    root.children = sorted(children, key=lambda node: node.time, reverse=True)
+    return root
+
+
+def tree_from_pstats(
+    stats: pstats.Stats,
+    min_fraction: float = MIN_FRACTION,
+    max_depth: int = MAX_DEPTH,
+) -> CallNode:
+    """Build a call tree from the caller edges recorded by :mod:`cProfile`.
+
+    The profile only records the time spent in each callee by each direct
+    caller, not by full call path. Below the first level, the time of a
+    callee is split between the paths reaching its caller in proportion to
+    the time of each path. Recursive calls aren't followed.
+    """
+    entries: dict[FuncKey, t.Any] = stats.stats  # type: ignore[attr-defined]
+    callees: dict[FuncKey, list[tuple[FuncKey, float]]] = {}
+    roots: list[CallNode] = []
+
+    for func, (_cc, _nc, _tt, cumtime, callers) in entries.items():
+        if not callers:
+            roots.append(CallNode(func, cumtime))
+
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    root = _root(roots)
+    min_time = root.time * min_fraction
+
+    def expand(node: CallNode, path: frozenset[FuncKey], depth: int) -> None:
+        if depth >= max_depth:
+            return
+
+        # the time of the callees is shared by all the paths reaching node
+        scale = node.time / entries[node.func][3] if entries[node.func][3] else 0
+
+        for func, edge_time in callees.get(node.func, ()):
+            time = min(edge_time * scale, node.time)
+
+            if func in path or time < min_time:
+                continue
+
+            child = CallNode(func, time)
+            node.children.append(child)
+            expand(child, path | {func}, depth + 1)
+
+        node.children.sort(key=lambda child: child.time, reverse=True)
+
+    for node in root.children:
+        expand(node, frozenset((node.func,)), 1)
+
+    return root
+
+
+def tree_from_stacks(
+    stacks: c.Mapping[tuple[FuncKey, ...], c.Sequence[t.Any]],
+    min_fraction: float = MIN_FRACTION,
+    max_depth: int = MAX_DEPTH,
+) -> CallNode:
+    """Build a call tree from the stacks of a
+    :class:`~flask_debugtoolbar.sampler.SamplingProfiler`, which are exact.
+    """
+    root = CallNode(("", 0, "all"), 0.0)
+    nodes: dict[tuple[FuncKey, ...], CallNode] = {(): root}
+
+    for stack, (_samples, seconds) in stacks.items():
+        root.time += seconds
+        parent = root
+
+        for depth in range(1, min(len(stack), max_depth) + 1):
+            node = nodes.get(stack[:depth])
+
+            if node is None:
+                node = nodes[stack[:depth]] = CallNode(stack[depth - 1], 0.0)
+                parent.children.append(node)
+
+            node.time += seconds
+            parent = node
+
+    min_time = root.time * min_fraction
+
+    for _path, node in root.walk():
+        node.children = sorted(
+            (child for child in node.children if child.time >= min_time),
+            key=lambda child: child.time,
+            reverse=True,
+        )
+
+    return root
+
+
+def collapsed_stacks(root: CallNode) -> str:
+    """Format a call tree in the collapsed stack format read by
+    ``flamegraph.pl`` and speedscope: one line per call path, with the
+    function names separated by ``;`` and the time spent in the last one,
+    in microseconds.
+    """
+    lines = []
+
+    for path, node in root.walk():
+        if not path:
+            continue
+
+        value = round(node.self_time * 1_000_000)
+
+        if value:
+            names = [n.name.replace(";", ":") for n in path[1:] + (node,)]
+            lines.append(f"{';'.join(names)} {value}")
+
+    return "\n".join(lines) + "\n"
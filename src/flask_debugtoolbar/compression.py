@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import collections.abc as c
+import time
+import typing as t
+import zlib
+
+try:
+    import brotli  # pyright: ignore
+
+    HAVE_BROTLI = True
+except ImportError:
+    HAVE_BROTLI = False
+
+try:
+    import zstandard  # pyright: ignore
+
+    HAVE_ZSTANDARD = True
+except ImportError:
+    HAVE_ZSTANDARD = False
+
+
+class Processor(t.Protocol):
+    """Incremental compressor or decompressor used by a :class:`Codec`."""
+
+    def process(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        """Return all data processed so far, keeping the stream open."""
+        ...
+
+    def finish(self) -> bytes: ...
+
+
+class _ZlibCompressor:
+    def __init__(self, level: int, wbits: int) -> None:
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def process(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _ZlibDecompressor:
+    def __init__(self, wbits: int) -> None:
+        self._obj = zlib.decompressobj(wbits)
+
+    def process(self, data: bytes) -> bytes:
+        return self._obj.decompress(data)
+
+    def flush(self) -> bytes:
+        return b""
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class Codec:
+    """Incremental encoding and decoding of response bodies for one
+    ``Content-Encoding``. A new instance is used for every response, and
+    records the time spent decoding and encoding it, in seconds.
+    """
+
+    name: t.ClassVar[str]
+    default_level: t.ClassVar[int]
+
+    def __init__(self, level: int | None = None) -> None:
+        self.level = self.default_level if level is None else level
+        self.decode_time = 0.0
+        self.encode_time = 0.0
+
+    def compressor(self) -> Processor:
+        raise NotImplementedError
+
+    def decompressor(self) -> Processor:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> bytes:
+        return b"".join(self.decode_stream([data]))
+
+    def encode(self, data: bytes) -> bytes:
+        return b"".join(self.encode_stream([data], flush=False))
+
+    def decode_stream(self, chunks: c.Iterable[bytes]) -> c.Iterator[bytes]:
+        processor = self.decompressor()
+
+        for chunk in chunks:
+            start = time.perf_counter()
+            data = processor.process(chunk)
+            self.decode_time += time.perf_counter() - start
+
+            if data:
+                yield data
+
+        start = time.perf_counter()
+        data = processor.finish()
+        self.decode_time += time.perf_counter() - start
+
+        if data:
+            yield data
+
+    def encode_stream(
+        self, chunks: c.Iterable[bytes], flush: bool = True
+    ) -> c.Iterator[bytes]:
+        """Compress ``chunks`` as they are produced. With ``flush`` enabled,
+        each compressed chunk is flushed so the client can decode it right
+        away.
+        """
+        processor = self.compressor()
+
+        for chunk in chunks:
+            start = time.perf_counter()
+            data = processor.process(chunk)
+
+            if flush:
+                data += processor.flush()
+
+            self.encode_time += time.perf_counter() - start
+
+            if data:
+                yield data
+
+        start = time.perf_counter()
+        data = processor.finish()
+        self.encode_time += time.perf_counter() - start
+
+        if data:
+            yield data
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+    default_level = 6
+
+    def compressor(self) -> Processor:
+        return _ZlibCompressor(self.level, 16 + zlib.MAX_WBITS)
+
+    def decompressor(self) -> Processor:
+        return _ZlibDecompressor(16 + zlib.MAX_WBITS)
+
+
+class DeflateCodec(Codec):
+    name = "deflate"
+    default_level = 6
+
+    def compressor(self) -> Processor:
+        return _ZlibCompressor(self.level, zlib.MAX_WBITS)
+
+    def decompressor(self) -> Processor:
+        return _ZlibDecompressor(zlib.MAX_WBITS)
+
+
+class _BrotliDecompressor:
+    def __init__(self) -> None:
+        self._obj = brotli.Decompressor()
+
+    def process(self, data: bytes) -> bytes:
+        return self._obj.process(data)  # type: ignore[no-any-return]
+
+    def flush(self) -> bytes:
+        return b""
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class BrotliCodec(Codec):
+    name = "br"
+    default_level = 4
+
+    def compressor(self) -> Processor:
+        return brotli.Compressor(quality=self.level)  # type: ignore[no-any-return]
+
+    def decompressor(self) -> Processor:
+        return _BrotliDecompressor()
+
+
+class _ZstdCompressor:
+    def __init__(self, level: int) -> None:
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def process(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _ZstdDecompressor:
+    def __init__(self) -> None:
+        self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def process(self, data: bytes) -> bytes:
+        return self._obj.decompress(data)
+
+    def flush(self) -> bytes:
+        return b""
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class ZstdCodec(Codec):
+    name = "zstd"
+    default_level = 3
+
+    def compressor(self) -> Processor:
+        return _ZstdCompressor(self.level)
+
+    def decompressor(self) -> Processor:
+        return _ZstdDecompressor()
+
+
+#: Codecs by ``Content-Encoding`` value. Add a :class:`Codec` subclass here to
+#: support other encodings.
+codecs: dict[str, type[Codec]] = {
+    "gzip": GzipCodec,
+    "x-gzip": GzipCodec,
+    "deflate": DeflateCodec,
+}
+
+if HAVE_BROTLI:
+    codecs["br"] = BrotliCodec
+
+if HAVE_ZSTANDARD:
+    codecs["zstd"] = ZstdCodec
+
+
+def get_codec(content_encoding: str, level: int | None = None) -> Codec | None:
+    """Return a codec for a ``Content-Encoding`` header value, or ``None`` if
+    the encoding isn't supported. Multiple encodings aren't supported.
+    """
+    codec_class = codecs.get(content_encoding.strip().lower())
+
+    if codec_class is None:
+        return None
+
+    return codec_class(level)
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import collections.abc as c
+import functools
+import sys
+import time
+import typing as t
+from types import FrameType
+
+
+class CoroutineObserver:
+    """Notified each time an instrumented coroutine runs a step, from the
+    thread running its event loop. ``frame`` is the frame resuming the
+    coroutine, the coroutine's own frames are above it.
+    """
+
+    def resume(self, frame: FrameType) -> None:
+        pass
+
+    def suspend(self) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+class AsyncTiming(CoroutineObserver):
+    """Splits the wall time of a coroutine into the time it was running,
+    and the time it was suspended, awaiting something. The running time is
+    further split into on-CPU time and time spent blocking the event loop,
+    for example on synchronous I/O.
+    """
+
+    def __init__(self) -> None:
+        self.wall = 0.0
+        self.running = 0.0
+        self.cpu = 0.0
+        #: Number of steps, one more than the number of times the coroutine
+        #: was suspended
+        self.steps = 0
+        self._start: float | None = None
+        self._step_start = 0.0
+        self._step_cpu = 0.0
+
+    @property
+    def awaiting(self) -> float:
+        return max(self.wall - self.running, 0.0)
+
+    @property
+    def blocking(self) -> float:
+        return max(self.running - self.cpu, 0.0)
+
+    def resume(self, frame: FrameType) -> None:
+        self._step_start = time.perf_counter()
+        self._step_cpu = time.thread_time()
+        self.steps += 1
+
+        if self._start is None:
+            self._start = self._step_start
+
+    def suspend(self) -> None:
+        self.running += time.perf_counter() - self._step_start
+        self.cpu += time.thread_time() - self._step_cpu
+
+    def finish(self) -> None:
+        if self._start is not None:
+            self.wall = time.perf_counter() - self._start
+
+
+def instrument(
+    func: c.Callable[..., c.Awaitable[t.Any]], *observers: CoroutineObserver
+) -> c.Callable[..., c.Awaitable[t.Any]]:
+    """Wrap a coroutine function so that ``observers`` are notified around
+    each step of its coroutines. The wrapper is a coroutine function too, so
+    Flask still runs it with :meth:`~flask.Flask.ensure_sync`.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: t.Any, **kwargs: t.Any) -> t.Any:
+        return await _Instrumented(func(*args, **kwargs), observers)
+
+    return wrapper
+
+
+class _Instrumented:
+    """Awaitable driving a coroutine one step at a time."""
+
+    __slots__ = ("awaitable", "observers")
+
+    def __init__(
+        self, awaitable: c.Awaitable[t.Any], observers: c.Sequence[CoroutineObserver]
+    ) -> None:
+        self.awaitable = awaitable
+        self.observers = observers
+
+    def __await__(self) -> c.Generator[t.Any, t.Any, t.Any]:
+        steps = self.awaitable.__await__()
+        frame = sys._getframe()
+        send: c.Callable[[t.Any], t.Any] = steps.send
+        value: t.Any = None
+
+        try:
+            while True:
+                for observer in self.observers:
+                    observer.resume(frame)
+
+                try:
+                    yielded = send(value)
+                except StopIteration as e:
+                    return e.value
+                finally:
+                    for observer in reversed(self.observers):
+                        observer.suspend()
+
+                try:
+                    value = yield yielded
+                    send = steps.send
+                except GeneratorExit:
+                    steps.close()
+                    raise
+                except BaseException as e:
+                    value = e
+                    send = steps.throw
+        finally:
+            for observer in self.observers:
+                observer.finish()
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import collections.abc as c
+import json
+import logging
+import marshal
+import os
+import queue
+import threading
+import typing as t
+
+from .callgraph import CallNode
+from .sampler import FuncKey
+
+#: Function entries in the format of :attr:`pstats.Stats.stats`,
+#: ``(primitive calls, calls, own time, cumulative time, callers)``
+StatsDict = t.Dict[FuncKey, t.Tuple[int, int, float, float, t.Dict[FuncKey, t.Any]]]
+
+
+def write_pstats(f: t.BinaryIO, stats: StatsDict, call_tree: CallNode) -> None:
+    """Write the format of :meth:`pstats.Stats.dump_stats`, which can be
+    loaded with :class:`pstats.Stats` or tools such as snakeviz.
+    """
+    marshal.dump(stats, f)
+
+
+def write_callgrind(f: t.BinaryIO, stats: StatsDict, call_tree: CallNode) -> None:
+    """Write the callgrind format, for KCachegrind and QCachegrind. Costs are
+    in microseconds.
+    """
+    callees: dict[FuncKey, list[tuple[FuncKey, t.Any]]] = {}
+
+    for func, (*_, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge))
+
+    total = sum(entry[2] for entry in stats.values())
+    lines = [
+        "# callgrind format",
+        "version: 1",
+        "creator: flask-debugtoolbar",
+        "positions: line",
+        "events: us",
+        f"summary: {round(total * 1_000_000)}",
+    ]
+
+    for func, (_cc, _nc, tottime, _ct, _callers) in stats.items():
+        filename, lineno, name = func
+        lines += ["", f"fl={filename}", f"fn={name}:{lineno}"]
+        lines.append(f"{lineno} {round(tottime * 1_000_000)}")
+
+        for callee, edge in callees.get(func, ()):
+            # with the profile module, the edges are only call counts
+            calls, cumtime = (
+                (edge[1], edge[3]) if isinstance(edge, tuple) else (edge, 0)
+            )
+            lines += [f"cfl={callee[0]}", f"cfn={callee[2]}:{callee[1]}"]
+            lines.append(f"calls={calls} {callee[1]}")
+            lines.append(f"{lineno} {round(cumtime * 1_000_000)}")
+
+    f.write(("\n".join(lines) + "\n").encode())
+
+
+def write_speedscope(f: t.BinaryIO, stats: StatsDict, call_tree: CallNode) -> None:
+    """Write the call tree in the speedscope JSON format, as an evented
+    profile in which each call path runs once for its total time.
+    """
+    frames: list[dict[str, t.Any]] = []
+    frame_ids: dict[FuncKey, int] = {}
+    events: list[dict[str, t.Any]] = []
+
+    def add(node: CallNode, start: float, end: float) -> None:
+        frame = frame_ids.get(node.func)
+
+        if frame is None:
+            frame = frame_ids[node.func] = len(frames)
+            frames.append(
+                {"name": node.func[2], "file": node.func[0], "line": node.func[1]}
+            )
+
+        events.append({"type": "O", "frame": frame, "at": start})
+        add_children(node, start, end)
+        events.append({"type": "C", "frame": frame, "at": end})
+
+    def add_children(node: CallNode, start: float, end: float) -> None:
+        for child in node.children:
+            # the time of the children can add up to more than the parent's
+            # when it was estimated from the caller edges
+            child_end = min(start + child.time, end)
+            add(child, start, child_end)
+            start = child_end
+
+    add_children(call_tree, 0.0, call_tree.time)
+    document = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "flask-debugtoolbar",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "evented",
+                "name": "Profile",
+                "unit": "seconds",
+                "startValue": 0.0,
+                "endValue": call_tree.time,
+                "events": events,
+            }
+        ],
+    }
+    f.write(json.dumps(document).encode())
+
+
+#: Profile dump formats by ``DEBUG_TB_PROFILER_DUMP_FORMAT`` value
+formats: dict[str, c.Callable[[t.BinaryIO, StatsDict, CallNode], None]] = {
+    "pstats": write_pstats,
+    "callgrind": write_callgrind,
+    "speedscope": write_speedscope,
+}
+
+
+class ProfileDump:
+    """A profile to write to ``filename``. The profile data must not be
+    changed after it is queued.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        format: str,
+        stats: StatsDict,
+        call_tree: CallNode,
+        backups: int = 0,
+        max_bytes: int | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.filename = filename
+        self.format = format
+        self.stats = stats
+        self.call_tree = call_tree
+        self.backups = backups
+        self.max_bytes = max_bytes
+        self.logger = logger
+
+    def write(self) -> None:
+        if self.backups:
+            rotate(self.filename, self.backups)
+
+        with open(self.filename, "wb") as f:
+            formats[self.format](f, self.stats, self.call_tree)
+
+        if self.max_bytes is not None:
+            limit_size(self.filename, self.backups, self.max_bytes)
+
+
+def rotate(filename: str, backups: int) -> None:
+    """Rename ``filename`` to ``filename.1``, ``filename.1`` to
+    ``filename.2`` and so on, keeping ``backups`` previous files.
+    """
+    for i in range(backups - 1, 0, -1):
+        source = f"{filename}.{i}"
+
+        if os.path.exists(source):
+            os.replace(source, f"{filename}.{i + 1}")
+
+    if os.path.exists(filename):
+        os.replace(filename, f"{filename}.1")
+
+
+def limit_size(filename: str, backups: int, max_bytes: int) -> None:
+    """Remove the oldest backups of ``filename`` until the file and its
+    backups take at most ``max_bytes``. The newest file is always kept.
+    """
+    paths = [filename] + [f"{filename}.{i}" for i in range(1, backups + 1)]
+    sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in paths]
+
+    while len(paths) > 1 and sum(sizes) > max_bytes:
+        path = paths.pop()
+
+        if sizes.pop():
+            os.remove(path)
+
+
+class ProfileDumpWriter:
+    """Writes profile dumps from a background thread, so that requests don't
+    wait for the disk. Dumps queued while ``max_queue`` dumps are waiting
+    are dropped rather than slowing down requests.
+    """
+
+    def __init__(self, max_queue: int = 16) -> None:
+        self.queue: queue.Queue[ProfileDump] = queue.Queue(max_queue)
+        self.dropped = 0
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, dump: ProfileDump) -> bool:
+        """Queue a dump to be written. Returns ``False`` if it was dropped."""
+        self._ensure_thread()
+
+        try:
+            self.queue.put_nowait(dump)
+        except queue.Full:
+            self.dropped += 1
+
+            if dump.logger is not None:
+                dump.logger.warning(
+                    "Dropped profile dump %s, the writer is falling behind",
+                    dump.filename,
+                )
+
+            return False
+
+        return True
+
+    def join(self) -> None:
+        """Wait until all queued dumps are written."""
+        self.queue.join()
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="flask-debugtoolbar-dumps", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            dump = self.queue.get()
+
+            try:
+                dump.write()
+            except Exception:
+                if dump.logger is not None:
+                    dump.logger.exception(
+                        "Failed to write profile dump %s", dump.filename
+                    )
+            finally:
+                self.queue.task_done()
+
+
+#: Writer shared by all apps in the process
+writer = ProfileDumpWriter()
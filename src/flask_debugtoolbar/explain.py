@@ -0,0 +1,332 @@
+from __future__ import annotations
+
+import collections.abc as c
+import json
+import re
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+from .utils import fingerprint_sql
+
+if t.TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+    from sqlalchemy.engine import Engine
+
+#: Number of estimated plans kept, across requests
+PLAN_CACHE_SIZE = 256
+
+
+class PlanNode:
+    """A step of a query plan. Estimates are in the database's own units,
+    actual times are in seconds, both are ``None`` when not reported.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        detail: str = "",
+        cost: float | None = None,
+        rows: float | None = None,
+        actual_time: float | None = None,
+        actual_rows: float | None = None,
+        loops: int | None = None,
+    ) -> None:
+        self.label = label
+        self.detail = detail
+        self.cost = cost
+        self.rows = rows
+        self.actual_time = actual_time
+        self.actual_rows = actual_rows
+        self.loops = loops
+        self.children: list[PlanNode] = []
+
+
+class Plan:
+    """The plan of a statement, as a tree of :class:`PlanNode`."""
+
+    def __init__(self, statement: str, params: t.Any, analyze: bool) -> None:
+        #: The ``EXPLAIN`` statement that was executed
+        self.statement = statement
+        self.params = params
+        self.analyze = analyze
+        self.nodes: list[PlanNode] = []
+        #: Seconds the statement took to run, with ``analyze``
+        self.execution_time: float | None = None
+        #: Rows returned by the statement, when the database doesn't report
+        #: actual rows in the plan itself
+        self.rows: int | None = None
+
+    def walk(self) -> c.Iterator[tuple[int, PlanNode]]:
+        """The nodes of the plan with their depth, depth first."""
+        stack = [(0, node) for node in reversed(self.nodes)]
+
+        while stack:
+            depth, node = stack.pop()
+            yield depth, node
+            stack.extend((depth + 1, child) for child in reversed(node.children))
+
+    @property
+    def has_estimates(self) -> bool:
+        return any(
+            node.cost is not None or node.rows is not None for _, node in self.walk()
+        )
+
+    @property
+    def has_actuals(self) -> bool:
+        return any(node.actual_time is not None for _, node in self.walk())
+
+
+def driver_params(params: t.Any) -> t.Any:
+    """Parameters for :meth:`~sqlalchemy.engine.Connection.exec_driver_sql`.
+    Queries are recorded with the list of parameter sets of their execution,
+    and tuples become lists once signed, which would run ``executemany``.
+    """
+    if (
+        isinstance(params, list)
+        and params
+        and isinstance(params[0], (list, tuple, dict))
+    ):
+        params = params[0]
+
+    if isinstance(params, list):
+        params = tuple(params)
+
+    return params
+
+
+_lock = threading.Lock()
+#: The ``EXPLAIN`` prefix and nodes of estimated plans, by engine URL and
+#: statement fingerprint
+_plans: OrderedDict[tuple[t.Any, str], tuple[str, list[PlanNode]]] = OrderedDict()
+
+
+def explain(
+    engine: Engine, statement: str, params: t.Any, analyze: bool = False
+) -> Plan:
+    """Get the plan of a statement on one of the application's engines. It
+    runs in a transaction that is always rolled back, so ``analyze``, which
+    executes the statement, leaves no changes behind.
+
+    Estimated plans are cached by the statement's fingerprint, so the plan
+    of a statement is only fetched once for all its parameters. Plans with
+    ``analyze`` measure a particular run, they aren't cached.
+    """
+    key = (engine.url, fingerprint_sql(statement))
+    params = driver_params(params)
+
+    if not analyze:
+        with _lock:
+            cached = _plans.get(key)
+
+            if cached is not None:
+                _plans.move_to_end(key)
+                prefix, nodes = cached
+                plan = Plan(f"{prefix}\n{statement}", params, analyze)
+                plan.nodes = nodes
+                return plan
+
+    with engine.connect() as connection:
+        transaction = connection.begin()
+
+        try:
+            explainer = _explainers.get(connection.dialect.name, _explain_generic)
+            plan = explainer(connection, statement, params, analyze)
+        finally:
+            transaction.rollback()
+
+    if not analyze:
+        with _lock:
+            _plans[key] = (plan.statement.partition("\n")[0], plan.nodes)
+
+            if len(_plans) > PLAN_CACHE_SIZE:
+                _plans.popitem(last=False)
+
+    return plan
+
+
+def clear_cache() -> None:
+    with _lock:
+        _plans.clear()
+
+
+def _measure(connection: Connection, plan: Plan, statement: str, params: t.Any) -> None:
+    """Run the statement for databases that can only estimate its plan."""
+    start = time.perf_counter()
+    result = connection.exec_driver_sql(statement, params)
+    plan.rows = len(result.fetchall()) if result.returns_rows else result.rowcount
+    plan.execution_time = time.perf_counter() - start
+
+
+def _explain_sqlite(
+    connection: Connection, statement: str, params: t.Any, analyze: bool
+) -> Plan:
+    plan = Plan(f"EXPLAIN QUERY PLAN\n{statement}", params, analyze)
+    nodes: dict[int, PlanNode] = {}
+
+    for id, parent, _, detail in connection.exec_driver_sql(plan.statement, params):
+        node = nodes[id] = PlanNode(detail)
+        siblings = nodes[parent].children if parent in nodes else plan.nodes
+        siblings.append(node)
+
+    if analyze:
+        _measure(connection, plan, statement, params)
+
+    return plan
+
+
+def _explain_postgresql(
+    connection: Connection, statement: str, params: t.Any, analyze: bool
+) -> Plan:
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    plan = Plan(f"EXPLAIN ({options})\n{statement}", params, analyze)
+    data = connection.exec_driver_sql(plan.statement, params).scalar_one()
+
+    # psycopg decodes JSON results, other drivers may not
+    if isinstance(data, str):
+        data = json.loads(data)
+
+    parse_postgresql_plan(plan, data)
+    return plan
+
+
+def parse_postgresql_plan(plan: Plan, data: list[dict[str, t.Any]]) -> None:
+    """Add the nodes of a PostgreSQL ``EXPLAIN (FORMAT JSON)`` result."""
+    for item in data:
+        plan.nodes.append(_postgresql_node(item["Plan"]))
+
+        if "Execution Time" in item:
+            plan.execution_time = item["Execution Time"] / 1000
+
+
+def _postgresql_node(data: dict[str, t.Any]) -> PlanNode:
+    label = data["Node Type"]
+
+    if "Relation Name" in data:
+        label = f"{label} on {data['Relation Name']}"
+
+        if data.get("Alias", data["Relation Name"]) != data["Relation Name"]:
+            label = f"{label} {data['Alias']}"
+
+    if "Index Name" in data:
+        label = f"{label} using {data['Index Name']}"
+
+    conditions = ("Index Cond", "Hash Cond", "Merge Cond", "Join Filter", "Filter")
+    actual_time = data.get("Actual Total Time")
+    node = PlanNode(
+        label,
+        detail=" ".join(data[name] for name in conditions if name in data),
+        cost=data.get("Total Cost"),
+        rows=data.get("Plan Rows"),
+        actual_time=None if actual_time is None else actual_time / 1000,
+        actual_rows=data.get("Actual Rows"),
+        loops=data.get("Actual Loops"),
+    )
+    node.children = [_postgresql_node(child) for child in data.get("Plans", ())]
+    return node
+
+
+def _explain_mysql(
+    connection: Connection, statement: str, params: t.Any, analyze: bool
+) -> Plan:
+    # EXPLAIN ANALYZE was added in MySQL 8.0.18, MariaDB has ANALYZE instead
+    if analyze and not getattr(connection.dialect, "is_mariadb", False):
+        plan = Plan(f"EXPLAIN ANALYZE\n{statement}", params, analyze)
+        start = time.perf_counter()
+        data = connection.exec_driver_sql(plan.statement, params).scalar_one()
+        plan.execution_time = time.perf_counter() - start
+        plan.nodes = parse_mysql_tree(data)
+        return plan
+
+    plan = Plan(f"EXPLAIN\n{statement}", params, analyze)
+
+    for row in connection.exec_driver_sql(plan.statement, params).mappings():
+        detail = [f"{row['type']} access"] if row.get("type") else []
+
+        if row.get("key"):
+            detail.append(f"using {row['key']}")
+
+        if row.get("Extra"):
+            detail.append(row["Extra"])
+
+        plan.nodes.append(
+            PlanNode(
+                f"{row['select_type']} {row['table'] or ''}".strip(),
+                detail=", ".join(detail),
+                rows=row.get("rows"),
+            )
+        )
+
+    if analyze:
+        _measure(connection, plan, statement, params)
+
+    return plan
+
+
+_mysql_node = re.compile(
+    r"(?P<indent> *)-> (?P<label>.*?)"
+    r"(?:  \(cost=(?P<cost>[\d.e+]+) rows=(?P<rows>[\d.e+]+)\))?"
+    r"(?: \(actual time=[\d.e+]+\.\.(?P<time>[\d.e+]+)"
+    r" rows=(?P<actual_rows>[\d.e+]+) loops=(?P<loops>\d+)\))?$"
+)
+
+
+def parse_mysql_tree(text: str) -> list[PlanNode]:
+    """Parse the tree printed by MySQL's ``EXPLAIN ANALYZE`` or
+    ``EXPLAIN FORMAT=TREE``, indented by four spaces per level.
+    """
+    nodes: list[PlanNode] = []
+    # the parent of each level, by indentation
+    stack: list[tuple[int, PlanNode]] = []
+
+    for line in text.splitlines():
+        match = _mysql_node.match(line)
+
+        if match is None:
+            continue
+
+        indent = len(match["indent"])
+        actual_time = match["time"]
+        node = PlanNode(
+            match["label"],
+            cost=_float(match["cost"]),
+            rows=_float(match["rows"]),
+            actual_time=None if actual_time is None else float(actual_time) / 1000,
+            actual_rows=_float(match["actual_rows"]),
+            loops=None if match["loops"] is None else int(match["loops"]),
+        )
+
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+
+        (stack[-1][1].children if stack else nodes).append(node)
+        stack.append((indent, node))
+
+    return nodes
+
+
+def _float(value: str | None) -> float | None:
+    return None if value is None else float(value)
+
+
+def _explain_generic(
+    connection: Connection, statement: str, params: t.Any, analyze: bool
+) -> Plan:
+    plan = Plan(f"EXPLAIN\n{statement}", params, analyze)
+
+    for row in connection.exec_driver_sql(plan.statement, params):
+        plan.nodes.append(PlanNode(" ".join(str(value) for value in row)))
+
+    if analyze:
+        _measure(connection, plan, statement, params)
+
+    return plan
+
+
+_explainers: dict[str, c.Callable[[Connection, str, t.Any, bool], Plan]] = {
+    "sqlite": _explain_sqlite,
+    "postgresql": _explain_postgresql,
+    "mysql": _explain_mysql,
+    "mariadb": _explain_mysql,
+}
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import gc
+import threading
+import time
+import typing as t
+
+#: WSGI environ key of the :class:`GCRecorder` of a request, so that the
+#: timer panel can show its total and recording is stopped in
+#: ``teardown_request`` if the response was never processed
+GC_RECORDER_KEY = "flask_debugtoolbar.gc_recorder"
+
+
+class Collection(t.NamedTuple):
+    generation: int
+    collected: int
+    uncollectable: int
+    #: :func:`time.perf_counter` when the collection started
+    start: float
+    #: Seconds the collection paused the process
+    duration: float
+
+
+class GCRecorder:
+    """The garbage collections that ran while recording. Collections pause
+    every thread, so they are recorded by all the requests in progress,
+    whichever thread triggered them.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.collections: list[Collection] = []
+
+    @property
+    def total_time(self) -> float:
+        return sum(collection.duration for collection in self.collections)
+
+
+_lock = threading.Lock()
+# replaced rather than changed, the callback can run in any thread
+_recorders: tuple[GCRecorder, ...] = ()
+_collection_start: float | None = None
+
+
+def _callback(phase: str, info: dict[str, int]) -> None:
+    global _collection_start
+
+    if phase == "start":
+        _collection_start = time.perf_counter()
+        return
+
+    if _collection_start is None:
+        return
+
+    collection = Collection(
+        info["generation"],
+        info["collected"],
+        info["uncollectable"],
+        _collection_start,
+        time.perf_counter() - _collection_start,
+    )
+    _collection_start = None
+
+    for recorder in _recorders:
+        recorder.collections.append(collection)
+
+
+def start_recording() -> GCRecorder:
+    """Record garbage collections until :func:`stop_recording`. The
+    :data:`gc.callbacks` hook is only registered while recording.
+    """
+    global _recorders
+    recorder = GCRecorder()
+
+    with _lock:
+        if not _recorders:
+            gc.callbacks.append(_callback)
+
+        _recorders += (recorder,)
+
+    return recorder
+
+
+def stop_recording(recorder: GCRecorder) -> None:
+    global _recorders
+
+    with _lock:
+        _recorders = tuple(r for r in _recorders if r is not recorder)
+
+        if not _recorders and _callback in gc.callbacks:
+            gc.callbacks.remove(_callback)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import collections.abc as c
+import sys
+import threading
+import typing as t
+from collections import OrderedDict
+from types import BuiltinFunctionType
+from types import FunctionType
+from types import MethodType
+from types import ModuleType
+
+# Objects that are shared between requests and shouldn't count towards the
+# size of a single entry.
+_SKIP_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+
+def approximate_size(
+    value: object,
+    exclude: c.Iterable[object] = (),
+    max_depth: int = 6,
+    max_objects: int = 10000,
+) -> int:
+    """Estimate the memory used by ``value`` and the objects it references.
+
+    The walk is bounded by ``max_depth`` and ``max_objects`` so large values
+    are under-estimated rather than slow to measure. Objects in ``exclude``
+    and shared objects such as modules, classes and functions are skipped.
+    """
+    seen = {id(obj) for obj in exclude}
+    stack: list[tuple[object, int]] = [(value, 0)]
+    size = 0
+
+    while stack and len(seen) < max_objects:
+        obj, depth = stack.pop()
+
+        if id(obj) in seen or isinstance(obj, _SKIP_TYPES):
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj, 64)
+
+        if depth >= max_depth or isinstance(obj, (str, bytes, int, float)):
+            continue
+
+        if isinstance(obj, dict):
+            for key, item in obj.items():
+                stack.append((key, depth + 1))
+                stack.append((item, depth + 1))
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend((item, depth + 1) for item in obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append((obj.__dict__, depth + 1))
+
+    return size
+
+
+class RequestHistory:
+    """Thread-safe LRU store for the data collected during recent requests.
+
+    Entries are keyed by the toolbar's request id and evicted, least recently
+    used first, once there are more than ``max_entries`` of them or their
+    approximate total size exceeds ``max_bytes``. The most recent entry is
+    always kept, even if it's larger than the budget on its own.
+    """
+
+    def __init__(self, max_entries: int = 25, max_bytes: int | None = None) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[t.Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def put(self, key: str, value: t.Any, size: int | None = None) -> None:
+        if size is None:
+            size = approximate_size(value)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+
+            if old is not None:
+                self.total_bytes -= old[1]
+
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            self._evict()
+
+    def get(self, key: str) -> t.Any | None:
+        with self._lock:
+            try:
+                value, size = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict[str, int | None]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _evict(self) -> None:
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import collections.abc as c
+import warnings
+
+BODY_END = b"</body>"
+DOCTYPE = b"<!doctype html>"
+
+#: Size of the windows scanned for ``</body>``, starting from the end of the
+#: response. The tag is almost always found in the first one.
+TAIL_WINDOW = 16 * 1024
+
+
+def _warn_not_inserted() -> None:
+    warnings.warn(
+        "Could not insert debug toolbar. </body> tag not found in response.",
+        stacklevel=1,
+    )
+
+
+def find_body_end(data: bytes, window: int = TAIL_WINDOW) -> int:
+    """Return the index of the last case-insensitive ``</body>`` in ``data``,
+    or ``-1``.
+
+    Only a window at the end of the data is lowercased and searched, moving
+    backwards until the tag is found, so the cost doesn't grow with the size
+    of the page.
+    """
+    end = len(data)
+
+    while end > 0:
+        start = max(0, end - window)
+        index = data[start:end].lower().rfind(BODY_END)
+
+        if index >= 0:
+            return start + index
+
+        # overlap the windows so a tag on the boundary is found
+        end = start + len(BODY_END) - 1 if start else 0
+
+    return -1
+
+
+def inject_toolbar(data: bytes, render_toolbar: c.Callable[[], bytes]) -> bytes | None:
+    """Insert the toolbar before the last ``</body>`` tag of ``data``, or at
+    the end of a document without one. Return ``None``, without rendering the
+    toolbar, if there is nowhere to insert it.
+    """
+    index = find_body_end(data)
+
+    if index < 0:
+        if data[: len(DOCTYPE)].lower() != DOCTYPE:
+            _warn_not_inserted()
+            return None
+
+        index = len(data)
+
+    view = memoryview(data)
+    return b"".join((view[:index], render_toolbar(), view[index:]))
+
+
+def inject_toolbar_stream(
+    chunks: c.Iterable[bytes | str], render_toolbar: c.Callable[[], bytes]
+) -> c.Iterator[bytes]:
+    """Insert the toolbar before the last ``</body>`` tag of a streamed
+    response, like :func:`inject_toolbar`, without buffering the whole body.
+
+    The end of each chunk is carried over to the next one so that a tag split
+    across chunks is still found. Once a tag is found, the data from it onward
+    is held back until a later tag or the end of the response, which is
+    usually only the closing ``</html>``. ``render_toolbar`` is only called at
+    the end of the response, so the toolbar includes what happened while the
+    body was generated.
+    """
+    iterator = iter(chunks)
+    carry = b""
+    # the data from the last ``</body>`` seen so far
+    pending = b""
+    start = b""
+    keep = len(BODY_END) - 1
+
+    try:
+        for chunk in iterator:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+
+            if len(start) < len(DOCTYPE):
+                start += chunk[: len(DOCTYPE) - len(start)]
+
+            if pending:
+                # only search the new data, and the end of the old data in case
+                # the tag is split across chunks
+                offset = max(1, len(pending) - keep)
+                pending += chunk
+                index = pending[offset:].lower().rfind(BODY_END)
+
+                if index >= 0:
+                    yield pending[: offset + index]
+                    pending = pending[offset + index :]
+
+                continue
+
+            data = carry + chunk
+            index = data.lower().rfind(BODY_END)
+
+            if index >= 0:
+                yield data[:index]
+                pending = data[index:]
+                carry = b""
+                continue
+
+            carry = data[-keep:]
+
+            if len(data) > keep:
+                yield data[:-keep]
+
+        if pending:
+            yield render_toolbar()
+            yield pending
+            return
+
+        if start.lower().startswith(DOCTYPE):
+            yield carry
+            yield render_toolbar()
+            return
+
+        _warn_not_inserted()
+        yield carry
+    finally:
+        close = getattr(iterator, "close", None)
+
+        if close is not None:
+            close()
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import collections.abc as c
+import inspect
+import sys
+import threading
+import time
+import typing as t
+from types import CodeType
+from types import FrameType
+
+from werkzeug.utils import import_string
+
+F = t.TypeVar("F", bound=c.Callable[..., t.Any])
+
+#: Code objects of the functions to profile line by line
+registry: set[CodeType] = set()
+
+#: Use :mod:`sys.monitoring` so that only the registered functions are slowed
+#: down. Before Python 3.12, a per-thread trace function is used instead.
+HAVE_MONITORING = hasattr(sys, "monitoring")
+
+
+def profile_lines(func: F) -> F:
+    """Decorator registering a function to be profiled line by line by the
+    line profiler panel. The function itself isn't changed.
+
+    .. code-block:: python
+
+        from flask_debugtoolbar.lineprof import profile_lines
+
+        @app.route("/")
+        @profile_lines
+        def index():
+            ...
+    """
+    register(func)
+    return func
+
+
+def register(func: c.Callable[..., t.Any]) -> None:
+    code = getattr(inspect.unwrap(func), "__code__", None)
+
+    if code is None:
+        raise TypeError(f"Can't profile the lines of {func!r}, it has no code.")
+
+    registry.add(code)
+
+    if _monitor.enabled:
+        _monitor.watch(code)
+
+
+def resolve(path: str) -> c.Callable[..., t.Any]:
+    """Import a function from a ``"module.name"`` or ``"module:Class.method"``
+    path.
+    """
+    module_name, _, qualname = path.partition(":")
+
+    if not qualname:
+        # find the longest importable module prefix
+        parts = path.split(".")
+
+        for i in range(len(parts) - 1, 0, -1):
+            try:
+                import_string(".".join(parts[:i]))
+            except ImportError:
+                continue
+
+            module_name, qualname = ".".join(parts[:i]), ".".join(parts[i:])
+            break
+        else:
+            raise ImportError(f"Can't import {path!r}.")
+
+    obj: t.Any = import_string(module_name)
+
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+
+    return obj  # type: ignore[no-any-return]
+
+
+class LineStats:
+    """Hit counts and seconds per line of the profiled functions."""
+
+    def __init__(self) -> None:
+        #: ``[hits, seconds]`` by code object and line number
+        self.lines: dict[CodeType, dict[int, list[t.Any]]] = {}
+
+    def add(self, code: CodeType, lineno: int, seconds: float, hit: bool) -> None:
+        line = self.lines.setdefault(code, {}).setdefault(lineno, [0, 0.0])
+
+        if hit:
+            line[0] += 1
+
+        line[1] += seconds
+
+
+class _Frame:
+    """Line being run in one call of a profiled function."""
+
+    __slots__ = ("code", "lineno", "start")
+
+    def __init__(self, code: CodeType) -> None:
+        self.code = code
+        self.lineno: int | None = None
+        self.start = 0.0
+
+
+class LineProfiler:
+    """Collects line timings for the registered functions called by the
+    current thread between :meth:`enable` and :meth:`disable`. The time of a
+    line includes the time of the functions it calls.
+    """
+
+    def __init__(self) -> None:
+        self.stats = LineStats()
+        self._stack: list[_Frame] = []
+        self._previous_trace: t.Any = None
+        self._thread_id: int | None = None
+
+    def enable(self) -> None:
+        self._thread_id = threading.get_ident()
+
+        if HAVE_MONITORING:
+            _monitor.start(self._thread_id, self)
+        else:
+            self._previous_trace = sys.gettrace()
+            sys.settrace(self._trace)
+
+    def disable(self) -> None:
+        if self._thread_id is None:
+            return
+
+        if HAVE_MONITORING:
+            _monitor.stop(self._thread_id)
+        else:
+            sys.settrace(self._previous_trace)
+
+        self._thread_id = None
+        self._stack.clear()
+
+    def line(self, code: CodeType, lineno: int) -> None:
+        now = time.perf_counter()
+
+        # a frame left by an exception doesn't report a return
+        while self._stack and self._stack[-1].code is not code:
+            self._leave(now)
+
+        if not self._stack:
+            self._stack.append(_Frame(code))
+
+        frame = self._stack[-1]
+
+        if frame.lineno is not None:
+            self.stats.add(code, frame.lineno, now - frame.start, hit=False)
+
+        self.stats.add(code, lineno, 0.0, hit=True)
+        frame.lineno = lineno
+        frame.start = now
+
+    def enter(self, code: CodeType) -> None:
+        self._stack.append(_Frame(code))
+
+    def leave(self, code: CodeType) -> None:
+        now = time.perf_counter()
+
+        while self._stack:
+            if self._leave(now).code is code:
+                break
+
+    def _leave(self, now: float) -> _Frame:
+        frame = self._stack.pop()
+
+        if frame.lineno is not None:
+            self.stats.add(frame.code, frame.lineno, now - frame.start, hit=False)
+
+        return frame
+
+    def _trace(self, frame: FrameType, event: str, arg: t.Any) -> t.Any:
+        if event != "call" or frame.f_code not in registry:
+            return None
+
+        code = frame.f_code
+        self.enter(code)
+
+        def trace_lines(frame: FrameType, event: str, arg: t.Any) -> t.Any:
+            if event == "line":
+                self.line(code, frame.f_lineno)
+            elif event == "return":
+                self.leave(code)
+
+            return trace_lines
+
+        return trace_lines
+
+
+class _Monitor:
+    """Routes :mod:`sys.monitoring` events for the registered functions to the
+    :class:`LineProfiler` of the current thread. Events are only enabled for
+    the registered code objects, and only while a profiler is running.
+    """
+
+    def __init__(self) -> None:
+        self.profilers: dict[int, LineProfiler] = {}
+        self.tool_id: int | None = None
+        self.enabled = False
+        self._lock = threading.Lock()
+
+    def start(self, thread_id: int, profiler: LineProfiler) -> None:
+        with self._lock:
+            self.profilers[thread_id] = profiler
+
+            if not self.enabled:
+                self._enable()
+
+    def stop(self, thread_id: int) -> None:
+        with self._lock:
+            self.profilers.pop(thread_id, None)
+
+            if not self.profilers and self.enabled:
+                self._disable()
+
+    def watch(self, code: CodeType) -> None:
+        monitoring = sys.monitoring  # type: ignore[attr-defined]
+        events = monitoring.events
+        monitoring.set_local_events(
+            self.tool_id,
+            code,
+            events.PY_START
+            | events.PY_RESUME
+            | events.PY_RETURN
+            | events.PY_YIELD
+            | events.LINE,
+        )
+
+    def _enable(self) -> None:
+        monitoring = sys.monitoring  # type: ignore[attr-defined]
+
+        if self.tool_id is None:
+            # the debugger, coverage and profiler ids may be used by others
+            for tool_id in (3, 4):
+                if monitoring.get_tool(tool_id) is None:
+                    monitoring.use_tool_id(tool_id, "flask-debugtoolbar")
+                    self.tool_id = tool_id
+                    break
+            else:
+                raise RuntimeError("No sys.monitoring tool id is available.")
+
+        events = monitoring.events
+        register = monitoring.register_callback
+        register(self.tool_id, events.PY_START, self._enter)
+        register(self.tool_id, events.PY_RESUME, self._enter)
+        register(self.tool_id, events.PY_RETURN, self._leave)
+        register(self.tool_id, events.PY_YIELD, self._leave)
+        register(self.tool_id, events.LINE, self._line)
+
+        for code in registry:
+            self.watch(code)
+
+        self.enabled = True
+
+    def _disable(self) -> None:
+        monitoring = sys.monitoring  # type: ignore[attr-defined]
+
+        for code in registry:
+            monitoring.set_local_events(self.tool_id, code, 0)
+
+        self.enabled = False
+
+    def _enter(self, code: CodeType, offset: int) -> None:
+        profiler = self.profilers.get(threading.get_ident())
+
+        if profiler is not None:
+            profiler.enter(code)
+
+    def _leave(self, code: CodeType, offset: int, value: t.Any) -> None:
+        profiler = self.profilers.get(threading.get_ident())
+
+        if profiler is not None:
+            profiler.leave(code)
+
+    def _line(self, code: CodeType, lineno: int) -> None:
+        profiler = self.profilers.get(threading.get_ident())
+
+        if profiler is not None:
+            profiler.line(code, lineno)
+
+
+_monitor = _Monitor()
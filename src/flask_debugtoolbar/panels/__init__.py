@@ -28,8 +28,9 @@ class DebugPanel:
     def __init__(
         self, jinja_env: Environment, context: dict[str, t.Any] | None = None
     ) -> None:
-        if context is not None:
-            self.context.update(context)
+        # Copy the class level context, panels of different requests may be
+        # rendered after each other from the request history.
+        self.context = {**self.context, **(context or {})}
 
         self.jinja_env = jinja_env
         # If the client enabled the panel
@@ -58,6 +59,13 @@ class DebugPanel:
         """
         pass
 
+    @classmethod
+    def active_by_default(cls, app: Flask) -> bool:
+        """Whether a panel with ``user_activate`` is active when the user
+        didn't activate it. Panels that are inactive aren't instantiated.
+        """
+        return False
+
     def render(self, template_name: str, context: dict[str, t.Any]) -> str:
         template = self.jinja_env.get_template(template_name)
         return template.render(**context)
@@ -84,6 +92,12 @@ class DebugPanel:
     def content(self) -> str:
         raise NotImplementedError
 
+    def needs_history(self) -> bool:
+        """Whether the panel's views use it after the response, from the
+        request history. Only checked once the toolbar was rendered.
+        """
+        return False
+
     # Standard middleware methods
     def process_request(self, request: Request) -> None:
         pass
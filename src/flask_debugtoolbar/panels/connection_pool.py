@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import typing as t
+
+from flask import Flask
+from flask import request as current_request
+from werkzeug import Request
+from werkzeug import Response
+
+from ..poolrecorder import HAVE_SQLALCHEMY
+from ..poolrecorder import instrument_pool
+from ..poolrecorder import listen
+from ..poolrecorder import pool_status
+from ..poolrecorder import PoolRecorder
+from ..poolrecorder import start_recording
+from ..poolrecorder import stop_recording
+from . import DebugPanel
+from .sqlalchemy import app_binds
+
+#: Key of the panel recording the request's checkouts in the WSGI environ, so
+#: that recording is stopped in ``teardown_request`` if the response was never
+#: processed
+POOL_PANEL_KEY = "flask_debugtoolbar.connection_pool_panel"
+
+
+def pool_names() -> dict[int, str]:
+    """Name the pools of the application's engines by Flask-SQLAlchemy bind
+    key.
+    """
+    return {id(engine.pool): bind for bind, engine in app_binds().items()}
+
+
+class ConnectionPoolDebugPanel(DebugPanel):
+    """Panel that displays the SQLAlchemy connections used by the request, and
+    the time spent waiting for them.
+    """
+
+    name = "Connection Pool"
+
+    recorder: PoolRecorder | None = None
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        if HAVE_SQLALCHEMY:
+            listen()
+            app.teardown_request(cls._teardown_request)
+
+    @property
+    def has_content(self) -> bool:  # type: ignore[override]
+        return bool(self.recorder and self.recorder.checkouts)
+
+    def process_request(self, request: Request) -> None:
+        if not HAVE_SQLALCHEMY:
+            return
+
+        # the waits of Flask-SQLAlchemy's engines are known from their first
+        # checkout, other pools are instrumented when they're first used
+        for engine in app_binds().values():
+            instrument_pool(engine.pool)
+
+        self.recorder = PoolRecorder()
+        self._token = start_recording(self.recorder)
+        request.environ[POOL_PANEL_KEY] = self
+
+    def process_response(self, request: Request, response: Response) -> None:
+        self._stop()
+
+    def _stop(self) -> None:
+        token = self.__dict__.pop("_token", None)
+
+        if token is not None:
+            stop_recording(token)
+
+    @staticmethod
+    def _teardown_request(exc: BaseException | None) -> None:
+        panel = current_request.environ.pop(POOL_PANEL_KEY, None)
+
+        if panel is not None:
+            panel._stop()
+
+    def wait_time(self) -> float:
+        if self.recorder is None:
+            return 0.0
+
+        return sum(checkout.wait or 0.0 for checkout in self.recorder.checkouts)
+
+    def nav_title(self) -> str:
+        return "Pool"
+
+    def nav_subtitle(self) -> str:
+        if self.recorder is None:
+            return "Unavailable"
+
+        count = len(self.recorder.checkouts)
+        plural = "checkout" if count == 1 else "checkouts"
+        return f"{count} {plural}, waited {self.wait_time() * 1000:.2f}ms"
+
+    def title(self) -> str:
+        return "Connection Pool"
+
+    def url(self) -> str:
+        return ""
+
+    def content(self) -> str:
+        if self.recorder is None:
+            return self.render(
+                "panels/connection_pool.html", {"pools": [], "checkouts": []}
+            )
+
+        names = pool_names()
+        pools: list[dict[str, t.Any]] = []
+        checkouts = []
+
+        for pool_id, usage in self.recorder.pools.items():
+            pool_checkouts = [
+                checkout
+                for checkout in self.recorder.checkouts
+                if checkout.pool_id == pool_id
+            ]
+            pools.append(
+                {
+                    "name": names.get(pool_id, f"<{type(usage.pool).__name__}>"),
+                    "class": type(usage.pool).__name__,
+                    "status": pool_status(usage.pool),
+                    "peak_checked_out": usage.peak_checked_out,
+                    "peak_overflow": usage.peak_overflow,
+                    "checkouts": len(pool_checkouts),
+                    "opened": sum(checkout.new for checkout in pool_checkouts),
+                    "wait": sum(checkout.wait or 0.0 for checkout in pool_checkouts),
+                    "held": sum(checkout.held for checkout in pool_checkouts),
+                }
+            )
+
+        start = min(
+            (checkout.start for checkout in self.recorder.checkouts), default=0.0
+        )
+
+        for checkout in self.recorder.checkouts:
+            checkouts.append(
+                {
+                    "pool": names.get(checkout.pool_id, ""),
+                    "at": (checkout.start - start) * 1000,
+                    "wait": None if checkout.wait is None else checkout.wait * 1000,
+                    "held": checkout.held * 1000,
+                    "returned": checkout.end is not None,
+                    "new": checkout.new,
+                }
+            )
+
+        context = {"pools": pools, "checkouts": checkouts}
+        return self.render("panels/connection_pool.html", context)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 from flask import g
+from werkzeug import Request
+from werkzeug import Response
 
 from . import DebugPanel
 
@@ -20,7 +22,10 @@ class GDebugPanel(DebugPanel):
     def url(self) -> str:
         return ""
 
+    def process_response(self, request: Request, response: Response) -> None:
+        self.g_content = g.__dict__.copy()
+
     def content(self) -> str:
         context = self.context.copy()
-        context.update({"g_content": g.__dict__})
+        context.update({"g_content": self.g_content})
         return self.render("panels/g.html", context)
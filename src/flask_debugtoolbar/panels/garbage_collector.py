@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import typing as t
+
+from flask import Flask
+from flask import request as current_request
+from werkzeug import Request
+from werkzeug import Response
+
+from ..gcpauses import GC_RECORDER_KEY
+from ..gcpauses import GCRecorder
+from ..gcpauses import start_recording
+from ..gcpauses import stop_recording
+from . import DebugPanel
+
+
+class GarbageCollectorDebugPanel(DebugPanel):
+    """Panel that displays the garbage collections that paused the request."""
+
+    name = "Garbage Collector"
+
+    recorder: GCRecorder | None = None
+    collections: list[dict[str, t.Any]]
+    generations: list[dict[str, t.Any]]
+    total_time = 0.0
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        app.teardown_request(cls._teardown_request)
+
+    @property
+    def has_content(self) -> bool:  # type: ignore[override]
+        return bool(self.recorder and self.recorder.collections)
+
+    def process_request(self, request: Request) -> None:
+        self.recorder = start_recording()
+        request.environ[GC_RECORDER_KEY] = self.recorder
+
+    def process_response(self, request: Request, response: Response) -> None:
+        if self.recorder is None:
+            return
+
+        request.environ.pop(GC_RECORDER_KEY, None)
+        stop_recording(self.recorder)
+        self.total_time = self.recorder.total_time * 1000
+        self.collections = [
+            {
+                "generation": collection.generation,
+                "collected": collection.collected,
+                "uncollectable": collection.uncollectable,
+                "at": (collection.start - self.recorder.start) * 1000,
+                "duration": collection.duration * 1000,
+            }
+            for collection in self.recorder.collections
+        ]
+        self.generations = []
+
+        for generation in range(3):
+            entries = [
+                entry for entry in self.collections if entry["generation"] == generation
+            ]
+
+            if entries:
+                self.generations.append(
+                    {
+                        "generation": generation,
+                        "count": len(entries),
+                        "collected": sum(entry["collected"] for entry in entries),
+                        "duration": sum(entry["duration"] for entry in entries),
+                        "longest": max(entry["duration"] for entry in entries),
+                    }
+                )
+
+    @staticmethod
+    def _teardown_request(exc: BaseException | None) -> None:
+        recorder = current_request.environ.pop(GC_RECORDER_KEY, None)
+
+        if recorder is not None:
+            stop_recording(recorder)
+
+    def nav_title(self) -> str:
+        return "GC"
+
+    def nav_subtitle(self) -> str:
+        if self.recorder is None:
+            return ""
+
+        count = len(self.recorder.collections)
+        return f"{count} collections, {self.total_time:.2f}ms"
+
+    def title(self) -> str:
+        return "Garbage Collections"
+
+    def url(self) -> str:
+        return ""
+
+    def content(self) -> str:
+        context = {
+            "collections": self.collections,
+            "generations": self.generations,
+            "total_time": self.total_time,
+        }
+        return self.render("panels/garbage_collector.html", context)
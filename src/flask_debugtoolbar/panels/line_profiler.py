@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import inspect
+import typing as t
+from types import CodeType
+
+from flask import Flask
+from flask import request as current_request
+from werkzeug import Request
+from werkzeug import Response
+
+from ..lineprof import HAVE_MONITORING
+from ..lineprof import LineProfiler
+from ..lineprof import register
+from ..lineprof import registry
+from ..lineprof import resolve
+from ..utils import format_fname
+from . import DebugPanel
+
+#: Key of the panel profiling the request in the WSGI environ, so that
+#: profiling is stopped in ``teardown_request`` if the response was never
+#: processed
+LINE_PROFILER_PANEL_KEY = "flask_debugtoolbar.line_profiler_panel"
+
+
+class LineProfilerDebugPanel(DebugPanel):
+    """Panel that displays the time spent on each line of selected
+    functions. Functions are selected with ``DEBUG_TB_LINE_PROFILER_FUNCTIONS``
+    or the :func:`~flask_debugtoolbar.lineprof.profile_lines` decorator.
+    """
+
+    name = "Line Profiler"
+    user_activate = True
+
+    profiler: LineProfiler | None = None
+    functions: list[dict[str, t.Any]]
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        for path in app.config.get("DEBUG_TB_LINE_PROFILER_FUNCTIONS", ()):
+            try:
+                register(resolve(path))
+            except (ImportError, AttributeError, TypeError) as e:
+                app.logger.warning("Can't profile the lines of %s: %s", path, e)
+
+        app.teardown_request(cls._teardown_request)
+
+    @classmethod
+    def active_by_default(cls, app: Flask) -> bool:
+        return bool(registry)
+
+    @property
+    def has_content(self) -> bool:  # type: ignore[override]
+        return self.profiler is not None
+
+    def process_request(self, request: Request) -> None:
+        # only instantiated when activated by the user or by default
+        self.is_active = True
+        self.profiler = LineProfiler()
+        self.profiler.enable()
+        request.environ[LINE_PROFILER_PANEL_KEY] = self
+
+    def process_response(self, request: Request, response: Response) -> None:
+        if self.profiler is None:
+            return
+
+        self.profiler.disable()
+        self.functions = [
+            self._function(code, lines)
+            for code, lines in self.profiler.stats.lines.items()
+        ]
+        self.functions.sort(key=lambda function: function["time"], reverse=True)
+
+    @staticmethod
+    def _teardown_request(exc: BaseException | None) -> None:
+        panel = current_request.environ.pop(LINE_PROFILER_PANEL_KEY, None)
+
+        if panel is not None and panel.profiler is not None:
+            panel.profiler.disable()
+
+    @staticmethod
+    def _function(code: CodeType, lines: dict[int, list[t.Any]]) -> dict[str, t.Any]:
+        total = sum(seconds for _hits, seconds in lines.values())
+
+        try:
+            source, start = inspect.getsourcelines(code)
+        except OSError:
+            source, start = [], code.co_firstlineno
+
+        rows = []
+
+        for offset, text in enumerate(source):
+            hits, seconds = lines.get(start + offset, (0, 0.0))
+            rows.append(
+                {
+                    "lineno": start + offset,
+                    "hits": hits,
+                    "time": seconds * 1000,
+                    "per_hit": seconds * 1000 / hits if hits else 0,
+                    "percent": seconds / total * 100 if total else 0,
+                    "source": text.rstrip(),
+                }
+            )
+
+        return {
+            "name": code.co_qualname if hasattr(code, "co_qualname") else code.co_name,
+            "filename": format_fname(code.co_filename),
+            "lineno": code.co_firstlineno,
+            "time": total * 1000,
+            "lines": rows,
+        }
+
+    def nav_title(self) -> str:
+        return "Line Profiler"
+
+    def nav_subtitle(self) -> str:
+        if self.profiler is None:
+            return "in-active"
+
+        return f"{len(self.functions)} functions"
+
+    def title(self) -> str:
+        return "Line Profiler"
+
+    def url(self) -> str:
+        return ""
+
+    def content(self) -> str:
+        context = {
+            "functions": self.functions,
+            "monitoring": HAVE_MONITORING,
+            "registered": len(registry),
+        }
+        return self.render("panels/line_profiler.html", context)
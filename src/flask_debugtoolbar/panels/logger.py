@@ -5,6 +5,7 @@ import logging
 import threading
 
 from werkzeug import Request
+from werkzeug import Response
 
 from ..utils import format_fname
 from . import DebugPanel
@@ -75,6 +76,16 @@ class LoggingPanel(DebugPanel):
     def process_request(self, request: Request) -> None:
         _init_once()
         handler.clear_records()
+        self.records: list[logging.LogRecord] | None = None
+
+    def process_response(self, request: Request, response: Response) -> None:
+        self.records = self.get_and_delete()
+
+    def get_records(self) -> list[logging.LogRecord]:
+        if self.records is None:
+            return handler.get_records()
+
+        return self.records
 
     def get_and_delete(self) -> list[logging.LogRecord]:
         records = handler.get_records()
@@ -85,7 +96,7 @@ class LoggingPanel(DebugPanel):
         return "Logging"
 
     def nav_subtitle(self) -> str:
-        num_records = len(handler.get_records())
+        num_records = len(self.get_records())
         plural = "message" if num_records == 1 else "messages"
         return f"{num_records} {plural}"
 
@@ -98,7 +109,7 @@ class LoggingPanel(DebugPanel):
     def content(self) -> str:
         records = []
 
-        for record in self.get_and_delete():
+        for record in self.get_records():
             records.append(
                 {
                     "message": record.getMessage(),
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import linecache
+import sys
+import threading
+import tracemalloc
+import typing as t
+
+from flask import current_app
+from flask import Flask
+from flask import request as current_request
+from werkzeug import Request
+from werkzeug import Response
+
+from ..utils import format_fname
+from ..utils import format_size
+from . import DebugPanel
+
+try:
+    import resource
+
+    HAVE_RESOURCE = True
+except ImportError:
+    HAVE_RESOURCE = False
+
+#: Key of the panel tracing the request in the WSGI environ, so that tracing
+#: is stopped in ``teardown_request`` if the response was never processed
+MEMORY_PANEL_KEY = "flask_debugtoolbar.memory_panel"
+
+#: Number of allocation sites listed
+MAX_SITES = 50
+
+_lock = threading.Lock()
+_users = 0
+_started = False
+#: Number of traced requests started so far
+_starts = 0
+
+
+def _start_tracing(nframes: int) -> tuple[int, bool]:
+    """Start :mod:`tracemalloc` unless it is already tracing, for example
+    for a concurrent request or with ``python -X tracemalloc``. Return the
+    number of traced requests started so far, and whether another request is
+    being traced.
+    """
+    global _users, _started, _starts
+
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+            _started = True
+
+        _users += 1
+        _starts += 1
+        return _starts, _users > 1
+
+
+def _stop_tracing() -> None:
+    """Stop :mod:`tracemalloc` when the last request using it is done, if it
+    was started by :func:`_start_tracing`.
+    """
+    global _users, _started
+
+    with _lock:
+        _users -= 1
+
+        if not _users and _started:
+            tracemalloc.stop()
+            _started = False
+
+
+class MemoryDebugPanel(DebugPanel):
+    """Panel that displays the memory allocated by the request, traced with
+    :mod:`tracemalloc`.
+    """
+
+    name = "Memory"
+    user_activate = True
+
+    tracing = False
+    peak: int | None = None
+    #: Whether other requests were traced at the same time, the peak is
+    #: process-wide and can't be told apart
+    concurrent = False
+    growth = 0
+    sites: list[dict[str, t.Any]]
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        app.teardown_request(cls._teardown_request)
+
+    @classmethod
+    def active_by_default(cls, app: Flask) -> bool:
+        return bool(app.config.get("DEBUG_TB_MEMORY_ENABLED"))
+
+    @property
+    def has_content(self) -> bool:  # type: ignore[override]
+        return self.peak is not None
+
+    def process_request(self, request: Request) -> None:
+        # only instantiated when activated by the user or by default
+        self.is_active = True
+        self.nframes = current_app.config.get("DEBUG_TB_MEMORY_FRAMES", 1)
+        self._starts, self.concurrent = _start_tracing(self.nframes)
+        self.tracing = True
+        request.environ[MEMORY_PANEL_KEY] = self
+
+        # the frame limit can't change while another request is tracing
+        self.nframes = tracemalloc.get_traceback_limit()
+
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        self._start_size = tracemalloc.get_traced_memory()[0]
+        self._before = tracemalloc.take_snapshot()
+
+    def process_response(self, request: Request, response: Response) -> None:
+        if not self.tracing:
+            return
+
+        after = tracemalloc.take_snapshot()
+        size, peak = tracemalloc.get_traced_memory()
+        # another request started since, and may have reset the peak
+        self.concurrent = self.concurrent or _starts != self._starts
+        self._stop()
+
+        self.traced = size
+        self.peak = max(peak - self._start_size, 0)
+        self.growth = size - self._start_size
+        self.sites = self._sites(self._before, after)
+        # snapshots hold every traced block, don't keep them in the history
+        del self._before
+
+        if HAVE_RESOURCE:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # kilobytes on Linux, bytes on macOS
+            self.max_rss = max_rss if sys.platform == "darwin" else max_rss * 1024
+
+    def _stop(self) -> None:
+        self.tracing = False
+        _stop_tracing()
+
+    @staticmethod
+    def _teardown_request(exc: BaseException | None) -> None:
+        panel = current_request.environ.pop(MEMORY_PANEL_KEY, None)
+
+        if panel is not None and panel.tracing:
+            panel._stop()
+
+    def _sites(
+        self, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot
+    ) -> list[dict[str, t.Any]]:
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        key_type = "lineno" if self.nframes == 1 else "traceback"
+        stats = after.filter_traces(filters).compare_to(
+            before.filter_traces(filters), key_type
+        )
+        sites = []
+
+        for stat in stats:
+            if stat.size_diff <= 0:
+                continue
+
+            frames = [
+                {
+                    "filename": format_fname(frame.filename),
+                    "lineno": frame.lineno,
+                    "source": linecache.getline(frame.filename, frame.lineno).strip(),
+                }
+                # most recent call first
+                for frame in reversed(stat.traceback)
+            ]
+            sites.append(
+                {
+                    "size": format_size(stat.size_diff, sign=True),
+                    "count": stat.count_diff,
+                    "frames": frames,
+                }
+            )
+
+            if len(sites) >= MAX_SITES:
+                break
+
+        return sites
+
+    def nav_title(self) -> str:
+        return "Memory"
+
+    def nav_subtitle(self) -> str:
+        if self.peak is None:
+            return "in-active"
+
+        growth = format_size(self.growth, sign=True)
+
+        if self.concurrent:
+            return growth
+
+        return f"Peak {format_size(self.peak)}, {growth}"
+
+    def title(self) -> str:
+        return "Memory Allocations"
+
+    def url(self) -> str:
+        return ""
+
+    def content(self) -> str:
+        rows = [
+            (
+                "Peak allocated during the request",
+                (
+                    "Unknown, other requests were traced at the same time"
+                    if self.concurrent
+                    else format_size(self.peak or 0)
+                ),
+            ),
+            ("Net growth", format_size(self.growth, sign=True)),
+            ("Traced memory at the end", format_size(self.traced)),
+        ]
+
+        if HAVE_RESOURCE:
+            rows.append(("Process max RSS", format_size(self.max_rss)))
+
+        context = {
+            "rows": rows,
+            "sites": self.sites,
+            "nframes": self.nframes,
+        }
+        return self.render("panels/memory.html", context)
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import typing as t
+
+from . import DebugPanel
+
+
+class OverheadDebugPanel(DebugPanel):
+    """Panel that displays the time spent by the toolbar itself."""
+
+    name = "Overhead"
+    has_content = True
+
+    def get_timings(self) -> list[tuple[str, str, float]]:
+        """Return ``(name, step, milliseconds)`` rows, slowest first."""
+        timings: dict[str, dict[str, float]] = self.context.get("timings", {})
+        rows = [
+            (name, step, seconds * 1000)
+            for name, steps in timings.items()
+            for step, seconds in steps.items()
+        ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def nav_title(self) -> str:
+        return "Toolbar overhead"
+
+    def nav_subtitle(self) -> str:
+        total = sum(row[2] for row in self.get_timings())
+        return f"{total:.2f}ms"
+
+    def title(self) -> str:
+        return "Toolbar overhead"
+
+    def url(self) -> str:
+        return ""
+
+    def content(self) -> str:
+        rows = self.get_timings()
+        context: dict[str, t.Any] = {
+            "rows": rows,
+            "total": sum(row[2] for row in rows),
+            "lazy": self.context.get("lazy", False),
+        }
+        return self.render("panels/overhead.html", context)
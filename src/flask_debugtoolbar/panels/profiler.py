@@ -2,14 +2,43 @@ from __future__ import annotations
 
 import collections.abc as c
 import functools
+import inspect
 import pstats
+import sys
+import threading
+import time
 import typing as t
+import weakref
+from collections import OrderedDict
+from types import FrameType
+from urllib.parse import unquote
 
+from flask import abort
 from flask import current_app
+from flask import Flask
+from flask import g
+from flask import redirect
+from flask import request as current_request
+from flask import Response as FlaskResponse
+from flask import url_for
 from jinja2 import Environment
 from werkzeug import Request
 from werkzeug import Response
-
+from werkzeug.http import parse_cookie
+from werkzeug.wsgi import ClosingIterator
+
+from .. import module
+from ..callgraph import CallNode
+from ..callgraph import collapsed_stacks
+from ..callgraph import tree_from_pstats
+from ..callgraph import tree_from_stacks
+from ..coroutines import CoroutineObserver
+from ..coroutines import instrument
+from ..dumps import ProfileDump
+from ..dumps import StatsDict
+from ..dumps import writer
+from ..sampler import FuncKey
+from ..sampler import SamplingProfiler
 from ..utils import format_fname
 from . import DebugPanel
 
@@ -18,18 +47,386 @@ try:
 except ImportError:
     import profile  # type: ignore[no-redef]
 
+if t.TYPE_CHECKING:
+    from _typeshed.wsgi import WSGIEnvironment
+
+#: Index in the :mod:`pstats` entry of each function, ``(primitive calls,
+#: calls, own time, cumulative time, ...)``, of the column to sort on for the
+#: supported ``DEBUG_TB_PROFILER_SORT`` values
+SORT_COLUMNS = {
+    "pcalls": 0,
+    "calls": 1,
+    "ncalls": 1,
+    "time": 2,
+    "tottime": 2,
+    "cumulative": 3,
+    "cumtime": 3,
+}
+
+
+def sort_functions(
+    infos: c.Mapping[FuncKey, c.Sequence[t.Any]], sort: str
+) -> list[FuncKey]:
+    column = SORT_COLUMNS[sort]
+    return sorted(infos, key=lambda func: infos[func][column], reverse=True)
+
+
+def function_call(func: FuncKey, info: c.Sequence[t.Any]) -> dict[str, t.Any]:
+    """Build the profiler table row of a function from its :mod:`pstats`
+    entry.
+    """
+    current: dict[str, t.Any] = {}
+
+    # Number of calls
+    if info[0] != info[1]:
+        current["ncalls"] = f"{info[1]}/{info[0]}"
+    else:
+        current["ncalls"] = info[1]
+
+    # Total time
+    current["tottime"] = info[2] * 1000
+
+    # Quotient of total time divided by number of calls
+    if info[1]:
+        current["percall"] = info[2] * 1000 / info[1]
+    else:
+        current["percall"] = 0
+
+    # Cumulative time
+    current["cumtime"] = info[3] * 1000
+
+    # Quotient of the cumulative time divided by the number of
+    # primitive calls.
+    if info[0]:
+        current["percall_cum"] = info[3] * 1000 / info[0]
+    else:
+        current["percall_cum"] = 0
+
+    # Filename
+    filename = pstats.func_std_string(func)  # type: ignore[attr-defined]
+    current["filename_long"] = filename
+    current["filename"] = format_fname(filename)
+    return current
+
+
+def create_profiler(
+    config: c.Mapping[str, t.Any],
+) -> profile.Profile | SamplingProfiler:
+    if config.get("DEBUG_TB_PROFILER_ENGINE", "cprofile") == "sampling":
+        return SamplingProfiler(config.get("DEBUG_TB_PROFILER_INTERVAL", 0.001))
+
+    return profile.Profile()  # pyright: ignore
+
+
+#: From Python 3.12, :mod:`cProfile` uses :mod:`sys.monitoring` and profiles
+#: all threads, including the event loop threads running async views
+CPROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class CoroutineProfile(CoroutineObserver):
+    """Profiles the steps of an async view in the thread running its event
+    loop, which isn't the request's thread, so that the work is attributed
+    to the coroutine's frames rather than to the code waiting for it.
+
+    A :mod:`cProfile` profiler is only enabled while the coroutine runs. A
+    :class:`~flask_debugtoolbar.sampler.SamplingProfiler` records the time
+    it is suspended as ``<await>``, and if it was already sampling another
+    thread, goes back to it once the coroutine is done.
+    """
+
+    def __init__(self, profiler: profile.Profile | SamplingProfiler) -> None:
+        self.profiler = profiler
+        self._restore: tuple[int | None, FrameType | None] | None = None
+        self._started = False
+
+    def resume(self, frame: FrameType) -> None:
+        if not isinstance(self.profiler, SamplingProfiler):
+            self.profiler.enable()
+        elif not self.profiler.running:
+            self.profiler.enable(frame)
+            self._started = True
+        else:
+            previous = self.profiler.retarget(threading.get_ident(), frame)
+
+            if self._restore is None and not self._started:
+                self._restore = previous
+
+    def suspend(self) -> None:
+        if not isinstance(self.profiler, SamplingProfiler):
+            self.profiler.disable()
+        else:
+            self.profiler.retarget(None, None)
+
+    def finish(self) -> None:
+        if not isinstance(self.profiler, SamplingProfiler):
+            return
+
+        if self._started:
+            self.profiler.disable()
+        elif self._restore is not None:
+            self.profiler.retarget(*self._restore)
+
+
+#: WSGI environ key of the :class:`RequestProfile` of a request
+REQUEST_PROFILE_KEY = "flask_debugtoolbar.request_profile"
+
+
+class RequestProfile:
+    """Profile of a whole request, from the start of WSGI handling until the
+    response was sent, split in labelled phases.
+    """
+
+    def __init__(self, profiler: profile.Profile | SamplingProfiler) -> None:
+        self.profiler = profiler
+        self.panel: ProfilerDebugPanel | None = None
+        #: Label and start time of each phase
+        self.phases: list[tuple[str, float]] = []
+        self.end: float | None = None
+        #: Profiles the event loop thread of an async view, when the request
+        #: profiler can't
+        self.coroutine_profiler: profile.Profile | None = None
+
+    def mark(self, phase: str) -> None:
+        """Start the next phase of the request."""
+        self.phases.append((phase, time.perf_counter()))
+
+        if isinstance(self.profiler, SamplingProfiler):
+            self.profiler.phase = phase
+
+    def phase_times(self) -> list[tuple[str, float]]:
+        """The label and duration in seconds of each phase so far."""
+        end = self.end if self.end is not None else time.perf_counter()
+        starts = [start for _phase, start in self.phases[1:]] + [end]
+        return [
+            (phase, next_start - start)
+            for (phase, start), next_start in zip(self.phases, starts)
+        ]
+
+    def wrap_view(self, view_func: c.Callable[..., t.Any]) -> c.Callable[..., t.Any]:
+        if inspect.iscoroutinefunction(view_func):
+            return self.wrap_async_view(view_func)
+
+        @functools.wraps(view_func)
+        def view(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            self.mark("view")
+
+            try:
+                return view_func(*args, **kwargs)
+            finally:
+                self.mark("after_request")
+
+        return view
+
+    def wrap_async_view(
+        self, view_func: c.Callable[..., c.Awaitable[t.Any]]
+    ) -> c.Callable[..., c.Awaitable[t.Any]]:
+        if isinstance(self.profiler, SamplingProfiler):
+            view_func = instrument(view_func, CoroutineProfile(self.profiler))
+        elif not CPROFILE_ALL_THREADS:
+            self.coroutine_profiler = profile.Profile()  # pyright: ignore
+            view_func = instrument(view_func, CoroutineProfile(self.coroutine_profiler))
+
+        @functools.wraps(view_func)
+        async def view(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            self.mark("view")
+
+            try:
+                return await view_func(*args, **kwargs)
+            finally:
+                self.mark("after_request")
+
+        return view
+
+    def start(self, base_frame: FrameType | None) -> None:
+        self.mark("setup")
+
+        if isinstance(self.profiler, SamplingProfiler):
+            self.profiler.enable(base_frame)
+        else:
+            self.profiler.enable()
+
+    def stop(self) -> None:
+        self.profiler.disable()
+        self.end = time.perf_counter()
+
+
+class ProfilerMiddleware:
+    """WSGI middleware installed by :meth:`ProfilerDebugPanel.init_app` when
+    ``DEBUG_TB_PROFILER_SCOPE`` is ``"request"``. It profiles the whole
+    request, including the ``before_request`` and ``after_request``
+    handlers, sessions, and sending the response, instead of only the view.
+    """
+
+    def __init__(self, wsgi_app: t.Any, app: Flask) -> None:
+        self.wsgi_app = wsgi_app
+        self.app = app
+
+    def __call__(self, environ: WSGIEnvironment, start_response: t.Any) -> t.Any:
+        if not self.should_profile(environ):
+            return self.wsgi_app(environ, start_response)
+
+        request_profile = RequestProfile(create_profiler(self.app.config))
+        environ[REQUEST_PROFILE_KEY] = request_profile
+        request_profile.start(sys._getframe(1))
+
+        try:
+            app_iter = self.wsgi_app(environ, start_response)
+        except BaseException:
+            request_profile.stop()
+            raise
+
+        request_profile.mark("response")
+        return ClosingIterator(
+            app_iter, functools.partial(self.finish, request_profile)
+        )
+
+    def should_profile(self, environ: WSGIEnvironment) -> bool:
+        if environ.get("PATH_INFO", "").startswith("/_debug_toolbar/"):
+            return False
+
+        # the same hosts, sampling and activation as the toolbar
+        with self.app.app_context():
+            extension = self.app.extensions["debugtoolbar"]
+
+            if not extension.show_toolbar(self.app.request_class(environ)):
+                return False
+
+        if self.app.config.get("DEBUG_TB_PROFILER_ENABLED"):
+            return True
+
+        activated = unquote(parse_cookie(environ).get("fldt_active", ""))
+        return ProfilerDebugPanel.dom_id() in activated.split(";")
+
+    def finish(self, request_profile: RequestProfile) -> None:
+        request_profile.stop()
+        panel = request_profile.panel
+
+        if panel is not None and panel.is_active:
+            with self.app.app_context():
+                panel.finish()
+
+
+class ProfileAggregate:
+    """The profiles of many requests to one endpoint, added together.
+
+    Only the :mod:`pstats` entry of each function is kept, not its callers,
+    so the memory used is bounded by the number of functions called by the
+    endpoint, however many requests are added.
+    """
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.requests = 0
+        self.total_time = 0.0
+        self.infos: dict[FuncKey, list[t.Any]] = {}
+
+    def add(
+        self, total_time: float, infos: c.Mapping[FuncKey, c.Sequence[t.Any]]
+    ) -> None:
+        self.requests += 1
+        self.total_time += total_time
+
+        for func, info in infos.items():
+            total = self.infos.get(func)
+
+            if total is None:
+                self.infos[func] = list(info[:4])
+            else:
+                for i in range(4):
+                    total[i] += info[i]
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.requests if self.requests else 0.0
+
+    def get_function_calls(
+        self, sort: str, limit: int | None = None
+    ) -> list[dict[str, t.Any]]:
+        functions = sort_functions(self.infos, sort)[:limit]
+        return [function_call(func, self.infos[func]) for func in functions]
+
+
+class ProfileAggregates:
+    """The aggregated profiles of the ``max_endpoints`` most recently
+    profiled endpoints of an app. Safe to use from multiple threads.
+    """
+
+    def __init__(self, max_endpoints: int = 20) -> None:
+        self.max_endpoints = max_endpoints
+        self._aggregates: OrderedDict[str, ProfileAggregate] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        endpoint: str,
+        total_time: float,
+        infos: c.Mapping[FuncKey, c.Sequence[t.Any]],
+    ) -> None:
+        with self._lock:
+            aggregate = self._aggregates.get(endpoint)
+
+            if aggregate is None:
+                aggregate = self._aggregates[endpoint] = ProfileAggregate(endpoint)
+            else:
+                self._aggregates.move_to_end(endpoint)
+
+            aggregate.add(total_time, infos)
+
+            while len(self._aggregates) > self.max_endpoints:
+                self._aggregates.popitem(last=False)
+
+    def get(self, endpoint: str) -> ProfileAggregate | None:
+        return self._aggregates.get(endpoint)
+
+    def __iter__(self) -> c.Iterator[ProfileAggregate]:
+        with self._lock:
+            aggregates = list(self._aggregates.values())
+
+        return iter(sorted(aggregates, key=lambda a: a.endpoint))
+
+    def __len__(self) -> int:
+        return len(self._aggregates)
+
+    def clear(self, endpoint: str | None = None) -> None:
+        with self._lock:
+            if endpoint is None:
+                self._aggregates.clear()
+            else:
+                self._aggregates.pop(endpoint, None)
+
 
 class ProfilerDebugPanel(DebugPanel):
-    """Panel that displays the time a response took with cProfile output."""
+    """Panel that displays the time a response took with cProfile output.
+
+    With ``DEBUG_TB_PROFILER_ENGINE`` set to ``"sampling"``, a
+    :class:`~flask_debugtoolbar.sampler.SamplingProfiler` is used instead.
+    The call counts are then sample counts and the times are estimates.
+    """
 
     name = "Profiler"
     user_activate = True
 
+    #: Aggregated profiles of each app, when ``DEBUG_TB_PROFILER_AGGREGATE``
+    #: is enabled
+    aggregates: t.ClassVar[weakref.WeakKeyDictionary[Flask, ProfileAggregates]] = (
+        weakref.WeakKeyDictionary()
+    )
+
     is_active: bool = False
     dump_filename: str | None = None
-    profiler: profile.Profile
+    engine: str = "cprofile"
+    profiler: profile.Profile | SamplingProfiler
     stats: pstats.Stats | None = None
+    sample_stats: dict[FuncKey, tuple[int, int, float, float]] | None = None
+    total_time: float = 0.0
+    #: All profiled functions, in the sort order
+    functions: list[FuncKey]
+    #: Table rows for the first functions
     function_calls: list[dict[str, t.Any]]
+    call_tree: CallNode | None = None
+    endpoint: str | None = None
+    #: Set when the whole request is profiled by :class:`ProfilerMiddleware`
+    request_profile: RequestProfile | None = None
 
     def __init__(
         self, jinja_env: Environment, context: dict[str, t.Any] | None = None
@@ -37,6 +434,7 @@ class ProfilerDebugPanel(DebugPanel):
         super().__init__(jinja_env, context=context)
 
         self.dump_filename = None
+        self.engine = current_app.config.get("DEBUG_TB_PROFILER_ENGINE", "cprofile")
 
         if current_app.config.get("DEBUG_TB_PROFILER_ENABLED"):
             self.is_active = True
@@ -44,6 +442,34 @@ class ProfilerDebugPanel(DebugPanel):
                 "DEBUG_TB_PROFILER_DUMP_FILENAME"
             )
 
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        sort = app.config.get("DEBUG_TB_PROFILER_SORT", "tottime")
+
+        if sort not in SORT_COLUMNS:
+            raise ValueError(
+                f"Unsupported `DEBUG_TB_PROFILER_SORT` {sort!r}, use one of"
+                f" {', '.join(map(repr, SORT_COLUMNS))}."
+            )
+
+        if app.config.get("DEBUG_TB_PROFILER_SCOPE", "view") == "request":
+            app.wsgi_app = ProfilerMiddleware(app.wsgi_app, app)  # type: ignore[method-assign]
+
+    @classmethod
+    def get_aggregates(cls, app: Flask) -> ProfileAggregates:
+        aggregates = cls.aggregates.get(app)
+
+        if aggregates is None:
+            aggregates = cls.aggregates[app] = ProfileAggregates(
+                app.config.get("DEBUG_TB_PROFILER_AGGREGATE_MAX", 20)
+            )
+
+        return aggregates
+
+    @classmethod
+    def active_by_default(cls, app: Flask) -> bool:
+        return bool(app.config.get("DEBUG_TB_PROFILER_ENABLED"))
+
     @property
     def has_content(self) -> bool:  # type: ignore[override]
         return bool(self.profiler)
@@ -52,7 +478,23 @@ class ProfilerDebugPanel(DebugPanel):
         if not self.is_active:
             return
 
-        self.profiler = profile.Profile()  # pyright: ignore
+        # A whole request profile is completed even when the response isn't
+        # processed by the toolbar, resolve what it needs while the request
+        # context is still there.
+        self.endpoint = current_request.endpoint
+
+        if callable(self.dump_filename):
+            self.dump_filename = self.dump_filename()
+
+        self.request_profile = request.environ.get(REQUEST_PROFILE_KEY)
+
+        if self.request_profile is not None:
+            self.request_profile.panel = self
+            self.request_profile.mark("before_request")
+            self.profiler = self.request_profile.profiler
+        else:
+            self.profiler = create_profiler(current_app.config)
+
         self.stats = None
 
     def process_view(
@@ -61,79 +503,141 @@ class ProfilerDebugPanel(DebugPanel):
         view_func: c.Callable[..., t.Any],
         view_kwargs: dict[str, t.Any],
     ) -> c.Callable[..., t.Any] | None:
-        if self.is_active:
-            func = functools.partial(self.profiler.runcall, view_func)
-            functools.update_wrapper(func, view_func)
-            return func
+        if not self.is_active:
+            return None
+
+        if self.request_profile is not None:
+            # the whole request is already being profiled
+            return self.request_profile.wrap_view(view_func)
 
-        return None
+        if inspect.iscoroutinefunction(view_func):
+            return instrument(view_func, CoroutineProfile(self.profiler))
+
+        func = functools.partial(self.profiler.runcall, view_func)
+        functools.update_wrapper(func, view_func)
+        return func
 
     def process_response(self, request: Request, response: Response) -> None:
         if not self.is_active:
             return
 
-        if self.profiler is not None:
-            self.profiler.disable()  # pyright: ignore
+        if self.profiler is None:
+            return
+
+        if self.request_profile is not None:
+            # Profiling goes on until the response is sent. Show what was
+            # recorded so far, the profile is completed by finish().
+            self.request_profile.mark("toolbar")
+            self._collect(final=False)
+            return
 
+        self.profiler.disable()  # pyright: ignore
+        self._collect()
+
+    def finish(self) -> None:
+        """Complete a whole request profile once the response was sent.
+        Called with an app context by :class:`ProfilerMiddleware`.
+        """
+        self._collect()
+
+    def _collect(self, final: bool = True) -> None:
+        sort = current_app.config.get("DEBUG_TB_PROFILER_SORT", "tottime")
+
+        if isinstance(self.profiler, SamplingProfiler):
+            # With the sampling engine, the number of calls is the number of
+            # samples the function was seen in
+            sample_stats = self.profiler.function_stats()
+            self.sample_stats = {
+                func: (samples, samples, tottime, cumtime)
+                for func, (samples, tottime, cumtime) in sample_stats.items()
+            }
+            self.total_time = self.profiler.elapsed()
+            self.call_tree = tree_from_stacks(dict(self.profiler.stacks))
+        else:
             try:
+                # this disables the profiler
                 stats = pstats.Stats(self.profiler)
             except TypeError:
                 self.is_active = False
                 return
 
-            function_calls: list[dict[str, t.Any]] = []
+            coroutine_profiler = (
+                self.request_profile.coroutine_profiler
+                if self.request_profile is not None
+                else None
+            )
 
-            for func in stats.sort_stats(1).fcn_list:  # type: ignore[attr-defined]
-                current: dict[str, t.Any] = {}
-                info = stats.stats[func]  # type: ignore[attr-defined]
+            if coroutine_profiler is not None:
+                stats.add(coroutine_profiler)
 
-                # Number of calls
-                if info[0] != info[1]:
-                    current["ncalls"] = f"{info[1]}/{info[0]}"
-                else:
-                    current["ncalls"] = info[1]
+            if not final:
+                self.profiler.enable()
 
-                # Total time
-                current["tottime"] = info[2] * 1000
+            self.stats = stats
+            self.total_time = stats.total_tt  # type: ignore[attr-defined]
+            self.call_tree = tree_from_pstats(stats)
 
-                # Quotient of total time divided by number of calls
-                if info[1]:
-                    current["percall"] = info[2] * 1000 / info[1]
-                else:
-                    current["percall"] = 0
+        self.functions = sort_functions(self.function_infos(), sort)
+        self.function_calls = self.get_function_calls(
+            current_app.config.get("DEBUG_TB_PROFILER_MAX_ROWS", 100)
+        )
 
-                # Cumulative time
-                current["cumtime"] = info[3] * 1000
+        if not final:
+            return
 
-                # Quotient of the cumulative time divided by the number of
-                # primitive calls.
-                if info[0]:
-                    current["percall_cum"] = info[3] * 1000 / info[0]
-                else:
-                    current["percall_cum"] = 0
+        if self.dump_filename:
+            self.dump()
 
-                # Filename
-                filename = pstats.func_std_string(func)  # type: ignore[attr-defined]
-                current["filename_long"] = filename
-                current["filename"] = format_fname(filename)
-                function_calls.append(current)
+        if current_app.config.get("DEBUG_TB_PROFILER_AGGREGATE") and self.endpoint:
+            app = current_app._get_current_object()  # type: ignore[attr-defined]
+            self.get_aggregates(app).add(
+                self.endpoint, self.total_time, self.function_infos()
+            )
 
-            self.stats = stats
-            self.function_calls = function_calls
+    def dump(self) -> None:
+        """Queue the profile to be written to ``DEBUG_TB_PROFILER_DUMP_FILENAME``
+        by the background writer.
+        """
+        stats: StatsDict
+
+        if self.sample_stats is not None:
+            stats = {func: (*info, {}) for func, info in self.sample_stats.items()}
+        else:
+            stats = self.stats.stats  # type: ignore[union-attr]
+
+        config = current_app.config
+        writer.submit(
+            ProfileDump(
+                self.dump_filename,  # type: ignore[arg-type]
+                config.get("DEBUG_TB_PROFILER_DUMP_FORMAT", "pstats"),
+                stats,
+                self.call_tree,  # type: ignore[arg-type]
+                backups=config.get("DEBUG_TB_PROFILER_DUMP_BACKUPS", 0),
+                max_bytes=config.get("DEBUG_TB_PROFILER_DUMP_MAX_BYTES"),
+                logger=current_app.logger,
+            )
+        )
+
+    def get_function_calls(self, limit: int | None = None) -> list[dict[str, t.Any]]:
+        """Table rows for the first ``limit`` functions in the sort order, or
+        for all of them. Rows are only built when needed, formatting the
+        function names of a large profile takes a while.
+        """
+        infos = self.function_infos()
+        return [function_call(func, infos[func]) for func in self.functions[:limit]]
 
-            if self.dump_filename:
-                if callable(self.dump_filename):
-                    filename = self.dump_filename()
-                else:
-                    filename = self.dump_filename
+    def function_infos(self) -> c.Mapping[FuncKey, c.Sequence[t.Any]]:
+        """The :mod:`pstats` entry of each profiled function."""
+        if self.sample_stats is not None:
+            return self.sample_stats
 
-                self.profiler.dump_stats(filename)
+        return self.stats.stats  # type: ignore[no-any-return, union-attr]
 
     def title(self) -> str:
         if not self.is_active:
             return "Profiler not active"
 
-        return f"View: {float(self.stats.total_tt) * 1000:.2f}ms"  # type: ignore[union-attr]
+        return f"{self.scope_label()}: {self.total_time * 1000:.2f}ms"
 
     def nav_title(self) -> str:
         return "Profiler"
@@ -142,7 +646,14 @@ class ProfilerDebugPanel(DebugPanel):
         if not self.is_active:
             return "in-active"
 
-        return f"View: {float(self.stats.total_tt) * 1000:.2f}ms"  # type: ignore[union-attr]
+        return f"{self.scope_label()}: {self.total_time * 1000:.2f}ms"
+
+    def needs_history(self) -> bool:
+        # for showing all functions and downloading the call tree
+        return self.is_active and self.has_content
+
+    def scope_label(self) -> str:
+        return "View" if self.request_profile is None else "Request"
 
     def url(self) -> str:
         return ""
@@ -152,7 +663,105 @@ class ProfilerDebugPanel(DebugPanel):
             return "The profiler is not activated, activate it to use it"
 
         context = {
+            "request_id": self.context["request_id"],
             "stats": self.stats,
+            "engine": self.engine,
             "function_calls": self.function_calls,
+            "function_count": len(self.functions),
+            "aggregate": current_app.config.get("DEBUG_TB_PROFILER_AGGREGATE"),
+            "call_tree": self.call_tree,
+            "phases": (
+                self.request_profile.phase_times()
+                if self.request_profile is not None
+                else []
+            ),
         }
         return self.render("panels/profiler.html", context)
+
+
+@module.route("/profiler/<request_id>/functions")
+def profiler_functions(request_id: str) -> str:
+    """Render the table rows of all the functions of a recent request's
+    profile, when the panel only shows the first ones.
+    """
+    panel = g.debug_toolbar.get_panel(request_id, ProfilerDebugPanel.dom_id())
+
+    if not isinstance(panel, ProfilerDebugPanel) or not panel.is_active:
+        abort(404)
+
+    return panel.render(
+        "panels/profiler_rows.html",
+        {"function_calls": panel.get_function_calls()},
+    )
+
+
+@module.route("/profiler/<request_id>/collapsed")
+def profiler_collapsed_stacks(request_id: str) -> FlaskResponse:
+    """Download the call tree of a recent request as collapsed stacks, for
+    ``flamegraph.pl`` or speedscope.
+    """
+    panel = g.debug_toolbar.get_panel(request_id, ProfilerDebugPanel.dom_id())
+
+    if not isinstance(panel, ProfilerDebugPanel) or panel.call_tree is None:
+        abort(404)
+
+    return FlaskResponse(
+        collapsed_stacks(panel.call_tree),
+        mimetype="text/plain",
+        headers={
+            "Content-Disposition": f"attachment; filename=profile-{request_id}.txt"
+        },
+    )
+
+
+def _aggregates() -> ProfileAggregates:
+    if not current_app.config.get("DEBUG_TB_PROFILER_AGGREGATE"):
+        abort(404)
+
+    return ProfilerDebugPanel.get_aggregates(
+        current_app._get_current_object()  # type: ignore[attr-defined]
+    )
+
+
+@module.route("/profiler/aggregate")
+def profiler_aggregates() -> str:
+    """List the endpoints with an aggregated profile."""
+    return g.debug_toolbar.render(  # type: ignore[no-any-return]
+        "panels/profiler_aggregate.html",
+        {
+            "static_path": url_for("_debug_toolbar.static", filename=""),
+            "aggregates": list(_aggregates()),
+            "aggregate": None,
+        },
+    )
+
+
+@module.route("/profiler/aggregate/<name>")
+def profiler_aggregate(name: str) -> str:
+    """Show the aggregated profile of the endpoint ``name``."""
+    aggregate = _aggregates().get(name)
+
+    if aggregate is None:
+        abort(404)
+
+    show_all = "all" in current_request.args
+    limit = (
+        None if show_all else current_app.config.get("DEBUG_TB_PROFILER_MAX_ROWS", 100)
+    )
+    sort = current_app.config.get("DEBUG_TB_PROFILER_SORT", "tottime")
+    return g.debug_toolbar.render(  # type: ignore[no-any-return]
+        "panels/profiler_aggregate.html",
+        {
+            "static_path": url_for("_debug_toolbar.static", filename=""),
+            "aggregate": aggregate,
+            "function_calls": aggregate.get_function_calls(sort, limit),
+            "function_count": len(aggregate.infos),
+        },
+    )
+
+
+@module.route("/profiler/aggregate-reset", methods=["POST"])
+def profiler_aggregate_reset() -> Response:
+    """Forget the aggregated profile of an endpoint, or of all of them."""
+    _aggregates().clear(current_request.form.get("endpoint"))
+    return redirect(url_for("debugtoolbar.profiler_aggregates"))
@@ -5,6 +5,7 @@ import typing as t
 
 from flask import session
 from werkzeug import Request
+from werkzeug import Response
 
 from . import DebugPanel
 
@@ -25,8 +26,6 @@ class RequestVarsDebugPanel(DebugPanel):
         return ""
 
     def process_request(self, request: Request) -> None:
-        self.request = request
-        self.session = session
         self.view_func: c.Callable[..., t.Any] | None = None
         self.view_kwargs: dict[str, t.Any] = {}
 
@@ -39,21 +38,23 @@ class RequestVarsDebugPanel(DebugPanel):
         self.view_func = view_func
         self.view_kwargs = view_kwargs
 
+    def process_response(self, request: Request, response: Response) -> None:
+        # Snapshot the variables so the panel can be rendered after the
+        # request context is gone, without keeping the request alive.
+        self.variables: dict[str, t.Any] = {
+            "get": list(request.args.lists()),
+            "post": list(request.form.lists()),
+            "cookies": list(request.cookies.items()),
+            "view_func": (
+                f"{self.view_func.__module__}.{self.view_func.__name__}"
+                if self.view_func
+                else "[unknown]"
+            ),
+            "view_kwargs": self.view_kwargs or {},
+            "session": list(session.items()),
+        }
+
     def content(self) -> str:
         context = self.context.copy()
-        context.update(
-            {
-                "get": self.request.args.lists(),
-                "post": self.request.form.lists(),
-                "cookies": self.request.cookies.items(),
-                "view_func": (
-                    f"{self.view_func.__module__}.{self.view_func.__name__}"
-                    if self.view_func
-                    else "[unknown]"
-                ),
-                "view_kwargs": self.view_kwargs or {},
-                "session": self.session.items(),
-            }
-        )
-
+        context.update(self.variables)
         return self.render("panels/request_vars.html", context)
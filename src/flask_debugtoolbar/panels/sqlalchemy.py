@@ -5,41 +5,32 @@ import typing as t
 import itsdangerous
 from flask import abort
 from flask import current_app
+from flask import Flask
 from flask import g
 from flask import request
+from markupsafe import escape
+from werkzeug import Request
+from werkzeug import Response
 
 from .. import module
+from ..explain import driver_params
+from ..explain import explain
+from ..sqlrecorder import HAVE_SQLALCHEMY
+from ..sqlrecorder import listen
+from ..sqlrecorder import QueryRecorder
+from ..sqlrecorder import RecordedQuery
+from ..sqlrecorder import start_recording
+from ..sqlrecorder import stop_recording
+from ..utils import decode_text
+from ..utils import fingerprint_sql
 from ..utils import format_fname
 from ..utils import format_sql
 from . import DebugPanel
 
-try:
-    from flask_sqlalchemy import SQLAlchemy
-except ImportError:
-    sqlalchemy_available: bool = False
-    get_recorded_queries = SQLAlchemy = None  # type: ignore[misc, assignment]
-    debug_enables_record_queries: bool = False
-else:
-    try:
-        from flask_sqlalchemy.record_queries import (  # type: ignore[assignment]
-            get_recorded_queries,
-        )
-
-        debug_enables_record_queries = False
-    except ImportError:
-        # For flask_sqlalchemy < 3.0.0
-        from flask_sqlalchemy import (  # type: ignore[no-redef]
-            get_debug_queries as get_recorded_queries,
-        )
-
-        # flask_sqlalchemy < 3.0.0 automatically enabled
-        # SQLALCHEMY_RECORD_QUERIES in debug or test mode
-        debug_enables_record_queries = True
-        location_property: str = "context"
-    else:
-        location_property = "location"
-
-    sqlalchemy_available = True
+#: Key of the panel recording the request's queries in the WSGI environ, so
+#: that recording is stopped in ``teardown_request`` if the response was
+#: never processed
+SQLALCHEMY_PANEL_KEY = "flask_debugtoolbar.sqlalchemy_panel"
 
 
 def query_signer() -> itsdangerous.URLSafeSerializer:
@@ -57,48 +48,96 @@ def is_select(statement: str | bytes) -> bool:
     return statement.startswith("select")  # pyright: ignore
 
 
-def dump_query(statement: str, params: t.Any) -> str | None:
-    if not params or not is_select(statement):
+def dump_query(statement: str, params: t.Any, bind: str) -> str | None:
+    if not is_select(statement):
         return None
 
     try:
-        return query_signer().dumps([statement, params])
+        return query_signer().dumps([statement, params, bind])
     except TypeError:
         return None
 
 
-def load_query(data: str) -> tuple[str, t.Any]:
+def load_query(data: str) -> tuple[str, t.Any, str]:
     try:
-        statement, params = query_signer().loads(data)
-    except (itsdangerous.BadSignature, TypeError):
+        statement, params, bind = query_signer().loads(data)
+    except (itsdangerous.BadSignature, TypeError, ValueError):
         abort(406)
 
     # Make sure it is a select statement
     if not is_select(statement):
         abort(406)
 
-    return statement, params
+    return statement, params, bind
+
 
+def is_available() -> bool:
+    return HAVE_SQLALCHEMY
 
-def extension_used() -> bool:
-    return "sqlalchemy" in current_app.extensions
 
+def app_binds() -> dict[str, t.Any]:
+    """The engines of the application's Flask-SQLAlchemy extension, by bind
+    key, ``"default"`` for the default engine.
+    """
+    db = current_app.extensions.get("sqlalchemy")
+    return {
+        bind_key or "default": engine
+        for bind_key, engine in getattr(db, "engines", {}).items()
+    }
 
-def recording_enabled() -> bool:
-    return (
-        debug_enables_record_queries and current_app.debug
-    ) or current_app.config.get("SQLALCHEMY_RECORD_QUERIES", False)
 
+def get_engine(bind: str) -> t.Any:
+    engine = app_binds().get(bind)
 
-def is_available() -> bool:
-    return sqlalchemy_available and extension_used() and recording_enabled()
+    if engine is None:
+        abort(404)
+
+    return engine
+
+
+class QueryGroup:
+    """The queries of a request with the same fingerprint, run from the same
+    location.
+    """
+
+    def __init__(self, fingerprint: str, location: str) -> None:
+        self.fingerprint = fingerprint
+        self.location = location
+        self.count = 0
+        self.duration = 0.0
+        #: Whether the same ``SELECT`` ran often enough to look like an N+1
+        #: query, run once for each row of a previous query
+        self.n_plus_one = False
+
+    @property
+    def mean_duration(self) -> float:
+        return self.duration / self.count
 
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
 
-def get_queries() -> list[t.Any]:
-    if get_recorded_queries:
-        return get_recorded_queries()
-    else:
-        return []
+
+def group_queries(queries: list[RecordedQuery], threshold: int) -> list[QueryGroup]:
+    """Group recorded queries by fingerprint and location, the longest
+    total duration first. Groups of at least ``threshold`` ``SELECT``
+    queries are flagged as N+1 queries.
+    """
+    groups: dict[tuple[str, str], QueryGroup] = {}
+
+    for query in queries:
+        key = fingerprint_sql(query.statement), query.location
+        group = groups.get(key)
+
+        if group is None:
+            group = groups[key] = QueryGroup(*key)
+
+        group.add(query.duration)
+
+    for group in groups.values():
+        group.n_plus_one = group.count >= threshold and is_select(group.fingerprint)
+
+    return sorted(groups.values(), key=lambda group: group.duration, reverse=True)
 
 
 class SQLAlchemyDebugPanel(DebugPanel):
@@ -106,20 +145,86 @@ class SQLAlchemyDebugPanel(DebugPanel):
 
     name = "SQLAlchemy"
 
+    recorder: QueryRecorder | None = None
+    queries: list[RecordedQuery] | None = None
+    groups: list[QueryGroup] | None = None
+
+    @classmethod
+    def init_app(cls, app: Flask) -> None:
+        if HAVE_SQLALCHEMY:
+            listen()
+            app.teardown_request(cls._teardown_request)
+
+    def process_request(self, request: Request) -> None:
+        if not HAVE_SQLALCHEMY:
+            return
+
+        self.recorder = QueryRecorder(
+            current_app.import_name,
+            current_app.config.get("DEBUG_TB_SQL_STACK_FRAMES", 10),
+            current_app.config.get("DEBUG_TB_SQL_MAX_BYTES", 1024 * 1024),
+            {engine: bind for bind, engine in app_binds().items()},
+        )
+        self._token = start_recording(self.recorder)
+        request.environ[SQLALCHEMY_PANEL_KEY] = self
+
+    def process_response(self, request: Request, response: Response) -> None:
+        if self.recorder is None:
+            return
+
+        self._stop()
+        self.queries = self.recorder.queries
+        self.groups = group_queries(
+            self.queries, current_app.config.get("DEBUG_TB_N_PLUS_ONE_THRESHOLD", 10)
+        )
+
+    def _stop(self) -> None:
+        token = self.__dict__.pop("_token", None)
+
+        if token is not None:
+            stop_recording(token)
+
+    @staticmethod
+    def _teardown_request(exc: BaseException | None) -> None:
+        panel = request.environ.pop(SQLALCHEMY_PANEL_KEY, None)
+
+        if panel is not None:
+            panel._stop()
+
+    def get_queries(self) -> list[RecordedQuery]:
+        return self.queries or []
+
+    def dropped(self) -> int:
+        return self.recorder.dropped if self.recorder else 0
+
+    def n_plus_one_count(self) -> int:
+        return sum(group.n_plus_one for group in self.groups or ())
+
     @property
     def has_content(self) -> bool:  # type: ignore[override]
-        return bool(get_queries()) or not is_available()
+        return bool(self.get_queries()) or not is_available()
+
+    def needs_history(self) -> bool:
+        # for formatting the queries when they're clicked
+        return bool(self.get_queries()) and current_app.config.get(
+            "DEBUG_TB_DEFER_SQL_FORMATTING", False
+        )
 
     def nav_title(self) -> str:
         return "SQLAlchemy"
 
     def nav_subtitle(self) -> str:
-        count = len(get_queries())
+        count = len(self.get_queries()) + self.dropped()
 
         if not count and not is_available():
             return "Unavailable"
 
         plural = "query" if count == 1 else "queries"
+        n_plus_one = self.n_plus_one_count()
+
+        if n_plus_one:
+            return f"{count} {plural}, {n_plus_one} N+1"
+
         return f"{count} {plural}"
 
     def title(self) -> str:
@@ -129,58 +234,136 @@ class SQLAlchemyDebugPanel(DebugPanel):
         return ""
 
     def content(self) -> str:
-        queries = get_queries()
+        queries = self.get_queries()
 
         if not queries and not is_available():
-            return self.render(
-                "panels/sqlalchemy_error.html",
-                {
-                    "sqlalchemy_available": sqlalchemy_available,
-                    "extension_used": extension_used(),
-                    "recording_enabled": recording_enabled(),
-                },
-            )
+            return self.render("panels/sqlalchemy_error.html", {})
 
+        # with many queries, formatting is most of the panel's render time
+        defer = current_app.config.get("DEBUG_TB_DEFER_SQL_FORMATTING", False)
+        # only the application's engines can run a query again
+        app_bind_keys = app_binds().keys()
         data = []
 
         for query in queries:
             data.append(
                 {
                     "duration": query.duration,
-                    "sql": format_sql(query.statement, query.parameters),
-                    "signed_query": dump_query(query.statement, query.parameters),
-                    "location_long": getattr(query, location_property),
-                    "location": format_fname(getattr(query, location_property)),
+                    "sql": (
+                        decode_text(query.statement)
+                        if defer
+                        else format_sql(query.statement, query.parameters)
+                    ),
+                    "signed_query": (
+                        dump_query(query.statement, query.parameters, query.bind)
+                        if query.bind in app_bind_keys
+                        else None
+                    ),
+                    "location_long": "\n".join(
+                        f"{filename}:{lineno} ({name})"
+                        for filename, lineno, name in query.stack
+                    ),
+                    "location": format_fname(query.location),
+                    "bind": query.bind,
+                    "rowcount": query.rowcount,
+                    "batch_size": query.batch_size,
                 }
             )
 
-        return self.render("panels/sqlalchemy.html", {"queries": data})
+        groups = [
+            {
+                "fingerprint": (
+                    group.fingerprint if defer else format_sql(group.fingerprint, ())
+                ),
+                "location_long": group.location,
+                "location": format_fname(group.location),
+                "count": group.count,
+                "duration": group.duration,
+                "mean_duration": group.mean_duration,
+                "n_plus_one": group.n_plus_one,
+            }
+            for group in self.groups or ()
+        ]
+        return self.render(
+            "panels/sqlalchemy.html",
+            {
+                "request_id": self.context["request_id"],
+                "queries": data,
+                "groups": groups,
+                "n_plus_one": self.n_plus_one_count(),
+                "defer": defer,
+                "show_binds": len({query.bind for query in queries}) > 1,
+                "dropped": self.dropped(),
+                "dropped_time": self.recorder.dropped_time if self.recorder else 0.0,
+            },
+        )
 
 
 # Panel views
 
 
 @module.route("/sqlalchemy/sql_select", methods=["GET", "POST"])
-@module.route(
-    "/sqlalchemy/sql_explain", methods=["GET", "POST"], defaults=dict(explain=True)
-)
-def sql_select(explain: bool = False) -> str:
-    statement, params = load_query(request.args["query"])
-    engine = current_app.extensions["sqlalchemy"].engine
+def sql_select() -> str:
+    statement, params, bind = load_query(request.args["query"])
 
-    if explain:
-        if engine.driver == "pysqlite":
-            statement = f"EXPLAIN QUERY PLAN\n{statement}"
-        else:
-            statement = f"EXPLAIN\n{statement}"
+    with get_engine(bind).connect() as connection:
+        result = connection.exec_driver_sql(statement, driver_params(params))
+        headers = list(result.keys())
+        rows = result.fetchall()
 
-    result = engine.execute(statement, params)
     return g.debug_toolbar.render(  # type: ignore[no-any-return]
         "panels/sqlalchemy_select.html",
         {
-            "result": result.fetchall(),
-            "headers": result.keys(),
+            "result": rows,
+            "headers": headers,
             "sql": format_sql(statement, params),
             "duration": float(request.args["duration"]),
         },
     )
+
+
+@module.route(
+    "/sqlalchemy/sql_explain", methods=["GET", "POST"], defaults=dict(analyze=False)
+)
+@module.route(
+    "/sqlalchemy/sql_explain_analyze",
+    methods=["GET", "POST"],
+    defaults=dict(analyze=True),
+)
+def sql_explain(analyze: bool) -> str:
+    statement, params, bind = load_query(request.args["query"])
+    plan = explain(get_engine(bind), statement, params, analyze=analyze)
+    return g.debug_toolbar.render(  # type: ignore[no-any-return]
+        "panels/sqlalchemy_explain.html",
+        {
+            "plan": plan,
+            "sql": format_sql(plan.statement, plan.params),
+            "duration": float(request.args["duration"]),
+        },
+    )
+
+
+@module.route("/sqlalchemy/<request_id>/queries/<int:index>/sql")
+@module.route(
+    "/sqlalchemy/<request_id>/groups/<int:index>/sql", defaults=dict(group=True)
+)
+def sql_format(request_id: str, index: int, group: bool = False) -> str:
+    """Format and highlight a statement of a recent request, when
+    ``DEBUG_TB_DEFER_SQL_FORMATTING`` leaves it until its row is clicked.
+    """
+    panel = g.debug_toolbar.get_panel(request_id, SQLAlchemyDebugPanel.dom_id())
+
+    if not isinstance(panel, SQLAlchemyDebugPanel) or panel.groups is None:
+        abort(404)
+
+    try:
+        if group:
+            sql = format_sql(panel.groups[index].fingerprint, ())
+        else:
+            query = panel.get_queries()[index]
+            sql = format_sql(query.statement, query.parameters)
+    except IndexError:
+        abort(404)
+
+    # plain text without Pygments
+    return escape(sql)
@@ -4,7 +4,6 @@ import json
 import sys
 import typing as t
 import uuid
-from collections import deque
 
 from flask import abort
 from flask import current_app
@@ -14,10 +13,15 @@ from flask import Response
 from flask import template_rendered
 from flask import url_for
 from jinja2 import Template
+from werkzeug import Request
+from werkzeug import Response as BaseResponse
 
 from .. import module
 from . import DebugPanel
 
+#: Template context variables added by Flask that refer to the request
+REQUEST_GLOBALS = frozenset(("request", "session", "g"))
+
 
 class TemplateDebugPanel(DebugPanel):
     """Panel that displays the time a response took in milliseconds."""
@@ -25,30 +29,41 @@ class TemplateDebugPanel(DebugPanel):
     name = "Template"
     has_content = True
 
-    # save the context for the 5 most recent requests
-    template_cache: deque[tuple[str, list[dict[str, t.Any]]]] = deque(maxlen=5)
-
     @classmethod
     def get_cache_for_key(cls, key: str) -> list[dict[str, t.Any]]:
-        for cache_key, value in cls.template_cache:
-            if key == cache_key:
-                return value
+        """Return the templates rendered during a recent request, looked up
+        by its request id in the toolbar's request history.
+        """
+        panel = g.debug_toolbar.get_panel(key, cls.dom_id())
+
+        if panel is None:
+            raise KeyError(key)
 
-        raise KeyError(key)
+        return panel.templates  # type: ignore[no-any-return]
 
     def __init__(self, *args: t.Any, **kwargs: t.Any) -> None:
         super().__init__(*args, **kwargs)
-        self.key: str = str(uuid.uuid4())
+        self.key: str = self.context.get("request_id") or uuid.uuid4().hex
         self.templates: list[dict[str, t.Any]] = []
         template_rendered.connect(self._store_template_info)
 
-    def _store_template_info(self, sender: t.Any, **kwargs: t.Any) -> None:
-        # only record in the cache if the editor is enabled and there is
-        # actually a template for this request
-        if not self.templates and is_editor_enabled():
-            self.template_cache.append((self.key, self.templates))
+    def _store_template_info(
+        self, sender: t.Any, template: Template, context: dict[str, t.Any]
+    ) -> None:
+        # The editor previews templates with their original context, otherwise
+        # don't keep the request alive in the request history.
+        if not is_editor_enabled():
+            context = {k: v for k, v in context.items() if k not in REQUEST_GLOBALS}
+
+        self.templates.append({"template": template, "context": context})
+
+    def process_response(self, request: Request, response: BaseResponse) -> None:
+        # The panel is kept in the request history, stop recording templates
+        # rendered by later requests.
+        template_rendered.disconnect(self._store_template_info)
 
-        self.templates.append(kwargs)
+    def needs_history(self) -> bool:
+        return bool(self.templates) and is_editor_enabled()
 
     def nav_title(self) -> str:
         return "Templates"
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import collections.abc as c
+import inspect
 import time
+import typing as t
 
 from werkzeug import Request
 from werkzeug import Response
 
+from ..coroutines import AsyncTiming
+from ..coroutines import instrument
+from ..gcpauses import GC_RECORDER_KEY
 from . import DebugPanel
 
 try:
@@ -21,28 +27,58 @@ class TimerDebugPanel(DebugPanel):
     name = "Timer"
     has_content = HAVE_RESOURCE
 
+    #: Set when the view is a coroutine function
+    async_timing: AsyncTiming | None = None
+    #: Garbage collections so far, when the garbage collector panel is enabled
+    gc_collections: int | None = None
+    gc_time = 0.0
+
     def process_request(self, request: Request) -> None:
         self._start_time = time.time()
 
         if HAVE_RESOURCE:
             self._start_rusage = resource.getrusage(resource.RUSAGE_SELF)
 
+    def process_view(
+        self,
+        request: Request,
+        view_func: c.Callable[..., t.Any],
+        view_kwargs: dict[str, t.Any],
+    ) -> c.Callable[..., t.Any] | None:
+        if not inspect.iscoroutinefunction(view_func):
+            return None
+
+        # the event loop runs in another thread, which the resource usage
+        # of the request doesn't tell apart from waiting for it
+        self.async_timing = AsyncTiming()
+        return instrument(view_func, self.async_timing)
+
     def process_response(self, request: Request, response: Response) -> None:
         self.total_time: float = (time.time() - self._start_time) * 1000
 
         if HAVE_RESOURCE:
             self._end_rusage = resource.getrusage(resource.RUSAGE_SELF)
 
+        recorder = request.environ.get(GC_RECORDER_KEY)
+
+        if recorder is not None:
+            self.gc_collections = len(recorder.collections)
+            self.gc_time = recorder.total_time * 1000
+
     def nav_title(self) -> str:
         return "Time"
 
     def nav_subtitle(self) -> str:
+        # only worth the space when the request was paused
+        gc = f", GC: {self.gc_time:0.2f}ms" if self.gc_collections else ""
+
         if not HAVE_RESOURCE:
-            return f"TOTAL: {self.total_time:0.2f}ms"
+            return f"TOTAL: {self.total_time:0.2f}ms{gc}"
 
         utime = self._end_rusage.ru_utime - self._start_rusage.ru_utime
         stime = self._end_rusage.ru_stime - self._start_rusage.ru_stime
-        return f"CPU: {(utime + stime) * 1000.0:0.2f}ms ({self.total_time:0.2f}ms)"
+        cpu = (utime + stime) * 1000.0
+        return f"CPU: {cpu:0.2f}ms ({self.total_time:0.2f}ms){gc}"
 
     def title(self) -> str:
         return "Resource Usage"
@@ -71,7 +107,7 @@ class TimerDebugPanel(DebugPanel):
         # srss = self._end_rusage.ru_ixrss
         # urss = self._end_rusage.ru_idrss
         # usrss = self._end_rusage.ru_isrss
-        rows = (
+        rows = [
             ("User CPU time", f"{utime:0.3f} msec"),
             ("System CPU time", f"{stime:0.3f} msec"),
             ("Total CPU time", f"{(utime + stime):0.3f} msec"),
@@ -83,7 +119,32 @@ class TimerDebugPanel(DebugPanel):
             # ),
             # ("Page faults", f"{minflt} no i/o, {majflt} requiring i/o"),
             # ("Disk operations", f"{blkin} in, {blkout} out, {swap} swapout"),
-        )
+        ]
+
+        if self.gc_collections is not None:
+            rows.append(
+                (
+                    "Garbage collection pauses",
+                    f"{self.gc_time:0.3f} msec in {self.gc_collections} collections",
+                )
+            )
+
+        if self.async_timing is not None:
+            timing = self.async_timing
+            rows += [
+                ("Async view time", f"{timing.wall * 1000:0.3f} msec"),
+                ("Async view CPU time", f"{timing.cpu * 1000:0.3f} msec"),
+                (
+                    "Async view blocking time",
+                    f"{timing.blocking * 1000:0.3f} msec",
+                ),
+                (
+                    "Async view awaiting time",
+                    f"{timing.awaiting * 1000:0.3f} msec,"
+                    f" suspended {timing.steps - 1} times",
+                ),
+            ]
+
         context = self.context.copy()
         context.update(
             {
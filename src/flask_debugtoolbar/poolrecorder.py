@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import functools
+import threading
+import typing as t
+from contextvars import ContextVar
+from contextvars import Token
+from time import perf_counter
+
+try:
+    from sqlalchemy import event
+    from sqlalchemy.pool import Pool
+except ImportError:
+    HAVE_SQLALCHEMY = False
+else:
+    HAVE_SQLALCHEMY = True
+
+#: Keys in the ``info`` of a pooled connection, its current :class:`Checkout`
+#: while recording, and whether it was just opened
+CHECKOUT_KEY = "flask_debugtoolbar.checkout"
+NEW_KEY = "flask_debugtoolbar.new"
+
+_current: ContextVar[PoolRecorder | None] = ContextVar(
+    "flask_debugtoolbar.pool_recorder", default=None
+)
+_lock = threading.Lock()
+
+
+def pool_status(pool: Pool) -> dict[str, int | None]:
+    """The size and usage of a pool. Only :class:`~sqlalchemy.pool.QueuePool`
+    reports them all, other pools report ``None``.
+    """
+    status: dict[str, int | None] = {}
+
+    for name in ("size", "overflow", "checkedout", "checkedin"):
+        value = getattr(pool, name, None)
+
+        # SingletonThreadPool.size is an attribute
+        if callable(value):
+            value = value()
+
+        status[name] = value if isinstance(value, int) else None
+
+    status["max_overflow"] = getattr(pool, "_max_overflow", None)
+    return status
+
+
+class Checkout:
+    """A connection checked out of a pool while recording. Times are from
+    :func:`time.perf_counter`.
+    """
+
+    def __init__(self, pool: Pool, start: float, new: bool) -> None:
+        self.pool_id = id(pool)
+        self.start = start
+        #: Whether a connection was opened for this checkout
+        self.new = new
+        #: Seconds waited for the connection, including opening it, ``None``
+        #: if the pool wasn't instrumented yet
+        self.wait: float | None = None
+        #: When the connection was checked back in, ``None`` while it's held
+        self.end: float | None = None
+
+    @property
+    def held(self) -> float:
+        """Seconds the connection was held, until now if it still is."""
+        end = self.end if self.end is not None else perf_counter()
+        return end - self.start
+
+
+class PoolUsage:
+    """The use of a pool by the recorded request, with its status at the
+    busiest checkout.
+    """
+
+    def __init__(self, pool: Pool) -> None:
+        self.pool = pool
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def update(self) -> None:
+        status = pool_status(self.pool)
+        self.peak_checked_out = max(self.peak_checked_out, status["checkedout"] or 0)
+        self.peak_overflow = max(self.peak_overflow, status["overflow"] or 0)
+
+
+class PoolRecorder:
+    """The connections checked out in the current context while recording.
+    A connection checked out while recording is followed until it's checked
+    in, even if recording has stopped, for example when the session is only
+    removed once the request has ended.
+    """
+
+    def __init__(self) -> None:
+        self.checkouts: list[Checkout] = []
+        self.pools: dict[int, PoolUsage] = {}
+
+
+def listen() -> None:
+    """Listen to the events of all SQLAlchemy pools. The listeners only
+    record anything while :func:`start_recording` is active in the current
+    context.
+    """
+    with _lock:
+        if not event.contains(Pool, "checkout", _on_checkout):
+            event.listen(Pool, "connect", _on_connect)
+            event.listen(Pool, "checkout", _on_checkout)
+            event.listen(Pool, "checkin", _on_checkin)
+
+
+def start_recording(recorder: PoolRecorder) -> Token[PoolRecorder | None]:
+    return _current.set(recorder)
+
+
+def stop_recording(token: Token[PoolRecorder | None]) -> None:
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A streamed response is processed in another context than the one
+        # recording started in.
+        _current.set(None)
+
+
+def instrument_pool(pool: Pool) -> None:
+    """Time :meth:`~sqlalchemy.pool.Pool.connect` of a pool, there is no
+    event before a connection is requested. Pools are instrumented while
+    recording, by the first checkout of a pool if it wasn't instrumented yet,
+    so the wait of that checkout isn't known.
+    """
+    if "connect" in pool.__dict__:
+        return
+
+    connect = pool.connect
+
+    @functools.wraps(connect)
+    def timed_connect() -> t.Any:
+        if _current.get() is None:
+            return connect()
+
+        start = perf_counter()
+        connection = connect()
+        checkout = connection.info.get(CHECKOUT_KEY)
+
+        if checkout is not None and checkout.wait is None:
+            checkout.wait = checkout.start - start
+
+        return connection
+
+    pool.connect = timed_connect  # type: ignore[method-assign]
+
+
+def _on_connect(dbapi_connection: t.Any, connection_record: t.Any) -> None:
+    if _current.get() is not None:
+        connection_record.info[NEW_KEY] = True
+
+
+def _on_checkout(
+    dbapi_connection: t.Any, connection_record: t.Any, connection_proxy: t.Any
+) -> None:
+    recorder = _current.get()
+
+    if recorder is None:
+        return
+
+    pool = connection_proxy._pool
+    instrument_pool(pool)
+    new = connection_record.info.pop(NEW_KEY, False)
+    checkout = Checkout(pool, perf_counter(), new)
+    recorder.checkouts.append(checkout)
+    connection_record.info[CHECKOUT_KEY] = checkout
+    usage = recorder.pools.get(id(pool))
+
+    if usage is None:
+        usage = recorder.pools[id(pool)] = PoolUsage(pool)
+
+    usage.update()
+
+
+def _on_checkin(dbapi_connection: t.Any, connection_record: t.Any) -> None:
+    # the connection may have been invalidated, without a record
+    if connection_record is None:
+        return
+
+    checkout = connection_record.info.pop(CHECKOUT_KEY, None)
+
+    if checkout is not None:
+        checkout.end = perf_counter()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import collections.abc as c
+import sys
+import threading
+import time
+import typing as t
+from types import FrameType
+
+#: Identifies a function the same way as :mod:`pstats`,
+#: ``(filename, first line number, function name)``
+FuncKey = t.Tuple[str, int, str]
+
+
+def _func_key(frame: FrameType) -> FuncKey:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples the stack of the profiled thread
+    from a background thread, every ``interval`` seconds.
+
+    Unlike :mod:`cProfile` it doesn't slow down each function call, so the
+    profiled code runs at close to normal speed, at the cost of only seeing
+    where time is spent approximately. A background thread is used rather
+    than a timer signal, since signals are only delivered to the main thread
+    and requests are usually handled in other threads.
+    """
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self.interval = interval
+        #: Number of samples and seconds spent in each sampled stack, from
+        #: the outermost frame
+        self.stacks: dict[tuple[FuncKey, ...], list[t.Any]] = {}
+        self.sample_count = 0
+        self.total_time = 0.0
+        #: Label of the current part of the request. Samples are recorded
+        #: under a ``<label phase>`` frame when it's set
+        self.phase: str | None = None
+        self._target: int | None = None
+        self._base_frame: FrameType | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def enable(self, base_frame: FrameType | None = None) -> None:
+        """Start sampling the current thread. Frames below ``base_frame`` are
+        left out of the stacks.
+        """
+        self._target = threading.get_ident()
+        self._base_frame = base_frame
+        self._stop.clear()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="flask-debugtoolbar-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def retarget(
+        self, target: int | None, base_frame: FrameType | None
+    ) -> tuple[int | None, FrameType | None]:
+        """Sample the ``target`` thread from now on, with the frames below
+        ``base_frame`` left out. With a ``None`` target, samples are recorded
+        as ``<await>``, for a coroutine that is suspended. Returns the
+        previous target and base frame, to restore them later.
+        """
+        previous = self._target, self._base_frame
+        self._target, self._base_frame = target, base_frame
+        return previous
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def disable(self) -> None:
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self._base_frame = None
+        self.total_time += time.perf_counter() - self._start
+
+    def elapsed(self) -> float:
+        """Seconds spent profiling, including the current run."""
+        if self._thread is None:
+            return self.total_time
+
+        return self.total_time + time.perf_counter() - self._start
+
+    def runcall(self, func: c.Callable[..., t.Any], *args: t.Any, **kw: t.Any) -> t.Any:
+        self.enable(sys._getframe())
+
+        try:
+            return func(*args, **kw)
+        finally:
+            self.disable()
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+
+        while not self._stop.wait(self.interval):
+            target, base_frame = self._target, self._base_frame
+            now = time.perf_counter()
+            weight = now - last
+            last = now
+
+            if target is None:
+                stack = [AWAIT_KEY]
+            else:
+                frame = sys._current_frames().get(target)
+
+                if frame is None:
+                    continue
+
+                stack = []
+
+                while frame is not None and frame is not base_frame:
+                    stack.append(_func_key(frame))
+                    frame = frame.f_back
+
+                del frame
+
+                # The profiled function has already returned
+                if not stack or stack[-1] == _DISABLE_KEY:
+                    continue
+
+            if self.phase is not None:
+                stack.append(("~", 0, f"<{self.phase} phase>"))
+
+            totals = self.stacks.setdefault(tuple(reversed(stack)), [0, 0.0])
+            totals[0] += 1
+            totals[1] += weight
+            self.sample_count += 1
+
+    def function_stats(self) -> dict[FuncKey, tuple[int, float, float]]:
+        """Aggregate the samples by function, as ``(samples, own time,
+        cumulative time)``, the times in seconds. A function that appears
+        several times in a stack, when recursing, is only counted once.
+        """
+        result: dict[FuncKey, list[t.Any]] = {}
+
+        # copied, samples may still be added while profiling
+        for stack, (samples, seconds) in list(self.stacks.items()):
+            leaf = stack[-1]
+
+            for func in set(stack):
+                stats = result.setdefault(func, [0, 0.0, 0.0])
+                stats[0] += samples
+                stats[2] += seconds
+
+            result[leaf][1] += seconds
+
+        return {func: (s[0], s[1], s[2]) for func, s in result.items()}
+
+
+#: Recorded while a profiled coroutine is suspended
+AWAIT_KEY: FuncKey = ("~", 0, "<await>")
+
+_DISABLE_KEY: FuncKey = (
+    SamplingProfiler.disable.__code__.co_filename,
+    SamplingProfiler.disable.__code__.co_firstlineno,
+    SamplingProfiler.disable.__code__.co_name,
+)
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import collections.abc as c
+import sys
+import threading
+import typing as t
+from contextvars import ContextVar
+from contextvars import Token
+from time import perf_counter
+
+from .history import approximate_size
+
+if t.TYPE_CHECKING:
+    from sqlalchemy.engine import Connection
+
+try:
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+except ImportError:
+    HAVE_SQLALCHEMY = False
+else:
+    HAVE_SQLALCHEMY = True
+
+#: Packages whose frames are left out of the recorded stacks
+SKIP_PACKAGES = frozenset(("sqlalchemy", "flask_sqlalchemy", "flask_debugtoolbar"))
+
+_current: ContextVar[QueryRecorder | None] = ContextVar(
+    "flask_debugtoolbar.query_recorder", default=None
+)
+_lock = threading.Lock()
+
+
+class RecordedQuery:
+    """A statement executed while recording. Times are from
+    :func:`time.perf_counter`, the stack is a list of ``(filename, lineno,
+    function)``, most recent call first.
+    """
+
+    def __init__(
+        self,
+        statement: str,
+        parameters: t.Any,
+        start_time: float,
+        end_time: float,
+        bind: str,
+        batch_size: int,
+        rowcount: int | None,
+        stack: list[tuple[str, int, str]],
+        location: str,
+    ) -> None:
+        self.statement = statement
+        self.parameters = parameters
+        self.start_time = start_time
+        self.end_time = end_time
+        #: Name of the engine, see :class:`QueryRecorder`
+        self.bind = bind
+        #: Number of parameter sets, more than one with ``executemany``
+        self.batch_size = batch_size
+        #: Rows changed, or returned by drivers that report it for ``SELECT``
+        self.rowcount = rowcount
+        self.stack = stack
+        self.location = location
+
+    @property
+    def duration(self) -> float:
+        return self.end_time - self.start_time
+
+
+class QueryRecorder:
+    """The queries run while recording in the current context. Once their
+    approximate size reaches ``max_bytes``, further queries are only counted.
+
+    Queries are recorded with the name of their engine in ``binds``, usually
+    the application's Flask-SQLAlchemy bind keys, or the engine's URL, rather
+    than the engine itself, so that recorded queries don't keep engines alive.
+    """
+
+    def __init__(
+        self,
+        import_name: str,
+        max_frames: int = 10,
+        max_bytes: int = 1024 * 1024,
+        binds: c.Mapping[Engine, str] | None = None,
+    ) -> None:
+        self.package = import_name.partition(".")[0]
+        self.binds = binds or {}
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.queries: list[RecordedQuery] = []
+        self.size = 0
+        #: Number and duration of the queries not kept, over ``max_bytes``
+        self.dropped = 0
+        self.dropped_time = 0.0
+
+    def record(
+        self,
+        engine: Engine,
+        statement: str,
+        parameters: t.Any,
+        executemany: bool,
+        rowcount: int,
+        start_time: float,
+        end_time: float,
+    ) -> None:
+        if self.size >= self.max_bytes:
+            self.dropped += 1
+            self.dropped_time += end_time - start_time
+            return
+
+        stack, location = self._stack()
+        bind = self.binds.get(engine)
+        query = RecordedQuery(
+            statement,
+            parameters,
+            start_time,
+            end_time,
+            bind
+            if bind is not None
+            else engine.url.render_as_string(hide_password=True),
+            len(parameters) if executemany else 1,
+            # -1 when the driver doesn't know
+            rowcount if rowcount >= 0 else None,
+            stack,
+            location,
+        )
+        self.queries.append(query)
+        self.size += approximate_size(query)
+
+    def _stack(self) -> tuple[list[tuple[str, int, str]], str]:
+        """The calls leading to the query outside of SQLAlchemy, and the
+        location of the most recent one in the application's package.
+        """
+        frame = sys._getframe(2)
+        stack: list[tuple[str, int, str]] = []
+        location = None
+
+        while frame is not None and len(stack) < self.max_frames:
+            package = frame.f_globals.get("__name__", "").partition(".")[0]
+
+            if package not in SKIP_PACKAGES:
+                code = frame.f_code
+                stack.append((code.co_filename, frame.f_lineno, code.co_name))
+
+                if location is None and package == self.package:
+                    location = f"{code.co_filename}:{frame.f_lineno} ({code.co_name})"
+
+            frame = frame.f_back  # type: ignore[assignment]
+
+        if location is None:
+            location = "{}:{} ({})".format(*stack[0]) if stack else "<unknown>"
+
+        return stack, location
+
+
+def listen() -> None:
+    """Listen to the execution events of all SQLAlchemy engines. The
+    listeners only record anything while :func:`start_recording` is active in
+    the current context.
+    """
+    with _lock:
+        if not event.contains(Engine, "before_cursor_execute", _before_execute):
+            event.listen(Engine, "before_cursor_execute", _before_execute)
+            event.listen(Engine, "after_cursor_execute", _after_execute)
+
+
+def start_recording(recorder: QueryRecorder) -> Token[QueryRecorder | None]:
+    return _current.set(recorder)
+
+
+def stop_recording(token: Token[QueryRecorder | None]) -> None:
+    try:
+        _current.reset(token)
+    except ValueError:
+        # A streamed response is processed in another context than the one
+        # recording started in.
+        _current.set(None)
+
+
+def _before_execute(
+    conn: Connection,
+    cursor: t.Any,
+    statement: str,
+    parameters: t.Any,
+    context: t.Any,
+    executemany: bool,
+) -> None:
+    if context is not None and _current.get() is not None:
+        context._flask_debugtoolbar_start = perf_counter()
+
+
+def _after_execute(
+    conn: Connection,
+    cursor: t.Any,
+    statement: str,
+    parameters: t.Any,
+    context: t.Any,
+    executemany: bool,
+) -> None:
+    recorder = _current.get()
+    start_time = getattr(context, "_flask_debugtoolbar_start", None)
+
+    if recorder is None or start_time is None:
+        return
+
+    recorder.record(
+        conn.engine,
+        statement,
+        parameters,
+        executemany,
+        cursor.rowcount,
+        start_time,
+        perf_counter(),
+    )
@@ -17,6 +17,7 @@
           $(this).parent().removeClass('flDebugActive');
         } else {
           $('.flDebugPanelContentParent').hide(); // Hide any that are already open
+          fldt.load_panel(current);
           current.show();
           $('#flDebugToolbar li').removeClass('flDebugActive');
           $(this).parent().addClass('flDebugActive');
@@ -57,7 +58,7 @@
         $('#flDebugToolbar li').removeClass('flDebugActive');
         return false;
       });
-      $('#flDebug a.flDebugRemoteCall').on('click', function() {
+      $('#flDebug').on('click', 'a.flDebugRemoteCall', function() {
         $('#flDebugWindow').load(this.href, {}, function() {
           $('#flDebugWindow a.flDebugBack').click(function() {
             $(this).parent().parent().hide();
@@ -67,15 +68,37 @@
         $('#flDebugWindow').show();
         return false;
       });
-      $('#flDebugTemplatePanel a.flDebugTemplateShowContext').on('click', function() {
+      $('#flDebug').on('click', '#flDebugTemplatePanel a.flDebugTemplateShowContext', function() {
         fldt.toggle_arrow($(this).children('.flDebugToggleArrow'))
         fldt.toggle_content($(this).parent().next());
         return false;
       });
-      $('#flDebugSQLPanel a.flDebugShowStacktrace').on('click', function() {
+      $('#flDebug').on('click', '#flDebugSQLPanel a.flDebugShowStacktrace', function() {
         fldt.toggle_content($('.flDebugHideStacktraceDiv', $(this).parents('tr')));
         return false;
       });
+      $('#flDebug').on('click', '#flDebugSQLAlchemyPanel-content .flDebugSqlDeferred', function() {
+        var sql = $(this);
+        sql.removeClass('flDebugSqlDeferred').removeAttr('title');
+        $.get(sql.data('url'), function(html) {
+          sql.html(html);
+        });
+        return false;
+      });
+      $('#flDebug').on('click', '#flDebugProfilerPanel-content .flDebugProfilerMore a', function() {
+        var more = $(this).parent();
+        var table = $('#flDebugProfilerTable');
+        $.get(this.href, function(html) {
+          $('tbody', table).html(html);
+          table.trigger('update');
+          more.remove();
+        });
+        return false;
+      });
+      $('#flDebug').on('click', '#flDebugProfilerPanel-content .flDebugFlameLabel', function() {
+        fldt.zoom_flame_node($(this).parent());
+        return false;
+      });
       $('#flDebugHideToolBarButton').on('click', function() {
         fldt.hide_toolbar(true);
         return false;
@@ -106,7 +129,10 @@
       } else {
         fldt.show_toolbar(false);
       }
-      $('#flDebug table.flDebugTablesorter').each(function() {
+      fldt.init_tablesorter($('#flDebug'));
+    },
+    init_tablesorter: function(root) {
+      root.find('table.flDebugTablesorter').each(function() {
           var headers = {};
           $(this).find('thead th').each(function(idx, elem) {
             headers[idx] = $(elem).data();
@@ -122,6 +148,23 @@
           });
         });
     },
+    load_panel: function(panel) {
+      // Fetch the content of lazily rendered panels the first time they are opened
+      var scroll = panel.find('.flDebugScroll[data-url]');
+      if (!scroll.length || scroll.data('loaded')) {
+        return;
+      }
+      scroll.data('loaded', true);
+      scroll.html('<p>Loading&hellip;</p>');
+      scroll.load(scroll.data('url'), function(response, status) {
+        if (status === 'error') {
+          scroll.data('loaded', false);
+          scroll.html('<p>The panel content is no longer available, reload the page.</p>');
+          return;
+        }
+        fldt.init_tablesorter(scroll);
+      });
+    },
     toggle_content: function(elem) {
       if (elem.is(':visible')) {
         elem.hide();
@@ -169,6 +212,19 @@
         expires: -1
       });
     },
+    zoom_flame_node: function(node) {
+      var graph = node.closest('.flDebugFlameGraph');
+      var zoomed = node.hasClass('flDebugFlameZoomed');
+      $('.flDebugFlamePath', graph).removeClass('flDebugFlamePath');
+      $('.flDebugFlameZoomed', graph).removeClass('flDebugFlameZoomed');
+      if (zoomed) {
+        graph.removeClass('flDebugFlameZooming');
+      } else {
+        node.addClass('flDebugFlameZoomed');
+        node.parentsUntil(graph, '.flDebugFlameNode').addClass('flDebugFlamePath');
+        graph.addClass('flDebugFlameZooming');
+      }
+    },
     toggle_arrow: function(elem) {
       var uarr = String.fromCharCode(0x25b6);
       var darr = String.fromCharCode(0x25bc);
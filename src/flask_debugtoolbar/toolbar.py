@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import collections.abc as c
+import time
 import typing as t
+import uuid
+import weakref
 from urllib.parse import unquote
 
 from flask import current_app
@@ -13,39 +16,167 @@ from werkzeug.utils import import_string
 
 from .panels import DebugPanel
 
+#: Panel methods called by the extension during a request
+HOOKS = ("process_request", "process_view", "process_response")
+
+
+class PanelPlan:
+    """The panels configured for an app, and the hooks each of them
+    implements. Computed once per app, so that requests only instantiate and
+    call the panels that need it.
+    """
+
+    def __init__(self, panel_paths: c.Sequence[str], app: Flask) -> None:
+        self.panel_paths = panel_paths
+        self.panel_classes: list[type[DebugPanel]] = list(
+            DebugToolbar._iter_panels(app)
+        )
+        self.hooks: dict[str, frozenset[type[DebugPanel]]] = {
+            name: frozenset(
+                panel_class
+                for panel_class in self.panel_classes
+                if getattr(panel_class, name) is not getattr(DebugPanel, name)
+            )
+            for name in HOOKS
+        }
+        self.has_user_activate = any(
+            panel_class.user_activate for panel_class in self.panel_classes
+        )
+
+
+class InactivePanel:
+    """Stands in for a panel the user didn't activate, which is never
+    instantiated. It is only shown in the toolbar so it can be activated.
+    """
+
+    has_content = False
+    user_activate = True
+    is_active = False
+
+    def __init__(self, panel_class: type[DebugPanel]) -> None:
+        self.panel_class = panel_class
+
+    def dom_id(self) -> str:
+        return self.panel_class.dom_id()
+
+    def nav_title(self) -> str:
+        return self.panel_class.name
+
+    def nav_subtitle(self) -> str:
+        return "in-active"
+
+    def title(self) -> str:
+        return self.panel_class.name
+
 
 class DebugToolbar:
     _cached_panel_classes: t.ClassVar[dict[str, type[DebugPanel] | None]] = {}
+    _panel_plans: t.ClassVar[weakref.WeakKeyDictionary[Flask, PanelPlan]] = (
+        weakref.WeakKeyDictionary()
+    )
 
     def __init__(self, request: Request, jinja_env: Environment) -> None:
         self.jinja_env = jinja_env
-        self.request = request
-        self.panels: list[DebugPanel] = []
+        # Cleared once the toolbar is stored in the request history
+        self.request: Request | None = request
+        self.request_id: str = uuid.uuid4().hex
+        self.panels: list[DebugPanel | InactivePanel] = []
+        self.hook_panels: dict[str, list[DebugPanel]] = {name: [] for name in HOOKS}
+        # Seconds spent by the toolbar itself, by panel name (or "Toolbar")
+        # and step
+        self.timings: dict[str, dict[str, float]] = {}
         self.template_context: dict[str, t.Any] = {
-            "static_path": url_for("_debug_toolbar.static", filename="")
+            "static_path": url_for("_debug_toolbar.static", filename=""),
+            "request_id": self.request_id,
+            "lazy": current_app.config["DEBUG_TB_LAZY_PANELS"],
+            "timings": self.timings,
         }
         self.create_panels()
 
     def create_panels(self) -> None:
         """Populate debug panels"""
-        activated_str = self.request.cookies.get("fldt_active", "")
-        activated = unquote(activated_str).split(";")
+        app = current_app._get_current_object()  # type: ignore[attr-defined]
+        plan = self.get_plan(app)
+        activated: list[str] = []
+
+        if plan.has_user_activate and self.request is not None:
+            activated_str = self.request.cookies.get("fldt_active", "")
+            activated = unquote(activated_str).split(";")
+
+        for panel_class in plan.panel_classes:
+            user_activated = panel_class.dom_id() in activated
+
+            if (
+                panel_class.user_activate
+                and not user_activated
+                and not panel_class.active_by_default(app)
+            ):
+                self.panels.append(InactivePanel(panel_class))
+                continue
 
-        for panel_class in self._iter_panels(current_app):
             panel_instance = panel_class(
                 jinja_env=self.jinja_env, context=self.template_context
             )
 
-            if panel_instance.dom_id() in activated:
+            if user_activated:
                 panel_instance.is_active = True
 
             self.panels.append(panel_instance)
 
+            for name in HOOKS:
+                if panel_class in plan.hooks[name]:
+                    self.hook_panels[name].append(panel_instance)
+
+    def active_panels(self) -> list[DebugPanel]:
+        return [panel for panel in self.panels if isinstance(panel, DebugPanel)]
+
+    def get_panel(self, dom_id: str) -> DebugPanel | None:
+        for panel in self.active_panels():
+            if panel.dom_id() == dom_id:
+                return panel
+
+        return None
+
+    def record_timing(self, name: str, step: str, seconds: float) -> None:
+        steps = self.timings.setdefault(name, {})
+        steps[step] = steps.get(step, 0.0) + seconds
+
+    def total_overhead(self) -> float:
+        """Total seconds spent by the toolbar on this request so far."""
+        return sum(sum(steps.values()) for steps in self.timings.values())
+
+    def needs_history(self) -> bool:
+        """Whether the toolbar must be kept in the request history, for lazy
+        panels or a panel's views.
+        """
+        return self.template_context["lazy"] or any(
+            panel.needs_history() for panel in self.active_panels()
+        )
+
+    def render_panel_content(self, panel: DebugPanel) -> str:
+        start = time.perf_counter()
+        content = panel.content()
+        self.record_timing(panel.name, "content", time.perf_counter() - start)
+        return content
+
     def render_toolbar(self) -> str:
+        start = time.perf_counter()
+        contents: dict[str, str] = {}
+
+        if not self.template_context["lazy"]:
+            for panel in self.active_panels():
+                if panel.has_content:
+                    contents[panel.dom_id()] = self.render_panel_content(panel)
+
+        content_time = time.perf_counter() - start
         context = self.template_context.copy()
-        context.update({"panels": self.panels})
+        context.update({"panels": self.panels, "contents": contents})
         template = self.jinja_env.get_template("base.html")
-        return template.render(**context)
+        html = template.render(**context)
+        self.record_timing(
+            "Toolbar", "render", time.perf_counter() - start - content_time
+        )
+        return html
 
     @classmethod
     def load_panels(cls, app: Flask) -> None:
@@ -53,6 +184,19 @@ class DebugToolbar:
             # Call `.init_app()` on panels
             panel_class.init_app(app)
 
+        cls._panel_plans[app] = PanelPlan(app.config["DEBUG_TB_PANELS"], app)
+
+    @classmethod
+    def get_plan(cls, app: Flask) -> PanelPlan:
+        panel_paths = app.config["DEBUG_TB_PANELS"]
+        plan = cls._panel_plans.get(app)
+
+        # The panels may be changed after `init_app`
+        if plan is None or plan.panel_paths != panel_paths:
+            plan = cls._panel_plans[app] = PanelPlan(panel_paths, app)
+
+        return plan
+
     @classmethod
     def _iter_panels(cls, app: Flask) -> c.Iterator[type[DebugPanel]]:
         for panel_path in app.config["DEBUG_TB_PANELS"]:
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import collections.abc as c
-import gzip
-import io
+import functools
 import itertools
 import os.path
+import re
 import sys
 from types import ModuleType
 
@@ -30,35 +30,65 @@ except ImportError:
     HAVE_SQLPARSE = False
 
 
+#: Number of formatted filenames remembered by :func:`format_fname`
+FNAME_CACHE_SIZE = 4096
+
+#: Number of formatted SQL statements remembered by :func:`format_sql`,
+#: across requests
+SQL_CACHE_SIZE = 1024
+
+#: Longer SQL statements are formatted again each time
+SQL_CACHE_MAX_LENGTH = 16 * 1024
+
+_sys_path: tuple[list[str], tuple[str, ...]] = ([], ())
+
+
 def format_fname(value: str) -> str:
     # If the value has a builtin prefix, return it unchanged
     if value.startswith(("{", "<")):
         return value
 
+    return _format_fname(value, current_app.root_path, _sys_paths())
+
+
+def _sys_paths() -> tuple[str, ...]:
+    """``sys.path`` as a tuple, only copied again when it changes, so it can
+    be part of the :func:`_format_fname` cache key.
+    """
+    global _sys_path
+
+    if _sys_path[0] != sys.path:
+        _sys_path = (list(sys.path), tuple(sys.path))
+
+    return _sys_path[1]
+
+
+@functools.lru_cache(maxsize=FNAME_CACHE_SIZE)
+def _format_fname(value: str, root_path: str, sys_paths: tuple[str, ...]) -> str:
     value = os.path.normpath(value)
 
     # If the file is absolute, try normalizing it relative to the project root
     # to handle it as a project file
     if os.path.isabs(value):
-        value = _shortest_relative_path(value, [current_app.root_path], os.path)
+        value = _shortest_relative_path(value, [root_path], os.path)
 
     # If the value is a relative path, it is a project file
     if not os.path.isabs(value):
         return os.path.join(".", value)
 
     # Otherwise, normalize other paths relative to sys.path
-    return f"<{_shortest_relative_path(value, sys.path, os.path)}>"
+    return f"<{_shortest_relative_path(value, sys_paths, os.path)}>"
 
 
 def _shortest_relative_path(
-    value: str, paths: list[str], path_module: ModuleType
+    value: str, paths: c.Sequence[str], path_module: ModuleType
 ) -> str:
     relpaths = _relative_paths(value, paths, path_module)
     return min(itertools.chain(relpaths, [value]), key=len)
 
 
 def _relative_paths(
-    value: str, paths: list[str], path_module: ModuleType
+    value: str, paths: c.Sequence[str], path_module: ModuleType
 ) -> c.Iterator[str]:
     for path in paths:
         try:
@@ -72,6 +102,26 @@ def _relative_paths(
             yield relval
 
 
+def format_size(size: float, sign: bool = False) -> str:
+    """Format a number of bytes with a binary unit, such as ``"1.5 MiB"``.
+    With ``sign``, positive sizes are prefixed with ``+``.
+    """
+    prefix = "+" if sign and size > 0 else ""
+
+    units = ["B", "KiB", "MiB", "GiB"]
+
+    while abs(size) >= 1024 and len(units) > 1:
+        size /= 1024
+        units.pop(0)
+
+    unit = units[0]
+
+    if unit == "B":
+        return f"{prefix}{size:.0f} {unit}"
+
+    return f"{prefix}{size:.1f} {unit}"
+
+
 def decode_text(value: str | bytes) -> str:
     """
     Decode a text-like value for display.
@@ -86,10 +136,19 @@ def decode_text(value: str | bytes) -> str:
 
 
 def format_sql(query: str | bytes, args: object) -> str:
-    if HAVE_SQLPARSE:
+    if len(query) > SQL_CACHE_MAX_LENGTH:
+        # a few huge statements would use more memory than all the others
+        return _format_sql.__wrapped__(query, HAVE_SQLPARSE, HAVE_PYGMENTS)
+
+    return _format_sql(query, HAVE_SQLPARSE, HAVE_PYGMENTS)
+
+
+@functools.lru_cache(maxsize=SQL_CACHE_SIZE)
+def _format_sql(query: str | bytes, reindent: bool, highlighted: bool) -> str:
+    if reindent:
         query = sqlparse.format(query, reindent=True, keyword_case="upper")
 
-    if not HAVE_PYGMENTS:
+    if not highlighted:
         return decode_text(query)
 
     return Markup(
@@ -97,15 +156,31 @@ def format_sql(query: str | bytes, args: object) -> str:
     )
 
 
-def gzip_compress(data: bytes, compresslevel: int = 6) -> bytes:
-    buff = io.BytesIO()
-
-    with gzip.GzipFile(fileobj=buff, mode="wb", compresslevel=compresslevel) as f:
-        f.write(data)
-
-    return buff.getvalue()
-
-
-def gzip_decompress(data: bytes) -> bytes:
-    with gzip.GzipFile(fileobj=io.BytesIO(data), mode="rb") as f:
-        return f.read()
+_sql_comments = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_sql_literals = re.compile(
+    r"""
+    '(?:[^']|'')*'                  # string
+    | %\(\w+\)s | %s | \? | \$\d+    # pyformat, format, qmark and numeric
+    | (?<![\w:]):\w+                # named
+    | \b0x[0-9a-f]+\b               # hex number
+    | (?<![\w.])\d+(?:\.\d+)?(?:e[-+]?\d+)?\b  # number
+    """,
+    re.I | re.X,
+)
+_sql_lists = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_sql_values = re.compile(r"\bVALUES\s*\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+", re.I)
+_whitespace = re.compile(r"\s+")
+
+
+def fingerprint_sql(query: str | bytes) -> str:
+    """Normalize a SQL statement so that runs of it with different values
+    are equal. Comments are removed, literals and placeholders replaced by
+    ``?``, lists of them such as ``IN (1, 2, 3)`` collapsed to ``(...)``,
+    and whitespace collapsed.
+    """
+    query = decode_text(query)
+    query = _sql_comments.sub(" ", query)
+    query = _sql_literals.sub("?", query)
+    query = _sql_lists.sub("(...)", query)
+    query = _sql_values.sub("VALUES (...)", query)
+    return _whitespace.sub(" ", query).strip()
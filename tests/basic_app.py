@@ -9,7 +9,6 @@ from flask_debugtoolbar import DebugToolbarExtension
 app = Flask("basic_app")
 app.config["DEBUG"] = True
 app.config["SECRET_KEY"] = "abc123"
-app.config["SQLALCHEMY_RECORD_QUERIES"] = True
 app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
 # This is no longer needed for Flask-SQLAlchemy 3.0+,
 # if you're using 2.X you'll want to define this:
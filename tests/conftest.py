@@ -1,8 +1,62 @@
 from __future__ import annotations
 
+import re
+import typing as t
+
 import pytest
+from flask import Flask
+
+from flask_debugtoolbar import DebugToolbarExtension
+from flask_debugtoolbar.panels import DebugPanel
+
+P = t.TypeVar("P", bound=DebugPanel)
 
 
 @pytest.fixture(autouse=True)
 def mock_env_development(monkeypatch: pytest.MonkeyPatch) -> None:
     monkeypatch.setenv("FLASK_ENV", "development")
+
+
+def app_with_config(
+    app_config: dict[str, t.Any],
+    toolbar_config: dict[str, t.Any],
+    import_name: str = __name__,
+) -> Flask:
+    app = Flask(import_name, **app_config)
+    app.config["DEBUG"] = True
+    app.config["SECRET_KEY"] = "abc123"
+
+    for key, value in toolbar_config.items():
+        app.config[key] = value
+
+    DebugToolbarExtension(app)
+
+    return app
+
+
+def panel_app(import_name: str = __name__, **config: t.Any) -> Flask:
+    """Create an app whose panels can be inspected with :func:`get_panel`.
+    Pass the test module's ``__name__`` as ``import_name`` to have its frames
+    treated as application code.
+    """
+    # keeps the panels in the request history
+    config.setdefault("DEBUG_TB_LAZY_PANELS", True)
+    return app_with_config({}, config, import_name)
+
+
+def get_panel(app: Flask, panel_class: type[P], path: str = "/") -> P:
+    """Request ``path`` and return the instance of ``panel_class`` of the
+    toolbar inserted in the response.
+    """
+    with app.test_client() as client:
+        response = client.get(path)
+        html = response.text
+        # completes a streamed response, and a whole request profile
+        response.close()
+
+    match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+    assert match is not None
+    toolbar = app.extensions["debugtoolbar"].get_toolbar(match.group(1))
+    panel = toolbar.get_panel(panel_class.dom_id())
+    assert isinstance(panel, panel_class)
+    return panel
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import gzip
+import zlib
+
+import pytest
+
+from flask_debugtoolbar.compression import codecs
+from flask_debugtoolbar.compression import get_codec
+
+DATA = b"<html><body>" + b"Hello World! " * 1000 + b"</body></html>"
+
+
+@pytest.mark.parametrize("name", sorted(codecs))
+def test_codec_round_trip(name: str) -> None:
+    codec = get_codec(name)
+    assert codec is not None
+    encoded = codec.encode(DATA)
+    assert len(encoded) < len(DATA)
+    assert codec.decode(encoded) == DATA
+    assert codec.encode_time > 0
+    assert codec.decode_time > 0
+
+
+@pytest.mark.parametrize("name", sorted(codecs))
+def test_codec_streams(name: str) -> None:
+    codec = get_codec(name)
+    assert codec is not None
+    chunks = [DATA[i : i + 100] for i in range(0, len(DATA), 100)]
+    encoded = list(codec.encode_stream(chunks))
+    assert b"".join(codec.decode_stream(encoded)) == DATA
+
+
+def test_gzip_codec_compatible_with_stdlib() -> None:
+    codec = get_codec("GZIP", level=9)
+    assert codec is not None and codec.level == 9
+    assert gzip.decompress(codec.encode(DATA)) == DATA
+    assert codec.decode(gzip.compress(DATA)) == DATA
+
+
+def test_deflate_codec_compatible_with_zlib() -> None:
+    codec = get_codec("deflate")
+    assert codec is not None
+    assert codec.decode(zlib.compress(DATA)) == DATA
+
+
+def test_unknown_codec() -> None:
+    assert get_codec("compress") is None
+    assert get_codec("gzip, br") is None
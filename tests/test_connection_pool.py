@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.pool import QueuePool
+
+from flask_debugtoolbar.panels.connection_pool import ConnectionPoolDebugPanel
+
+from conftest import get_panel
+from conftest import panel_app
+
+
+def pool_app(path: Path) -> tuple[Flask, sa.Engine]:
+    app = panel_app()
+    engine = sa.create_engine(
+        f"sqlite:///{path / 'pool.db'}",
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=1,
+    )
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+
+    @app.route("/")
+    def index() -> str:
+        with engine.connect() as first, engine.connect() as second:
+            first.exec_driver_sql("SELECT 1")
+            second.exec_driver_sql("SELECT 1")
+
+        return "<html><head></head><body></body></html>"
+
+    @app.route("/wait")
+    def wait() -> str:
+        # hold both connections from another thread for a while
+        held = threading.Event()
+
+        def hold() -> None:
+            with engine.connect(), engine.connect():
+                held.set()
+                time.sleep(0.05)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+
+        thread.join()
+        return "<html><head></head><body></body></html>"
+
+    return app, engine
+
+
+def test_pool_checkouts(tmp_path: Path) -> None:
+    app, engine = pool_app(tmp_path)
+    panel = get_panel(app, ConnectionPoolDebugPanel)
+
+    assert panel.recorder is not None
+    checkouts = panel.recorder.checkouts
+    assert len(checkouts) == 2
+    # the pooled connection is reused, the overflow one is opened
+    assert [checkout.new for checkout in checkouts] == [False, True]
+    assert all(checkout.end is not None for checkout in checkouts)
+    # the first checkout instruments the pool
+    assert [checkout.wait is not None for checkout in checkouts] == [False, True]
+    (usage,) = panel.recorder.pools.values()
+    assert usage.pool is engine.pool
+    assert (usage.peak_checked_out, usage.peak_overflow) == (2, 1)
+    assert panel.nav_subtitle().startswith("2 checkouts, waited ")
+
+    with app.test_request_context():
+        content = panel.content()
+
+    assert "QueuePool" in content
+    assert "still checked out" not in content
+    engine.dispose()
+
+
+def test_pool_wait(tmp_path: Path) -> None:
+    app, engine = pool_app(tmp_path)
+    get_panel(app, ConnectionPoolDebugPanel)
+    panel = get_panel(app, ConnectionPoolDebugPanel, "/wait")
+
+    # the other thread's checkouts aren't recorded
+    assert panel.recorder is not None
+    (checkout,) = panel.recorder.checkouts
+    assert checkout.wait is not None and checkout.wait >= 0.03
+    assert panel.wait_time() == checkout.wait
+    engine.dispose()
+
+
+def test_flask_sqlalchemy_pools_instrumented(tmp_path: Path) -> None:
+    app = panel_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'pool.db'}")
+    db = SQLAlchemy(app)
+
+    @app.route("/")
+    def index() -> str:
+        db.session.execute(sa.text("SELECT 1"))
+        return "<html><head></head><body></body></html>"
+
+    panel = get_panel(app, ConnectionPoolDebugPanel)
+
+    assert panel.recorder is not None
+    (checkout,) = panel.recorder.checkouts
+    assert checkout.wait is not None
+
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_pool_not_recorded_outside_requests(tmp_path: Path) -> None:
+    app, engine = pool_app(tmp_path)
+    panel = get_panel(app, ConnectionPoolDebugPanel)
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1")
+
+    assert panel.recorder is not None
+    assert len(panel.recorder.checkouts) == 2
+    engine.dispose()
+
+
+def test_pool_unavailable_without_sqlalchemy(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        "flask_debugtoolbar.panels.connection_pool.HAVE_SQLALCHEMY", False
+    )
+    app, engine = pool_app(tmp_path)
+    panel = get_panel(app, ConnectionPoolDebugPanel)
+
+    assert panel.recorder is None
+    assert panel.nav_subtitle() == "Unavailable"
+
+    with app.test_request_context():
+        assert "<h4>Checkouts</h4>" in panel.content()
+
+    engine.dispose()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import typing as t
+
+import pytest
+import sqlalchemy as sa
+
+from flask_debugtoolbar import explain as explain_module
+from flask_debugtoolbar.explain import driver_params
+from flask_debugtoolbar.explain import explain
+from flask_debugtoolbar.explain import parse_mysql_tree
+from flask_debugtoolbar.explain import parse_postgresql_plan
+from flask_debugtoolbar.explain import Plan
+
+
+@pytest.fixture
+def engine() -> t.Iterator[sa.Engine]:
+    engine = sa.create_engine("sqlite://")
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE item (id INTEGER PRIMARY KEY, x INT)")
+        connection.exec_driver_sql("CREATE TABLE tag (item_id INT, name TEXT)")
+        connection.exec_driver_sql("INSERT INTO item (x) VALUES (1), (2), (3)")
+
+    explain_module.clear_cache()
+    yield engine
+    explain_module.clear_cache()
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    ("params", "expect"),
+    [
+        ([[1, 2]], (1, 2)),
+        ([()], ()),
+        ([{"a": 1}], {"a": 1}),
+        ([1, 2], (1, 2)),
+        ({"a": 1}, {"a": 1}),
+    ],
+)
+def test_driver_params(params: t.Any, expect: t.Any) -> None:
+    assert driver_params(params) == expect
+
+
+def test_explain_sqlite(engine: sa.Engine) -> None:
+    statement = (
+        "SELECT * FROM item JOIN tag ON tag.item_id = item.id WHERE item.x IN"
+        " (SELECT x FROM item WHERE id > ?)"
+    )
+    plan = explain(engine, statement, [[1]])
+
+    assert plan.statement.startswith("EXPLAIN QUERY PLAN\n")
+    assert not plan.analyze
+    assert plan.execution_time is None
+    labels = [node.label for _, node in plan.walk()]
+    assert any("SCAN" in label or "SEARCH" in label for label in labels)
+    assert any(depth > 0 for depth, _ in plan.walk())
+    assert not plan.has_estimates
+
+
+def test_explain_cached_by_fingerprint(engine: sa.Engine) -> None:
+    plan = explain(engine, "SELECT * FROM item WHERE id = ?", [[1]])
+
+    cached = explain(engine, "SELECT * FROM item WHERE id = ?", [[2]])
+    assert cached.nodes is plan.nodes
+    assert cached.params == (2,)
+    other = explain(engine, "SELECT * FROM item WHERE x = ?", [[2]])
+    assert other.nodes is not plan.nodes
+    analyzed = explain(engine, "SELECT * FROM item WHERE id = ?", [[1]], True)
+    assert analyzed.nodes is not plan.nodes
+
+
+def test_explain_cached_plan_shows_its_statement(engine: sa.Engine) -> None:
+    first = explain(engine, "SELECT * FROM item WHERE id = 1", ())
+    second = explain(engine, "SELECT * FROM item WHERE id = 2", ())
+
+    assert second.nodes is first.nodes
+    assert first.statement == "EXPLAIN QUERY PLAN\nSELECT * FROM item WHERE id = 1"
+    assert second.statement == "EXPLAIN QUERY PLAN\nSELECT * FROM item WHERE id = 2"
+
+
+def test_explain_analyze_rolls_back(engine: sa.Engine) -> None:
+    plan = explain(engine, "SELECT * FROM item WHERE id > ?", [[1]], analyze=True)
+
+    assert plan.analyze
+    assert plan.rows == 2
+    assert plan.execution_time is not None and plan.execution_time >= 0
+    # ANALYZE runs the statement, its effects must not persist
+    explain(engine, "DELETE FROM item", [[]], analyze=True)
+
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM item").scalar() == 3
+
+
+def test_parse_postgresql_plan() -> None:
+    plan = Plan("EXPLAIN", (), True)
+    parse_postgresql_plan(
+        plan,
+        [
+            {
+                "Plan": {
+                    "Node Type": "Hash Join",
+                    "Hash Cond": "(tag.item_id = item.id)",
+                    "Total Cost": 60.5,
+                    "Plan Rows": 10,
+                    "Actual Total Time": 1.5,
+                    "Actual Rows": 3,
+                    "Actual Loops": 1,
+                    "Plans": [
+                        {
+                            "Node Type": "Seq Scan",
+                            "Relation Name": "tag",
+                            "Alias": "t",
+                            "Total Cost": 20.0,
+                            "Plan Rows": 1000,
+                        },
+                        {
+                            "Node Type": "Index Scan",
+                            "Relation Name": "item",
+                            "Index Name": "item_pkey",
+                            "Index Cond": "(id > 1)",
+                            "Total Cost": 8.2,
+                            "Plan Rows": 2,
+                        },
+                    ],
+                },
+                "Planning Time": 0.1,
+                "Execution Time": 2.0,
+            }
+        ],
+    )
+
+    nodes = [(depth, node.label, node.detail) for depth, node in plan.walk()]
+    assert nodes == [
+        (0, "Hash Join", "(tag.item_id = item.id)"),
+        (1, "Seq Scan on tag t", ""),
+        (1, "Index Scan on item using item_pkey", "(id > 1)"),
+    ]
+    root = plan.nodes[0]
+    assert root.cost == 60.5
+    assert root.actual_time == pytest.approx(0.0015)
+    assert (root.actual_rows, root.loops) == (3, 1)
+    assert plan.execution_time == pytest.approx(0.002)
+    assert plan.has_estimates and plan.has_actuals
+
+
+def test_parse_mysql_tree() -> None:
+    nodes = parse_mysql_tree(
+        "-> Nested loop inner join  (cost=1.05 rows=2)"
+        " (actual time=0.0354..0.0412 rows=2 loops=1)\n"
+        "    -> Filter: (t.x > 1)  (cost=0.45 rows=1)"
+        " (actual time=0.02..0.025 rows=2 loops=1)\n"
+        "        -> Table scan on t  (cost=0.45 rows=3)"
+        " (actual time=0.018..0.022 rows=3 loops=1)\n"
+        "    -> Index lookup on tag using item_id (item_id=t.id)  (never executed)\n"
+    )
+
+    assert len(nodes) == 1
+    root = nodes[0]
+    assert root.label == "Nested loop inner join"
+    assert (root.cost, root.rows, root.actual_rows, root.loops) == (1.05, 2, 2, 1)
+    assert root.actual_time == pytest.approx(0.0000412)
+    assert [child.label for child in root.children] == [
+        "Filter: (t.x > 1)",
+        "Index lookup on tag using item_id (item_id=t.id)  (never executed)",
+    ]
+    assert root.children[0].children[0].label == "Table scan on t"
+    assert root.children[1].cost is None
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import gc
+import re
+
+from flask import Flask
+from flask import Response
+
+from flask_debugtoolbar.gcpauses import _callback
+from flask_debugtoolbar.gcpauses import start_recording
+from flask_debugtoolbar.gcpauses import stop_recording
+
+from conftest import panel_app
+
+
+def gc_app() -> Flask:
+    app = panel_app()
+
+    @app.route("/")
+    def index() -> str:
+        gc.collect(0)
+        gc.collect()
+        return "<html><head></head><body>OK</body></html>"
+
+    @app.route("/text")
+    def text() -> Response:
+        return Response("OK", mimetype="text/plain")
+
+    return app
+
+
+def test_gc_panel() -> None:
+    app = gc_app()
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+        assert match is not None
+        toolbar = app.extensions["debugtoolbar"].get_toolbar(match.group(1))
+
+        panel = toolbar.get_panel("flDebugGarbageCollectorPanel")
+        generations = [collection["generation"] for collection in panel.collections]
+        assert generations[-2:] == [0, 2]
+        assert panel.total_time > 0
+        assert [g["generation"] for g in panel.generations][-1] == 2
+        assert panel.nav_subtitle().endswith("ms")
+
+        timer = toolbar.get_panel("flDebugTimerPanel")
+        assert timer.gc_collections == len(panel.collections)
+        assert timer.gc_time == panel.total_time
+        assert ", GC: " in timer.nav_subtitle()
+
+        url = f"/_debug_toolbar/views/panel/{match.group(1)}/flDebugTimerPanel"
+        assert "Garbage collection pauses" in client.get(url).text
+
+    assert _callback not in gc.callbacks
+
+
+def test_gc_panel_stops_without_toolbar_response() -> None:
+    with gc_app().test_client() as client:
+        assert client.get("/text").text == "OK"
+
+    assert _callback not in gc.callbacks
+
+
+def test_gc_recorders_share_callback() -> None:
+    first = start_recording()
+    second = start_recording()
+    assert gc.callbacks.count(_callback) == 1
+
+    gc.collect()
+    stop_recording(first)
+    assert _callback in gc.callbacks
+    gc.collect()
+    stop_recording(second)
+
+    assert _callback not in gc.callbacks
+    assert len(first.collections) == 1
+    assert len(second.collections) == 2
+    assert first.total_time > 0
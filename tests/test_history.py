@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from flask_debugtoolbar.history import approximate_size
+from flask_debugtoolbar.history import RequestHistory
+
+
+def test_history_evicts_least_recently_used() -> None:
+    history = RequestHistory(max_entries=2)
+    history.put("a", 1, size=1)
+    history.put("b", 2, size=1)
+    assert history.get("a") == 1
+
+    history.put("c", 3, size=1)
+    assert "b" not in history
+    assert history.get("a") == 1
+    assert history.get("c") == 3
+    assert history.stats()["evictions"] == 1
+
+
+def test_history_evicts_over_byte_budget() -> None:
+    history = RequestHistory(max_entries=10, max_bytes=100)
+    history.put("a", 1, size=60)
+    history.put("b", 2, size=60)
+    assert len(history) == 1
+    assert history.total_bytes == 60
+
+    # the newest entry is kept even if it exceeds the budget on its own
+    history.put("c", 3, size=500)
+    assert list(history._entries) == ["c"]
+
+
+def test_history_stats() -> None:
+    history = RequestHistory()
+    history.put("a", "value")
+    history.get("a")
+    history.get("missing")
+    stats = history.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert stats["bytes"] == approximate_size("value")
+
+
+def test_approximate_size_follows_references() -> None:
+    data = ["x" * 1000]
+    assert approximate_size({"data": data}) > 1000
+    assert approximate_size({"data": data}, exclude=[data]) < 1000
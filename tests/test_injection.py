@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pytest
+
+from flask_debugtoolbar.injection import find_body_end
+from flask_debugtoolbar.injection import inject_toolbar
+from flask_debugtoolbar.injection import inject_toolbar_stream
+
+
+def render() -> bytes:
+    return b"<toolbar>"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 100])
+def test_inject_stream_across_chunk_boundaries(size: int) -> None:
+    html = b"<html><body>Hello</BODY></html>"
+    chunks = [html[i : i + size] for i in range(0, len(html), size)]
+    result = b"".join(inject_toolbar_stream(chunks, render))
+    assert result == b"<html><body>Hello<toolbar></BODY></html>"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 100])
+def test_inject_stream_before_last_body_end(size: int) -> None:
+    html = b"<html><body><script>s = '</body>';</script></Body></html>"
+    chunks = [html[i : i + size] for i in range(0, len(html), size)]
+    result = b"".join(inject_toolbar_stream(chunks, render))
+    assert result == inject_toolbar(html, render)
+    assert result.endswith(b";</script><toolbar></Body></html>")
+
+
+def test_inject_stream_doctype_without_body() -> None:
+    chunks = ["<!DOCTYPE html>", "<p>Hello</p>"]
+    result = b"".join(inject_toolbar_stream(chunks, render))
+    assert result == b"<!DOCTYPE html><p>Hello</p><toolbar>"
+
+
+def test_inject_stream_without_body() -> None:
+    with pytest.warns(UserWarning):
+        result = b"".join(inject_toolbar_stream([b"<p>Hello</p>"], render))
+
+    assert result == b"<p>Hello</p>"
+
+
+@pytest.mark.parametrize("window", [8, 10, 64, 4096])
+def test_find_body_end_scans_backwards(window: int) -> None:
+    data = b"<html><body>" + b"x" * 100 + b"</Body>" + b"y" * 100
+    assert find_body_end(data, window) == data.index(b"</Body>")
+
+
+def test_find_body_end_returns_last_tag() -> None:
+    data = b"<body></body>" + b"x" * 50000 + b"</body>"
+    assert find_body_end(data) == len(data) - len(b"</body>")
+    assert find_body_end(b"<p>no body</p>") == -1
+
+
+def test_inject_toolbar() -> None:
+    assert inject_toolbar(b"<body>a</body>", render) == b"<body>a<toolbar></body>"
+    assert inject_toolbar(b"<!doctype html>a", render) == b"<!doctype html>a<toolbar>"
+
+    with pytest.warns(UserWarning):
+        assert inject_toolbar(b"<p>a</p>", render) is None
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+import tracemalloc
+
+import pytest
+from flask import Flask
+
+from flask_debugtoolbar.panels.memory import MemoryDebugPanel
+from flask_debugtoolbar.utils import format_size
+
+from conftest import get_panel
+from conftest import panel_app
+
+retained: list[bytes] = []
+
+
+def memory_app(**config: object) -> Flask:
+    app = panel_app(__name__, DEBUG_TB_MEMORY_ENABLED=True, **config)
+
+    @app.route("/")
+    def index() -> str:
+        allocate()
+        return "<html><head></head><body>OK</body></html>"
+
+    @app.route("/error")
+    def error() -> str:
+        raise ValueError
+
+    return app
+
+
+def allocate() -> None:
+    # freed before the end of the request, only counts for the peak
+    temporary = [bytes(1024) for _ in range(2000)]
+    del temporary
+    retained.append(bytes(100_000))
+
+
+def test_memory_panel() -> None:
+    panel = get_panel(memory_app(), MemoryDebugPanel)
+
+    assert not tracemalloc.is_tracing()
+    assert panel.peak is not None
+    assert panel.peak > 2_000_000
+    assert 100_000 <= panel.growth < panel.peak
+    site = panel.sites[0]
+    assert len(site["frames"]) == 1
+    assert site["frames"][0]["source"] == "retained.append(bytes(100_000))"
+    assert not panel.concurrent
+    assert panel.nav_subtitle().startswith("Peak ")
+
+    with memory_app().test_request_context():
+        assert "retained.append" in panel.content()
+
+
+def test_memory_panel_frames() -> None:
+    panel = get_panel(memory_app(DEBUG_TB_MEMORY_FRAMES=3), MemoryDebugPanel)
+
+    frames = panel.sites[0]["frames"]
+    assert [frame["source"] for frame in frames[:2]] == [
+        "retained.append(bytes(100_000))",
+        "allocate()",
+    ]
+
+
+def test_memory_panel_concurrent_requests() -> None:
+    app = memory_app()
+    started = threading.Event()
+    release = threading.Event()
+    panels = []
+
+    @app.route("/wait")
+    def wait() -> str:
+        started.set()
+        release.wait(5)
+        return "<html><head></head><body>OK</body></html>"
+
+    thread = threading.Thread(
+        target=lambda: panels.append(get_panel(app, MemoryDebugPanel, "/wait"))
+    )
+    thread.start()
+    started.wait(5)
+    panel = get_panel(app, MemoryDebugPanel)
+    release.set()
+    thread.join()
+
+    # the peak is process-wide, it's unknown for both requests
+    assert panel.concurrent
+    assert panels[0].concurrent
+    assert not panel.nav_subtitle().startswith("Peak ")
+
+    with app.test_request_context():
+        assert "Unknown, other requests" in panel.content()
+
+    assert not tracemalloc.is_tracing()
+
+
+def test_memory_panel_stops_tracing_on_error() -> None:
+    # the exception propagates in debug mode, the response isn't processed
+    with pytest.raises(ValueError):
+        memory_app().test_client().get("/error")
+
+    assert not tracemalloc.is_tracing()
+
+
+def test_format_size() -> None:
+    assert format_size(10) == "10 B"
+    assert format_size(1536, sign=True) == "+1.5 KiB"
+    assert format_size(-5 * 1024 * 1024, sign=True) == "-5.0 MiB"
+    assert format_size(3 * 1024**3) == "3.0 GiB"
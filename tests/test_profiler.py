@@ -0,0 +1,557 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import typing as t
+from pathlib import Path
+from types import CodeType
+
+import pytest
+from flask import Flask
+
+from flask_debugtoolbar.callgraph import CallNode
+from flask_debugtoolbar.callgraph import collapsed_stacks
+from flask_debugtoolbar.callgraph import tree_from_stacks
+from flask_debugtoolbar.dumps import limit_size
+from flask_debugtoolbar.dumps import ProfileDump
+from flask_debugtoolbar.dumps import ProfileDumpWriter
+from flask_debugtoolbar.dumps import rotate
+from flask_debugtoolbar.dumps import writer
+from flask_debugtoolbar.lineprof import _monitor
+from flask_debugtoolbar.lineprof import profile_lines
+from flask_debugtoolbar.lineprof import register
+from flask_debugtoolbar.lineprof import registry
+from flask_debugtoolbar.lineprof import resolve
+from flask_debugtoolbar.panels.profiler import create_profiler
+from flask_debugtoolbar.panels.profiler import ProfilerDebugPanel
+from flask_debugtoolbar.sampler import SamplingProfiler
+
+from conftest import app_with_config
+from conftest import get_panel
+from conftest import panel_app
+
+
+def profiled_app(**config: object) -> Flask:
+    # the profiler panel is kept in the request history without lazy panels
+    app = app_with_config(
+        app_config={}, toolbar_config={"DEBUG_TB_PROFILER_ENABLED": True, **config}
+    )
+
+    @app.route("/")
+    def index() -> str:
+        busy_wait(0.05)
+        return "<html><head></head><body>OK</body></html>"
+
+    return app
+
+
+def busy_wait(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampling_profiler_records_stacks() -> None:
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.runcall(busy_wait, 0.05)
+
+    assert profiler.sample_count > 0
+    assert profiler.total_time >= 0.05
+    stats = profiler.function_stats()
+    busy = next(v for k, v in stats.items() if k[2] == "busy_wait")
+    # every sample is taken inside busy_wait, which is the outermost frame
+    assert busy[0] == profiler.sample_count
+    assert all(stack[0][2] == "busy_wait" for stack in profiler.stacks)
+
+
+def test_cprofile_engine() -> None:
+    panel = get_panel(profiled_app(), ProfilerDebugPanel)
+    assert panel.stats is not None
+    assert panel.total_time > 0
+    assert any("busy_wait" in row["filename"] for row in panel.function_calls)
+
+
+def test_sampling_engine() -> None:
+    app = profiled_app(DEBUG_TB_PROFILER_ENGINE="sampling")
+    panel = get_panel(app, ProfilerDebugPanel)
+    assert panel.stats is None
+    assert panel.total_time >= 0.05
+    rows = panel.function_calls
+    assert any("busy_wait" in row["filename"] for row in rows)
+
+    with app.test_request_context():
+        assert "Samples" in panel.content()
+
+
+def test_call_tree() -> None:
+    app = profiled_app(DEBUG_TB_LAZY_PANELS=True)
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+        assert match is not None
+        request_id = match.group(1)
+
+        toolbar = app.extensions["debugtoolbar"].get_toolbar(request_id)
+        panel = toolbar.get_panel("flDebugProfilerPanel")
+        paths = [
+            [n.func[2] for n in path[1:] + (node,)]
+            for path, node in panel.call_tree.walk()
+        ]
+        assert ["index", "busy_wait"] in paths
+        content = panel.content()
+        assert "flDebugFlameGraph" in content
+        assert f"/profiler/{request_id}/collapsed" in content
+
+        response = client.get(f"/_debug_toolbar/views/profiler/{request_id}/collapsed")
+        assert response.status_code == 200
+        assert re.search(r"^index \(.*\);busy_wait \(.*\) \d+$", response.text, re.M)
+
+        response = client.get("/_debug_toolbar/views/profiler/unknown/collapsed")
+        assert response.status_code == 404
+
+
+def test_call_tree_from_stacks() -> None:
+    a, b, c = ("a.py", 1, "a"), ("b.py", 1, "b"), ("c.py", 1, "c")
+    root = tree_from_stacks({(a, b): [3, 0.3], (a, c): [1, 0.1], (a,): [1, 0.1]})
+    assert root.time == pytest.approx(0.5)
+    (node,) = root.children
+    assert [child.func for child in node.children] == [b, c]
+    assert node.self_time == pytest.approx(0.1)
+    assert collapsed_stacks(root).splitlines() == [
+        "a (a.py:1) 100000",
+        "a (a.py:1);b (b.py:1) 300000",
+        "a (a.py:1);c (c.py:1) 100000",
+    ]
+
+
+def test_function_rows_limited() -> None:
+    app = profiled_app(
+        DEBUG_TB_PROFILER_MAX_ROWS=2, DEBUG_TB_PROFILER_SORT="cumulative"
+    )
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+        assert match is not None
+        request_id = match.group(1)
+
+        toolbar = app.extensions["debugtoolbar"].get_toolbar(request_id)
+        panel = toolbar.get_panel("flDebugProfilerPanel")
+        assert len(panel.function_calls) == 2
+        assert len(panel.functions) > 2
+        assert "index" in panel.function_calls[0]["filename"]
+        assert "Show all" in html
+
+        response = client.get(f"/_debug_toolbar/views/profiler/{request_id}/functions")
+        assert response.status_code == 200
+        assert response.text.count("<tr") == len(panel.functions)
+
+
+def test_aggregated_profiles() -> None:
+    app = profiled_app(
+        DEBUG_TB_PROFILER_AGGREGATE=True, DEBUG_TB_PROFILER_AGGREGATE_MAX=1
+    )
+
+    @app.route("/other")
+    def other() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    with app.test_client() as client:
+        for _ in range(3):
+            client.get("/")
+
+        aggregates = ProfilerDebugPanel.get_aggregates(app)
+        aggregate = aggregates.get("index")
+        assert aggregate is not None
+        assert aggregate.requests == 3
+        assert aggregate.total_time >= 0.15
+        busy = next(
+            info for func, info in aggregate.infos.items() if func[2] == "busy_wait"
+        )
+        assert busy[1] == 3
+
+        response = client.get("/_debug_toolbar/views/profiler/aggregate")
+        assert response.status_code == 200
+        assert "/profiler/aggregate/index" in response.text
+
+        response = client.get("/_debug_toolbar/views/profiler/aggregate/index")
+        assert response.status_code == 200
+        assert "3 requests" in response.text
+        assert "busy_wait" in response.text
+
+        # only the most recent endpoint is kept
+        client.get("/other")
+        assert [a.endpoint for a in aggregates] == ["other"]
+
+        response = client.post("/_debug_toolbar/views/profiler/aggregate-reset")
+        assert response.status_code == 302
+        assert len(aggregates) == 0
+
+
+def test_aggregated_profile_of_reset_endpoint() -> None:
+    app = profiled_app(DEBUG_TB_PROFILER_AGGREGATE=True)
+
+    @app.route("/reset")
+    def reset() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    with app.test_client() as client:
+        client.get("/reset")
+        response = client.get("/_debug_toolbar/views/profiler/aggregate/reset")
+        assert response.status_code == 200
+        assert "1 request" in response.text
+
+
+def test_aggregated_profiles_disabled() -> None:
+    app = profiled_app()
+
+    with app.test_client() as client:
+        client.get("/")
+        assert not ProfilerDebugPanel.get_aggregates(app)
+        response = client.get("/_debug_toolbar/views/profiler/aggregate")
+        assert response.status_code == 404
+
+
+@pytest.mark.parametrize("engine", ["cprofile", "sampling"])
+def test_profile_dumps(tmp_path: Path, engine: str) -> None:
+    filename = str(tmp_path / "profile")
+    app = profiled_app(
+        DEBUG_TB_PROFILER_ENGINE=engine, DEBUG_TB_PROFILER_DUMP_FILENAME=filename
+    )
+
+    with app.test_client() as client:
+        client.get("/")
+        writer.join()
+        stats = pstats.Stats(filename)
+        assert any(func[2] == "busy_wait" for func in stats.stats)  # type: ignore[attr-defined]
+
+        app.config["DEBUG_TB_PROFILER_DUMP_FORMAT"] = "speedscope"
+        client.get("/")
+        writer.join()
+
+        with open(filename) as f:
+            document = json.load(f)
+
+        frames = document["shared"]["frames"]
+        events = document["profiles"][0]["events"]
+        assert "busy_wait" in [frame["name"] for frame in frames]
+        assert [e["type"] for e in events].count("O") == len(events) / 2
+        assert all(a["at"] <= b["at"] for a, b in zip(events, events[1:]))
+
+        app.config["DEBUG_TB_PROFILER_DUMP_FORMAT"] = "callgrind"
+        client.get("/")
+        writer.join()
+
+        with open(filename) as f:
+            callgrind = f.read()
+
+        assert callgrind.startswith("# callgrind format\n")
+        assert "fn=busy_wait:" in callgrind
+
+
+def test_whole_request_profile_without_toolbar(tmp_path: Path) -> None:
+    filename = str(tmp_path / "profile")
+    app = profiled_app(
+        DEBUG_TB_PROFILER_SCOPE="request",
+        DEBUG_TB_PROFILER_AGGREGATE=True,
+        DEBUG_TB_PROFILER_DUMP_FILENAME=lambda: filename,
+    )
+
+    @app.route("/json")
+    def json_view() -> dict[str, bool]:
+        busy_wait(0.01)
+        return {"ok": True}
+
+    with app.test_client() as client:
+        response = client.get("/json")
+        assert response.json == {"ok": True}
+        response.close()
+
+    writer.join()
+    stats = pstats.Stats(filename)
+    assert any(func[2] == "busy_wait" for func in stats.stats)  # type: ignore[attr-defined]
+    aggregate = ProfilerDebugPanel.get_aggregates(app).get("json_view")
+    assert aggregate is not None and aggregate.requests == 1
+
+
+def test_profiler_sort_validated() -> None:
+    with pytest.raises(ValueError, match="DEBUG_TB_PROFILER_SORT"):
+        profiled_app(DEBUG_TB_PROFILER_SORT="name")
+
+    panel = get_panel(profiled_app(DEBUG_TB_PROFILER_SORT="pcalls"), ProfilerDebugPanel)
+    infos = panel.function_infos()
+    assert [infos[func][0] for func in panel.functions] == sorted(
+        (info[0] for info in infos.values()), reverse=True
+    )
+
+
+def test_profile_dump_rotation(tmp_path: Path) -> None:
+    filename = str(tmp_path / "profile")
+
+    for i in range(4):
+        rotate(filename, backups=2)
+
+        with open(filename, "w") as f:
+            f.write(str(i) * 10)
+
+    assert sorted(os.listdir(tmp_path)) == ["profile", "profile.1", "profile.2"]
+
+    with open(f"{filename}.2") as f:
+        assert f.read() == "1" * 10
+
+    limit_size(filename, backups=2, max_bytes=25)
+    assert sorted(os.listdir(tmp_path)) == ["profile", "profile.1"]
+    limit_size(filename, backups=2, max_bytes=5)
+    assert os.listdir(tmp_path) == ["profile"]
+
+
+def test_profile_dump_writer_drops_when_full(tmp_path: Path) -> None:
+    dump_writer = ProfileDumpWriter(max_queue=1)
+    blocked = threading.Event()
+    release = threading.Event()
+
+    class SlowDump(ProfileDump):
+        def write(self) -> None:
+            blocked.set()
+            release.wait()
+
+    tree = CallNode(("", 0, "all"), 0.0)
+    assert dump_writer.submit(SlowDump("a", "pstats", {}, tree))
+    blocked.wait()
+    assert dump_writer.submit(SlowDump("b", "pstats", {}, tree))
+    assert not dump_writer.submit(SlowDump("c", "pstats", {}, tree))
+    assert dump_writer.dropped == 1
+    release.set()
+    dump_writer.join()
+
+
+@pytest.mark.parametrize("engine", ["cprofile", "sampling"])
+def test_whole_request_profile(engine: str) -> None:
+    app = profiled_app(
+        DEBUG_TB_PROFILER_SCOPE="request",
+        DEBUG_TB_PROFILER_ENGINE=engine,
+        DEBUG_TB_LAZY_PANELS=True,
+    )
+
+    @app.before_request
+    def slow_before_request() -> None:
+        busy_wait(0.02)
+
+    with app.test_client() as client:
+        response = client.get("/")
+        html = response.text
+        match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+        assert match is not None
+        toolbar = app.extensions["debugtoolbar"].get_toolbar(match.group(1))
+        panel = toolbar.get_panel("flDebugProfilerPanel")
+
+        # completed once the response is sent
+        assert panel.request_profile.end is None
+        response.close()
+        assert panel.request_profile.end is not None
+        phases = dict(panel.request_profile.phase_times())
+        assert list(phases) == [
+            "setup",
+            "before_request",
+            "view",
+            "after_request",
+            "toolbar",
+            "response",
+        ]
+        assert phases["before_request"] >= 0.02
+        assert phases["view"] >= 0.05
+        assert panel.total_time >= 0.07
+        assert panel.nav_subtitle().startswith("Request: ")
+
+        names = [func[2] for func in panel.functions]
+        assert "slow_before_request" in names
+
+        if engine == "sampling":
+            assert "<view phase>" in names
+
+        url = f"/_debug_toolbar/views/panel/{match.group(1)}/flDebugProfilerPanel"
+        assert "Request phases" in client.get(url).text
+
+
+@pytest.mark.parametrize(
+    "config", [dict(DEBUG_TB_HOSTS=["10.0.0.1"]), dict(DEBUG_TB_SAMPLE_RATE=2)]
+)
+def test_whole_request_profile_follows_toolbar(
+    config: dict[str, t.Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    app = profiled_app(DEBUG_TB_PROFILER_SCOPE="request", **config)
+    profilers = []
+
+    def counting_profiler(config: t.Any) -> t.Any:
+        profilers.append(create_profiler(config))
+        return profilers[-1]
+
+    monkeypatch.setattr(
+        "flask_debugtoolbar.panels.profiler.create_profiler", counting_profiler
+    )
+    shown = 0
+
+    with app.test_client() as client:
+        for _ in range(2):
+            response = client.get("/")
+            response.close()
+            shown += "flDebugProfilerPanel" in response.text
+
+    assert shown == (0 if "DEBUG_TB_HOSTS" in config else 1)
+    assert len(profilers) == shown
+
+
+def test_whole_request_profile_inactive() -> None:
+    app = profiled_app(
+        DEBUG_TB_PROFILER_SCOPE="request", DEBUG_TB_PROFILER_ENABLED=False
+    )
+
+    with app.test_client() as client:
+        response = client.get("/")
+        response.close()
+        assert "flDebugProfilerPanel" in response.text
+
+        client.set_cookie("fldt_active", "flDebugProfilerPanel")
+        response = client.get("/")
+        response.close()
+        assert "Request: " in response.text
+
+
+def async_app(**config: object) -> Flask:
+    app = profiled_app(**config)
+
+    @app.route("/async")
+    async def async_index() -> str:
+        await asyncio.sleep(0.05)
+        busy_wait(0.02)
+        return "<html><head></head><body>OK</body></html>"
+
+    return app
+
+
+def test_async_view_timing() -> None:
+    app = async_app(DEBUG_TB_PROFILER_ENABLED=False, DEBUG_TB_LAZY_PANELS=True)
+
+    with app.test_client() as client:
+        html = client.get("/async").text
+
+    match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+    assert match is not None
+    toolbar = app.extensions["debugtoolbar"].get_toolbar(match.group(1))
+    timing = toolbar.get_panel("flDebugTimerPanel").async_timing
+
+    assert timing.steps == 2
+    assert timing.wall >= 0.07
+    assert 0.04 <= timing.awaiting < timing.wall
+    assert 0.02 <= timing.running < 0.05
+    # the CPU clock can be slightly ahead of the wall clock
+    assert timing.cpu + timing.blocking == pytest.approx(timing.running, abs=0.001)
+
+
+@pytest.mark.parametrize("scope", ["view", "request"])
+@pytest.mark.parametrize("engine", ["cprofile", "sampling"])
+def test_async_view_profile(scope: str, engine: str) -> None:
+    app = async_app(DEBUG_TB_PROFILER_SCOPE=scope, DEBUG_TB_PROFILER_ENGINE=engine)
+    panel = get_panel(app, ProfilerDebugPanel, "/async")
+
+    infos = {func[2]: info for func, info in panel.function_infos().items()}
+    # the work done by the coroutine is seen, not only the code waiting for it,
+    # sampling can miss a few of the 20ms
+    assert infos["busy_wait"][3] >= 0.01
+    assert infos["async_index"][3] >= 0.01
+
+    if engine == "sampling":
+        assert infos["<await>"][3] >= 0.03
+
+
+@pytest.fixture
+def line_registry() -> t.Iterator[set[CodeType]]:
+    yield registry
+    registry.clear()
+
+
+def summed(n: int) -> int:
+    total = 0
+
+    for i in range(n):
+        total += i
+
+    busy_wait(0.01)
+    return total
+
+
+def test_line_profiler(line_registry: set[CodeType]) -> None:
+    app = panel_app(DEBUG_TB_LINE_PROFILER_FUNCTIONS=["test_profiler.summed"])
+
+    @app.route("/")
+    @profile_lines
+    def index() -> str:
+        summed(5)
+        return "<html><head></head><body>OK</body></html>"
+
+    assert summed.__code__ in line_registry
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+        assert match is not None
+        toolbar = app.extensions["debugtoolbar"].get_toolbar(match.group(1))
+        panel = toolbar.get_panel("flDebugLineProfilerPanel")
+
+        functions = {function["name"]: function for function in panel.functions}
+        assert set(functions) == {"summed", "test_line_profiler.<locals>.index"}
+        lines = {line["source"].strip(): line for line in functions["summed"]["lines"]}
+        assert lines["total += i"]["hits"] == 5
+        assert lines["busy_wait(0.01)"]["time"] >= 10
+        assert lines["busy_wait(0.01)"]["percent"] > 50
+        assert functions["test_line_profiler.<locals>.index"]["time"] >= 10
+
+        url = f"/_debug_toolbar/views/panel/{match.group(1)}/flDebugLineProfilerPanel"
+        assert "total += i" in client.get(url).text
+
+
+def test_line_profiler_stopped_without_toolbar(line_registry: set[CodeType]) -> None:
+    app = app_with_config(
+        app_config={},
+        toolbar_config={"DEBUG_TB_LINE_PROFILER_FUNCTIONS": ["test_profiler.summed"]},
+    )
+
+    @app.route("/json")
+    def json_view() -> dict[str, int]:
+        return {"total": summed(5)}
+
+    def tracer(frame: t.Any, event: str, arg: t.Any) -> None:
+        return None
+
+    previous = sys.gettrace()
+    sys.settrace(tracer)
+
+    try:
+        # the toolbar isn't rendered, the response isn't processed by panels
+        app.test_client().get("/json")
+        current = sys.gettrace()
+    finally:
+        sys.settrace(previous)
+
+    assert current is tracer
+    assert not _monitor.profilers
+
+
+def test_line_profiler_resolve() -> None:
+    assert resolve("json.dumps") is json.dumps
+    assert resolve("json:JSONEncoder.encode") is json.JSONEncoder.encode
+    assert resolve("json.JSONEncoder.encode") is json.JSONEncoder.encode
+
+    with pytest.raises(ImportError):
+        resolve("no_such_module.func")
+
+    with pytest.raises(TypeError):
+        register(len)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import html
+import re
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from flask_debugtoolbar.panels.sqlalchemy import SQLAlchemyDebugPanel
+
+from conftest import get_panel
+from conftest import panel_app
+
+
+def sqlalchemy_app(**config: object) -> Flask:
+    app = panel_app(
+        __name__,
+        SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
+        SQLALCHEMY_BINDS={"logs": "sqlite:///:memory:"},
+        **config,
+    )
+    db = SQLAlchemy(app)
+
+    class Item(db.Model):  # type: ignore[name-defined, misc]
+        __tablename__ = "item"
+        id = db.Column(db.Integer, primary_key=True)
+        parent_id = db.Column(db.Integer)
+
+    class Entry(db.Model):  # type: ignore[name-defined, misc]
+        __bind_key__ = "logs"
+        __tablename__ = "entry"
+        id = db.Column(db.Integer, primary_key=True)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Item(id=1), Item(id=2, parent_id=1), Entry(id=1)])
+        db.session.commit()
+
+    @app.route("/")
+    def index() -> str:
+        items = db.session.execute(db.select(Item.id)).all()
+        db.session.execute(db.select(Item).where(Item.id.in_([1, 2, 3]))).all()
+
+        for i in range(12):
+            db.session.execute(db.select(Item).where(Item.parent_id == i)).all()
+
+        return f"<html><head></head><body>{len(items)}</body></html>"
+
+    @app.route("/entries")
+    def entries() -> str:
+        db.session.execute(db.select(Entry).where(Entry.id > 0)).all()
+        return "<html><head></head><body></body></html>"
+
+    return app
+
+
+def test_n_plus_one_queries() -> None:
+    app = sqlalchemy_app()
+    panel = get_panel(app, SQLAlchemyDebugPanel)
+
+    assert panel.groups is not None
+    assert [group.count for group in panel.groups if group.count > 1] == [12]
+    group = next(group for group in panel.groups if group.count == 12)
+    assert group.n_plus_one
+    assert group.fingerprint.endswith("WHERE item.parent_id = ?")
+    assert group.location.endswith("(index)")
+    assert group.mean_duration == group.duration / 12
+    assert panel.n_plus_one_count() == 1
+    assert panel.nav_subtitle() == "14 queries, 1 N+1"
+
+    with app.test_request_context():
+        assert "likely N+1 queries" in panel.content()
+
+
+def test_n_plus_one_threshold() -> None:
+    panel = get_panel(
+        sqlalchemy_app(DEBUG_TB_N_PLUS_ONE_THRESHOLD=20), SQLAlchemyDebugPanel
+    )
+
+    assert panel.n_plus_one_count() == 0
+    assert panel.nav_subtitle() == "14 queries"
+
+
+def test_deferred_sql_formatting() -> None:
+    app = sqlalchemy_app(DEBUG_TB_DEFER_SQL_FORMATTING=True)
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+        assert match is not None
+        request_id = match.group(1)
+
+        url = f"/_debug_toolbar/views/panel/{request_id}/flDebugSQLAlchemyPanel"
+        content = client.get(url).text
+        assert "flDebugSqlDeferred" in content
+        assert "<span" not in content
+
+        response = client.get(
+            f"/_debug_toolbar/views/sqlalchemy/{request_id}/queries/0/sql"
+        )
+        assert response.status_code == 200
+        assert "item.id" in response.text
+        response = client.get(
+            f"/_debug_toolbar/views/sqlalchemy/{request_id}/groups/0/sql"
+        )
+        assert "item.parent_id" in response.text
+        response = client.get(
+            f"/_debug_toolbar/views/sqlalchemy/{request_id}/queries/99/sql"
+        )
+        assert response.status_code == 404
+
+
+def action_urls(app: Flask, panel: SQLAlchemyDebugPanel, action: str) -> list[str]:
+    with app.test_request_context():
+        content = panel.content()
+
+    pattern = rf'href="(/_debug_toolbar/views/sqlalchemy/{action}\?[^"]+)"'
+    return [html.unescape(url) for url in re.findall(pattern, content)]
+
+
+def test_sql_select() -> None:
+    app = sqlalchemy_app()
+    urls = action_urls(app, get_panel(app, SQLAlchemyDebugPanel), "sql_select")
+    assert len(urls) == 14
+
+    with app.test_client() as client:
+        # SELECT item.id, item.parent_id FROM item WHERE item.id IN (1, 2, 3)
+        content = client.get(urls[1]).text
+
+    assert "PARENT_ID" in content
+    assert content.count("<tr class=") == 2
+
+
+def test_sql_explain() -> None:
+    app = sqlalchemy_app()
+    urls = action_urls(app, get_panel(app, SQLAlchemyDebugPanel), "sql_explain")
+    assert len(urls) == 14
+
+    with app.test_client() as client:
+        content = client.get(urls[0]).text
+        assert "SQL Explained" in content
+        assert "SCAN item" in content
+
+        urls = action_urls(
+            app, get_panel(app, SQLAlchemyDebugPanel), "sql_explain_analyze"
+        )
+        content = client.get(urls[0]).text
+        assert "SQL Analyzed" in content
+        assert "Rows returned" in content
+
+        response = client.get("/_debug_toolbar/views/sqlalchemy/sql_explain?query=x")
+        assert response.status_code == 406
+
+
+def test_sql_explain_bind() -> None:
+    app = sqlalchemy_app()
+    (url,) = action_urls(
+        app, get_panel(app, SQLAlchemyDebugPanel, "/entries"), "sql_explain"
+    )
+
+    with app.test_client() as client:
+        # the entry table only exists in the logs database
+        assert "SEARCH entry" in client.get(url).text
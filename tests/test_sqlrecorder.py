@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import contextvars
+
+import sqlalchemy as sa
+from flask import Flask
+from flask import Response
+
+from flask_debugtoolbar.panels.sqlalchemy import SQLAlchemyDebugPanel
+from flask_debugtoolbar.sqlrecorder import _current
+from flask_debugtoolbar.sqlrecorder import QueryRecorder
+from flask_debugtoolbar.sqlrecorder import start_recording
+from flask_debugtoolbar.sqlrecorder import stop_recording
+
+from conftest import get_panel
+from conftest import panel_app
+
+
+def plain_app(**config: object) -> tuple[Flask, sa.Engine]:
+    app = panel_app(__name__, **config)
+    engine = sa.create_engine("sqlite://")
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE item (id INTEGER PRIMARY KEY, x INT)")
+
+    def insert_items(connection: sa.Connection) -> None:
+        connection.exec_driver_sql(
+            "INSERT INTO item (x) VALUES (?)", [(1,), (2,), (3,)]
+        )
+
+    @app.route("/")
+    def index() -> str:
+        with engine.begin() as connection:
+            insert_items(connection)
+            connection.exec_driver_sql("UPDATE item SET x = x + 1 WHERE x > 1")
+            connection.exec_driver_sql("SELECT * FROM item").all()
+
+        return "<html><head></head><body></body></html>"
+
+    @app.route("/text")
+    def text() -> Response:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1").all()
+
+        return Response("OK", mimetype="text/plain")
+
+    return app, engine
+
+
+def test_records_plain_sqlalchemy() -> None:
+    app, engine = plain_app()
+    panel = get_panel(app, SQLAlchemyDebugPanel)
+    queries = panel.get_queries()
+
+    assert [query.statement.split()[0] for query in queries] == [
+        "INSERT",
+        "UPDATE",
+        "SELECT",
+    ]
+    insert, update, select = queries
+    assert (insert.batch_size, insert.rowcount) == (3, 3)
+    assert (update.batch_size, update.rowcount) == (1, 2)
+    assert all(query.bind == str(engine.url) for query in queries)
+    assert all(query.duration >= 0 for query in queries)
+    # the most recent call first, without SQLAlchemy's frames
+    assert [name for _, _, name in insert.stack[:2]] == ["insert_items", "index"]
+    assert insert.location.endswith("(insert_items)")
+    assert update.location.endswith("(index)")
+    assert panel.nav_subtitle() == "3 queries"
+
+    with app.test_request_context():
+        content = panel.content()
+
+    assert "3 sets" in content
+    assert "insert_items" in content
+    # only the application's Flask-SQLAlchemy engines can run queries again
+    assert "sql_select" not in content
+
+
+def test_records_only_during_requests() -> None:
+    app, engine = plain_app()
+    panel = get_panel(app, SQLAlchemyDebugPanel)
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SELECT 1").all()
+
+    assert len(panel.get_queries()) == 3
+
+    # recording stops in teardown when the toolbar isn't rendered
+    with app.test_client() as client:
+        assert client.get("/text").text == "OK"
+
+    assert _current.get() is None
+
+
+def test_stop_recording_in_another_context() -> None:
+    token = start_recording(QueryRecorder(__name__))
+    context = contextvars.copy_context()
+    # a streamed response is processed in the context of its iteration
+    context.run(stop_recording, token)
+
+    assert context.run(_current.get) is None
+    stop_recording(token)
+    assert _current.get() is None
+
+
+def test_stack_frames() -> None:
+    app, _ = plain_app(DEBUG_TB_SQL_STACK_FRAMES=1)
+    queries = get_panel(app, SQLAlchemyDebugPanel).get_queries()
+
+    assert all(len(query.stack) == 1 for query in queries)
+    assert queries[0].stack[0][2] == "insert_items"
+
+
+def test_memory_budget() -> None:
+    app, _ = plain_app(DEBUG_TB_SQL_MAX_BYTES=1)
+    panel = get_panel(app, SQLAlchemyDebugPanel)
+
+    assert len(panel.get_queries()) == 1
+    assert panel.dropped() == 2
+    assert panel.nav_subtitle() == "3 queries"
+
+    with app.test_request_context():
+        content = panel.content()
+
+    assert "2 more queries" in content
@@ -1,17 +1,31 @@
 from __future__ import annotations
 
+import gc
 import re
+import time
 import typing as t
+import weakref
+from pathlib import Path
 from unittest.mock import MagicMock
 from unittest.mock import patch
 
 import pytest
 from flask import Flask
+from flask import render_template_string
+from flask import request
 from flask import Response
+from flask import stream_with_context
 from flask.testing import FlaskClient
+from sqlalchemy import create_engine
 from werkzeug.utils import import_string
 
 from flask_debugtoolbar import DebugToolbarExtension
+from flask_debugtoolbar.activation import make_activation_token
+from flask_debugtoolbar.compression import get_codec
+from flask_debugtoolbar.panels import DebugPanel
+from flask_debugtoolbar.toolbar import DebugToolbar
+
+from conftest import app_with_config
 
 
 def load_app(name: str) -> FlaskClient:
@@ -27,21 +41,6 @@ def test_basic_app() -> None:
     assert b'<div id="flDebug"' in index.data
 
 
-def app_with_config(
-    app_config: dict[str, t.Any], toolbar_config: dict[str, t.Any]
-) -> Flask:
-    app = Flask(__name__, **app_config)
-    app.config["DEBUG"] = True
-    app.config["SECRET_KEY"] = "abc123"
-
-    for key, value in toolbar_config.items():
-        app.config[key] = value
-
-    DebugToolbarExtension(app)
-
-    return app
-
-
 def test_toolbar_is_host_matching_but_flask_is_not() -> None:
     with pytest.raises(ValueError) as e:
         app_with_config(
@@ -192,3 +191,321 @@ def test_debug_switch_included_for_user_activated_panels() -> None:
         checked_panels.add(panel_id)
 
     assert len(checked_panels) == len(panels)
+
+
+def test_lazy_panels_render_content_on_demand() -> None:
+    app = app_with_config(app_config={}, toolbar_config=dict(DEBUG_TB_LAZY_PANELS=True))
+
+    @app.route("/")
+    def index() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        assert "flDebugConfigVarsPanel-content" in html
+        assert "DEBUG_TB_LAZY_PANELS" not in html
+
+        match = re.search(r'data-url="([^"]*flDebugConfigVarsPanel)"', html)
+        assert match is not None
+
+        response = client.get(match.group(1))
+        assert response.status_code == 200
+        assert "DEBUG_TB_LAZY_PANELS" in response.text
+
+
+def test_toolbar_only_kept_when_needed() -> None:
+    app = app_with_config(app_config={}, toolbar_config={})
+
+    @app.route("/")
+    def index() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    html = app.test_client().get("/").text
+    match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+    assert match is not None
+    assert app.extensions["debugtoolbar"].get_toolbar(match.group(1)) is None
+
+
+def test_template_contexts_dont_keep_request() -> None:
+    app = app_with_config(app_config={}, toolbar_config=dict(DEBUG_TB_LAZY_PANELS=True))
+    requests = []
+
+    @app.route("/")
+    def index() -> str:
+        requests.append(weakref.ref(request._get_current_object()))  # type: ignore[attr-defined]
+        return render_template_string(
+            "<html><head></head><body>{{ value }}</body></html>", value=1
+        )
+
+    html = app.test_client().get("/").text
+    gc.collect()
+    assert requests[0]() is None
+
+    match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+    assert match is not None
+    panel = app.extensions["debugtoolbar"].get_panel(
+        match.group(1), "flDebugTemplatePanel"
+    )
+    (template,) = panel.templates
+    assert template["context"]["value"] == 1
+    assert "request" not in template["context"]
+
+
+def test_lazy_panels_unknown_request_id() -> None:
+    app = app_with_config(app_config={}, toolbar_config=dict(DEBUG_TB_LAZY_PANELS=True))
+
+    with app.test_client() as client:
+        response = client.get("/_debug_toolbar/views/panel/missing/flDebugTimerPanel")
+        assert response.status_code == 404
+
+
+def test_script_handlers_match_panel_content() -> None:
+    script = Path(__file__).parents[1] / "src/flask_debugtoolbar/static/js/toolbar.js"
+    selectors = set(re.findall(r"#(flDebug\w+Panel)-content", script.read_text()))
+    assert {"flDebugSQLAlchemyPanel", "flDebugProfilerPanel"} <= selectors
+
+    app = app_with_config(
+        app_config={}, toolbar_config=dict(DEBUG_TB_PROFILER_ENABLED=True)
+    )
+    engine = create_engine("sqlite://")
+
+    @app.route("/")
+    def index() -> str:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+
+        return "<html><head></head><body>OK</body></html>"
+
+    with app.test_client() as client:
+        html = client.get("/").text
+
+    for dom_id in selectors:
+        assert f'<li id="{dom_id}"' in html
+        assert f'<div id="{dom_id}-content"' in html
+
+
+def test_toolbar_injected_in_streamed_response() -> None:
+    app = app_with_config(app_config={}, toolbar_config={})
+
+    @app.route("/")
+    def index() -> t.Any:
+        def generate() -> t.Iterator[str]:
+            yield "<html><head></head><body>"
+            yield "OK</bo"
+            yield "dy></html>"
+
+        return stream_with_context(generate())
+
+    with app.test_client() as client:
+        response = client.get("/")
+        assert response.text.startswith("<html><head></head><body>OK")
+        assert response.text.endswith("</body></html>")
+        assert '<div id="flDebug" ' in response.text
+
+
+def test_streamed_response_records_inject_timing() -> None:
+    app = app_with_config(app_config={}, toolbar_config=dict(DEBUG_TB_LAZY_PANELS=True))
+
+    @app.route("/")
+    def index() -> t.Any:
+        def generate() -> t.Iterator[str]:
+            yield "<html><head></head><body>"
+            time.sleep(0.05)
+            yield "OK</body></html>"
+
+        return stream_with_context(generate())
+
+    with app.test_client() as client:
+        html = client.get("/").text
+
+    match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+    assert match is not None
+    toolbar = app.extensions["debugtoolbar"].get_toolbar(match.group(1))
+    # without the time the view takes to generate the body
+    assert 0 < toolbar.timings["Toolbar"]["inject"] < 0.05
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "deflate"])
+def test_toolbar_injected_in_compressed_response(encoding: str) -> None:
+    app = app_with_config(app_config={}, toolbar_config={})
+    codec = get_codec(encoding)
+    assert codec is not None
+    body = codec.encode(b"<html><head></head><body>OK</body></html>")
+
+    @app.route("/")
+    def index() -> Response:
+        return Response(body, headers={"Content-Encoding": encoding})
+
+    with app.test_client() as client:
+        response = client.get("/")
+        html = get_codec(encoding).decode(response.data)  # type: ignore[union-attr]
+        assert b'<div id="flDebug" ' in html
+        assert html.endswith(b"</body></html>")
+
+
+def test_compressed_response_timings() -> None:
+    app = app_with_config(
+        app_config={},
+        toolbar_config=dict(DEBUG_TB_LAZY_PANELS=True, DEBUG_TB_COMPRESSION_LEVEL=9),
+    )
+    codec = get_codec("gzip")
+    assert codec is not None
+    text = " ".join(str(i * 7919 % 100_003) for i in range(300_000))
+    body = codec.encode(f"<html><head></head><body>{text}</body></html>".encode())
+
+    @app.route("/")
+    def index() -> Response:
+        return Response(body, headers={"Content-Encoding": "gzip"})
+
+    with app.test_client() as client:
+        response = client.get("/")
+        html = get_codec("gzip").decode(response.data)  # type: ignore[union-attr]
+
+    match = re.search(rb'data-request-id="([0-9a-f]+)"', html)
+    assert match is not None
+    toolbar = app.extensions["debugtoolbar"].get_toolbar(match.group(1).decode())
+    steps = toolbar.timings["Toolbar"]
+    # compressing the body is its own step, not counted again in inject
+    assert steps["inject"] < steps["gzip encode"]
+    panel = toolbar.get_panel("flDebugOverheadPanel")
+    total = sum(row[2] for row in panel.get_timings())
+    assert total == pytest.approx(toolbar.total_overhead() * 1000)
+
+
+def test_toolbar_not_injected_in_unknown_encoding() -> None:
+    app = app_with_config(app_config={}, toolbar_config={})
+
+    @app.route("/")
+    def index() -> Response:
+        return Response(b"\x00\x01", headers={"Content-Encoding": "compress"})
+
+    with app.test_client() as client:
+        assert client.get("/").data == b"\x00\x01"
+
+
+def test_templates_precompiled_on_init() -> None:
+    app = Flask(__name__)
+    app.config["DEBUG"] = True
+    app.config["SECRET_KEY"] = "abc123"
+    toolbar = DebugToolbarExtension(app)
+    cache = toolbar.jinja_env.cache
+    assert cache is not None
+    assert any(name == "base.html" for _, name in cache.keys())
+    assert not toolbar.jinja_env.auto_reload
+
+
+def test_template_bytecode_cache(tmp_path: Path) -> None:
+    app_with_config(
+        app_config={},
+        toolbar_config=dict(DEBUG_TB_TEMPLATE_BYTECODE_CACHE=str(tmp_path)),
+    )
+    assert any(tmp_path.glob("__fldt_*.cache"))
+
+
+class UserActivatedPanel(DebugPanel):
+    name = "UserActivated"
+    user_activate = True
+    instances = 0
+
+    def __init__(self, *args: t.Any, **kwargs: t.Any) -> None:
+        super().__init__(*args, **kwargs)
+        UserActivatedPanel.instances += 1
+
+    def nav_title(self) -> str:
+        return "User activated"
+
+
+def test_panel_plan_skips_inactive_panels_and_unused_hooks() -> None:
+    app = app_with_config(
+        app_config={},
+        toolbar_config=dict(
+            DEBUG_TB_PANELS=(
+                "flask_debugtoolbar.panels.timer.TimerDebugPanel",
+                "flask_debugtoolbar.panels.config_vars.ConfigVarsDebugPanel",
+                "test_toolbar.UserActivatedPanel",
+            )
+        ),
+    )
+    plan = DebugToolbar.get_plan(app)
+    assert [p.__name__ for p in plan.hooks["process_request"]] == ["TimerDebugPanel"]
+    # the timer wraps async views
+    assert [p.__name__ for p in plan.hooks["process_view"]] == ["TimerDebugPanel"]
+
+    @app.route("/")
+    def index() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    UserActivatedPanel.instances = 0
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        assert UserActivatedPanel.instances == 0
+        assert 'id="flDebugUserActivatedPanel"' in html
+
+        client.set_cookie("fldt_active", "flDebugUserActivatedPanel")
+        client.get("/")
+        assert UserActivatedPanel.instances == 1
+
+
+def test_toolbar_sample_rate() -> None:
+    app = app_with_config(app_config={}, toolbar_config=dict(DEBUG_TB_SAMPLE_RATE=3))
+
+    @app.route("/")
+    def index() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    with app.test_client() as client:
+        shown = ['<div id="flDebug" ' in client.get("/").text for _ in range(6)]
+
+    assert shown.count(True) == 2
+
+
+def test_toolbar_activation_token() -> None:
+    app = app_with_config(
+        app_config={}, toolbar_config=dict(DEBUG_TB_REQUIRE_ACTIVATION=True)
+    )
+
+    @app.route("/")
+    def index() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    with app.app_context():
+        token = make_activation_token()
+
+    with app.test_client() as client:
+        assert '<div id="flDebug" ' not in client.get("/").text
+
+        response = client.get("/", headers={"X-Debug-Toolbar": "invalid"})
+        assert '<div id="flDebug" ' not in response.text
+
+        response = client.get("/", headers={"X-Debug-Toolbar": token})
+        assert '<div id="flDebug" ' in response.text
+
+        client.set_cookie("fldt_activate", token)
+        assert '<div id="flDebug" ' in client.get("/").text
+
+
+def test_toolbar_records_overhead() -> None:
+    app = app_with_config(app_config={}, toolbar_config=dict(DEBUG_TB_LAZY_PANELS=True))
+    extension: DebugToolbarExtension = app.extensions["debugtoolbar"]
+
+    @app.route("/")
+    def index() -> str:
+        return "<html><head></head><body>OK</body></html>"
+
+    with app.test_client() as client:
+        html = client.get("/").text
+        match = re.search(r'data-request-id="([0-9a-f]+)"', html)
+        assert match is not None
+
+        toolbar = extension.get_toolbar(match.group(1))
+        assert toolbar is not None
+        assert toolbar.request is None
+        assert set(toolbar.timings["Toolbar"]) >= {"setup", "render", "inject"}
+        assert "process_request" in toolbar.timings["Timer"]
+        assert toolbar.total_overhead() > 0
+
+        url = f"/_debug_toolbar/views/panel/{match.group(1)}/flDebugOverheadPanel"
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "inject" in response.text
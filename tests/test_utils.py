@@ -1,16 +1,23 @@
 from __future__ import annotations
 
 import ntpath
+import os
 import posixpath
+import sys
 from types import ModuleType
 
 import pytest
+from flask import Flask
 from markupsafe import escape
 from markupsafe import Markup
 
+from flask_debugtoolbar.utils import _format_fname
+from flask_debugtoolbar.utils import _format_sql
 from flask_debugtoolbar.utils import _relative_paths
 from flask_debugtoolbar.utils import _shortest_relative_path
 from flask_debugtoolbar.utils import decode_text
+from flask_debugtoolbar.utils import fingerprint_sql
+from flask_debugtoolbar.utils import format_fname
 from flask_debugtoolbar.utils import format_sql
 from flask_debugtoolbar.utils import HAVE_PYGMENTS
 
@@ -63,6 +70,26 @@ def test_shortest_relative_path(
     assert _shortest_relative_path(value, paths, path_module) == expected
 
 
+def test_format_fname_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    app = Flask(__name__)
+    site_packages = os.path.join(os.sep, "site-packages")
+    app_file = os.path.join(app.root_path, "views.py")
+    lib_file = os.path.join(site_packages, "lib", "mod.py")
+    monkeypatch.setattr(sys, "path", [site_packages])
+    _format_fname.cache_clear()
+
+    with app.app_context():
+        assert format_fname("<frozen os>") == "<frozen os>"
+        assert format_fname(app_file) == os.path.join(".", "views.py")
+        assert format_fname(lib_file) == f"<{os.path.join('lib', 'mod.py')}>"
+        assert format_fname(lib_file) == f"<{os.path.join('lib', 'mod.py')}>"
+        assert _format_fname.cache_info().hits == 1
+
+        # changes to sys.path are seen
+        sys.path.append(os.path.join(site_packages, "lib"))
+        assert format_fname(lib_file) == "<mod.py>"
+
+
 def test_decode_text_unicode() -> None:
     value = "\uffff"
     decoded = decode_text(value)
@@ -130,3 +157,44 @@ def test_format_sql_pygments_non_ascii() -> None:
     assert "select" in html
     assert "abc" in html
     assert "xyz" in html
+
+
+def test_format_sql_cached() -> None:
+    sql = "select 'cached'"
+    html = format_sql(sql, {})
+    hits = _format_sql.cache_info().hits
+    assert format_sql(sql, {"other": "params"}) == html
+    assert _format_sql.cache_info().hits == hits + 1
+
+
+@pytest.mark.usefixtures("no_pygments")
+@pytest.mark.skipif(not HAVE_PYGMENTS, reason='test requires the "Pygments" library')
+def test_format_sql_cache_follows_pygments() -> None:
+    # test_format_sql_pygments may have cached it highlighted
+    assert format_sql("select 1", {}) == "select 1"
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        (
+            "SELECT foo.id FROM foo WHERE foo.id = ? -- comment\n LIMIT 10",
+            "SELECT foo.id FROM foo WHERE foo.id = ? LIMIT ?",
+        ),
+        (
+            "select * from t1 where a in (1, 2, 3) and b = 'it''s' and c = 1.5e3",
+            "select * from t1 where a in (...) and b = ? and c = ?",
+        ),
+        (
+            "SELECT a FROM t WHERE b = :b AND c = %(c)s AND d = %s AND e = $1",
+            "SELECT a FROM t WHERE b = ? AND c = ? AND d = ? AND e = ?",
+        ),
+        (
+            "INSERT INTO t (a, b) VALUES (?, ?), (?, ?)",
+            "INSERT INTO t (a, b) VALUES (...)",
+        ),
+        (b"SELECT /* hint */ a::text\nFROM t", "SELECT a::text FROM t"),
+    ],
+)
+def test_fingerprint_sql(query: str | bytes, expected: str) -> None:
+    assert fingerprint_sql(query) == expected